@@ -0,0 +1,135 @@
+import multiprocessing
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from sheet_plan import compile_plan
+from sheet_values import parse_sheet_values
+
+# --- ANALITIK LINTAS TAHUN (semua MonitorFolder milik user) ---
+# Download Google per folder jalan paralel di thread pool (I/O), parsing & agregasi
+# pandas per tahun di process pool (CPU). Agregasi tahun yang sudah terunduh langsung
+# dikirim ke process pool sambil menunggu download folder lain.
+
+FOLDER_ATTRS = ('id', 'name', 'col_date', 'col_income', 'col_expense', 'col_source_income',
+                'col_source_expense', 'debt_keywords', 'cell_addr_income', 'cell_addr_expense',
+                'cell_addr_balance', 'clean_income_cells', 'clean_expense_cells')
+
+
+def folder_spec(folder):
+    # Salinan konfigurasi folder tanpa SQLAlchemy (bisa di-pickle ke worker process)
+    spec = SimpleNamespace(**{attr: getattr(folder, attr) for attr in FOLDER_ATTRS})
+    spec.sheet_names = folder.get_sheet_list()
+    spec.categories = [SimpleNamespace(name=c.name, cell_addr=c.cell_addr, type=c.type, is_clean=c.is_clean)
+                       for c in folder.categories]
+    return spec
+
+
+def empty_totals():
+    return {'income': 0, 'expense': 0, 'balance': 0}
+
+
+def summarize_year(spec, extracts):
+    # Dijalankan di worker process: satu folder (tahun) -> ringkasan kecil
+    kotor, clean = empty_totals(), empty_totals()
+    trend = {'labels': [], 'income': [], 'expense': []}
+    categories = {'income': {}, 'expense': {}}
+    plan = compile_plan(spec)
+    for name in spec.sheet_names:
+        extract = extracts.get(name)
+        if extract is None or extract.is_empty: continue
+        transactions, sum_kotor, sum_clean, pies = parse_sheet_values(plan, extract)
+        for key in kotor:
+            kotor[key] += sum_kotor[key]
+            clean[key] += sum_clean[key]
+        # Trend per bulan dari transaksi, sama seperti mode setahun di dashboard
+        income, expense = transactions.totals() if transactions else (0, 0)
+        trend['labels'].append(name)
+        trend['income'].append(income)
+        trend['expense'].append(expense)
+        for kind, pie in (('income', pies['dirty_inc']), ('expense', pies['dirty_exp'])):
+            for label, val in zip(pie['labels'], pie['data']):
+                categories[kind][label] = categories[kind].get(label, 0) + val
+
+    months = len(trend['labels'])
+    average = {k: v / months for k, v in kotor.items()} if months else empty_totals()
+    return {'id': spec.id, 'name': spec.name, 'months': months, 'kotor': kotor, 'clean': clean,
+            'monthly_avg': average, 'trend': trend, 'categories': categories, 'error': None}
+
+
+def error_year(spec, error):
+    return {'id': spec.id, 'name': spec.name, 'error': str(error)}
+
+
+def growth(values):
+    # Perubahan (%) dibanding tahun sebelumnya
+    result = [None]
+    for prev, cur in zip(values, values[1:]):
+        result.append(round((cur - prev) / abs(prev) * 100, 1) if prev else None)
+    return result
+
+
+def combine_years(years):
+    ok = [y for y in years if not y['error']]
+    labels = [y['name'] for y in ok]
+    yoy = {kind: {key: [y[kind][key] for y in ok] for key in ('income', 'expense', 'balance')}
+           for kind in ('kotor', 'clean')}
+
+    category_trend = {}
+    for kind in ('income', 'expense'):
+        names = sorted({c for y in ok for c in y['categories'][kind]})
+        category_trend[kind] = {'labels': labels, 'datasets': [
+            {'label': c, 'data': [y['categories'][kind].get(c, 0) for y in ok]} for c in names]}
+
+    return {'labels': labels, 'years': ok, 'yoy': yoy,
+            'growth': {key: growth(yoy['kotor'][key]) for key in ('income', 'expense')},
+            'category_trend': category_trend,
+            'errors': [{'name': y['name'], 'error': y['error']} for y in years if y['error']]}
+
+
+class CrossYearAnalytics:
+    def __init__(self, fetch_workers=8, process_workers=2):
+        self._threads = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='analytics-fetch')
+        self.process_workers = process_workers
+        self._processes = None
+
+    def _process_pool(self):
+        # spawn: aman dipakai dari proses yang sudah punya banyak thread (gunicorn, sync pool)
+        if self._processes is None and self.process_workers > 0:
+            self._processes = ProcessPoolExecutor(max_workers=self.process_workers,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+        return self._processes
+
+    def _summarize(self, spec, extracts):
+        pool = self._process_pool()
+        if pool is None: return None, summarize_year(spec, extracts)
+        try:
+            return pool.submit(summarize_year, spec, extracts), None
+        except BrokenProcessPool:
+            self._processes = None
+            return None, summarize_year(spec, extracts)
+
+    def run(self, specs, fetch):
+        # fetch(spec) -> {sheet_name: SheetExtract}, dijalankan di thread pool
+        fetches = {self._threads.submit(fetch, spec): spec for spec in specs}
+        results, jobs = {}, {}
+        for future in as_completed(fetches):
+            spec = fetches[future]
+            try:
+                extracts = future.result()
+            except Exception as e:
+                results[spec.id] = error_year(spec, e)
+                continue
+            extracts = {n: extracts[n] for n in spec.sheet_names if extracts.get(n) is not None and not extracts[n].is_empty}
+            job, summary = self._summarize(spec, extracts)
+            if job is None: results[spec.id] = summary
+            else: jobs[job] = (spec, extracts)
+
+        for job, (spec, extracts) in jobs.items():
+            try:
+                results[spec.id] = job.result()
+            except BrokenProcessPool:
+                self._processes = None
+                results[spec.id] = summarize_year(spec, extracts)
+            except Exception as e:
+                results[spec.id] = error_year(spec, e)
+        return combine_years([results[spec.id] for spec in specs])
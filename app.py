@@ -1,31 +1,160 @@
 import os
 import json
-import pandas as pd
+import hashlib
 import gspread
+from gspread.utils import absolute_range_name
 import random
+import secrets
 import string
-from datetime import timedelta
+import time
+from datetime import date, datetime, timedelta
 from oauth2client.service_account import ServiceAccountCredentials
-from gspread.utils import a1_to_rowcol
-from flask import Flask, render_template, request, redirect, url_for, flash, abort, session
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, session, jsonify, g, Response, has_app_context, stream_with_context
+from werkzeug.utils import secure_filename
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from flask_bcrypt import Bcrypt
 from sqlalchemy.exc import IntegrityError
-from models import db, User, GlobalSettings, MonitorFolder, CategoryMap, crypto
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, User, GlobalSettings, MonitorFolder, CategoryMap, ReportSchedule, crypto, ensure_schema, configure_database
+from sheet_cache import SheetCache, get_sheet_revision, get_sheet_version
+from sheet_plan import PlanCache, SheetExtract, fetch_written
+from snapshot_store import SnapshotStore
+from sync_scheduler import SyncScheduler
+from sheet_values import empty_pie_data, format_summary, parse_sheet_values
+from google_pool import GoogleClientPool
+from google_api import GoogleApi, GoogleApiError, account_key
+from metrics import metrics, timed, server_timing_header
+from analytics import CrossYearAnalytics, folder_spec
+from single_flight import SingleFlight
+from password_hasher import PasswordHasher, HashBusyError
+from export import FORMATS, ExportError, parse_filters, parquet_available, iter_frames, iter_export
+from date_range import DateIndex, RangeError, parse_range, range_transactions, summarize_range
+from ingest import (IngestError, IngestQueue, IngestFlusher, new_token, hash_token, check_token, validate_items,
+                    sheet_row, snapshot_row, appended_start, updated_range, MONTHS)
+from reports import REPORT_ORIGIN, ReportError, CronSpec
+from chart_compact import CHART_MIN_POINTS, compact_dashboard
+from compression import compress_response
+import query_stats
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'rahasia_banget_123'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///money_manager.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///money_manager.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Session Timeout 30 Menit
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=30)
 
-db.init_app(app)
-bcrypt = Bcrypt(app)
+# Cache data worksheet (TTL dalam detik, jumlah entry maksimal untuk LRU)
+app.config['SHEET_CACHE_PATH'] = os.getenv('SHEET_CACHE_PATH', os.path.join(app.instance_path, 'sheet_cache.db'))
+app.config['SHEET_CACHE_TTL'] = int(os.getenv('SHEET_CACHE_TTL', 300))
+app.config['SHEET_CACHE_MAX_ENTRIES'] = int(os.getenv('SHEET_CACHE_MAX_ENTRIES', 256))
+
+# Snapshot transaksi lokal (sinkron inkremental dari Google Sheets; kolom diambil penuh ulang
+# paling lambat tiap SNAPSHOT_REVALIDATE_AFTER detik agar edit di baris lama ikut tertarik)
+app.config['SNAPSHOT_PATH'] = os.getenv('SNAPSHOT_PATH', os.path.join(app.instance_path, 'snapshots.db'))
+app.config['SNAPSHOT_REVALIDATE_AFTER'] = int(os.getenv('SNAPSHOT_REVALIDATE_AFTER', 600))
+
+# Index tanggal -> worksheet & baris untuk query rentang tanggal
+app.config['DATE_INDEX_PATH'] = os.getenv('DATE_INDEX_PATH', os.path.join(app.instance_path, 'date_index.db'))
+
+# Sinkron background (jumlah fetch paralel, jeda scheduler, umur "baru dilihat", interval default)
+app.config['SYNC_MAX_WORKERS'] = int(os.getenv('SYNC_MAX_WORKERS', 4))
+app.config['SYNC_TICK'] = int(os.getenv('SYNC_TICK', 30))
+app.config['SYNC_RECENT_WINDOW'] = int(os.getenv('SYNC_RECENT_WINDOW', 3600))
+app.config['SYNC_DEFAULT_INTERVAL'] = int(os.getenv('SYNC_DEFAULT_INTERVAL', 300))
+
+# Batas panggilan Google per service account (per worker), retry/backoff, circuit breaker, timeout HTTP
+app.config['GOOGLE_QUOTA_PER_MINUTE'] = int(os.getenv('GOOGLE_QUOTA_PER_MINUTE', 60))
+app.config['GOOGLE_QUOTA_BURST'] = int(os.getenv('GOOGLE_QUOTA_BURST', 10))
+app.config['GOOGLE_QUOTA_MAX_WAIT'] = float(os.getenv('GOOGLE_QUOTA_MAX_WAIT', 10))
+app.config['GOOGLE_API_MAX_RETRIES'] = int(os.getenv('GOOGLE_API_MAX_RETRIES', 4))
+app.config['GOOGLE_API_TIMEOUT'] = float(os.getenv('GOOGLE_API_TIMEOUT', 30))
+app.config['GOOGLE_CIRCUIT_THRESHOLD'] = int(os.getenv('GOOGLE_CIRCUIT_THRESHOLD', 5))
+app.config['GOOGLE_CIRCUIT_RESET'] = int(os.getenv('GOOGLE_CIRCUIT_RESET', 60))
+
+# Lock file single-flight (fetch sheet yang sama dari beberapa worker sekaligus)
+app.config['SINGLE_FLIGHT_LOCK_DIR'] = os.getenv('SINGLE_FLIGHT_LOCK_DIR', os.path.join(app.instance_path, 'locks'))
+
+# Analitik lintas tahun (thread untuk download Google, process untuk agregasi pandas; 0 = tanpa process)
+app.config['ANALYTICS_FETCH_WORKERS'] = int(os.getenv('ANALYTICS_FETCH_WORKERS', 8))
+app.config['ANALYTICS_PROCESSES'] = int(os.getenv('ANALYTICS_PROCESSES', 2))
+
+# SQLite mode produksi: WAL, synchronous, busy_timeout (ms) & pool koneksi per worker ('default' = bawaan SQLAlchemy)
+app.config['SQLITE_MODE'] = os.getenv('SQLITE_MODE', 'production')
+app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+app.config['SQLITE_POOL_SIZE'] = int(os.getenv('SQLITE_POOL_SIZE', 5))
+
+# Hash password: cost bcrypt (hash lama di-hash ulang saat login), process pool & antrian per worker,
+# percobaan bersamaan per IP/username
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+app.config['BCRYPT_PROCESSES'] = int(os.getenv('BCRYPT_PROCESSES', 2))
+app.config['BCRYPT_MAX_PENDING'] = int(os.getenv('BCRYPT_MAX_PENDING', 8))
+app.config['BCRYPT_MAX_PER_KEY'] = int(os.getenv('BCRYPT_MAX_PER_KEY', 2))
+
+# Log satu baris per request berisi jumlah query SQL (default aktif saat debug)
+app.config['QUERY_LOG'] = os.getenv('QUERY_LOG', '').lower() in ('1', 'true', 'yes')
+
+# /metrics: butuh token (Bearer / ?token=); tanpa token endpoint ditutup (404), kecuali
+# METRICS_PUBLIC=1 (mis. hanya bisa diakses dari jaringan internal)
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+app.config['METRICS_PUBLIC'] = os.getenv('METRICS_PUBLIC', '0') == '1'
+
+# Input transaksi lewat API: antrian lokal, jeda penggabungan (detik), baris per values_append
+app.config['INGEST_QUEUE_PATH'] = os.getenv('INGEST_QUEUE_PATH', os.path.join(app.instance_path, 'ingest_queue.db'))
+app.config['INGEST_FLUSH_DELAY'] = float(os.getenv('INGEST_FLUSH_DELAY', 2))
+app.config['INGEST_FLUSH_INTERVAL'] = int(os.getenv('INGEST_FLUSH_INTERVAL', 30))
+app.config['INGEST_BATCH_ROWS'] = int(os.getenv('INGEST_BATCH_ROWS', 1000))
+app.config['INGEST_MAX_ATTEMPTS'] = int(os.getenv('INGEST_MAX_ATTEMPTS', 8))
+app.config['INGEST_MAX_ROWS_PER_REQUEST'] = int(os.getenv('INGEST_MAX_ROWS_PER_REQUEST', 500))
+
+# Laporan dashboard terjadwal (report_worker.py): slot browser, antrian, lebar gambar, folder output sender file
+app.config['REPORT_CONTEXTS'] = int(os.getenv('REPORT_CONTEXTS', 2))
+app.config['REPORT_QUEUE_SIZE'] = int(os.getenv('REPORT_QUEUE_SIZE', 50))
+app.config['REPORT_WIDTH'] = int(os.getenv('REPORT_WIDTH', 1280))
+app.config['REPORT_RECYCLE_AFTER'] = int(os.getenv('REPORT_RECYCLE_AFTER', 200))
+app.config['REPORT_TIMEOUT'] = int(os.getenv('REPORT_TIMEOUT', 30))
+app.config['REPORT_OUTPUT_DIR'] = os.getenv('REPORT_OUTPUT_DIR', os.path.join(app.instance_path, 'reports'))
+app.config['TELEGRAM_BOT_TOKEN'] = os.getenv('TELEGRAM_BOT_TOKEN', '')
+
+# Grafik dashboard: titik per seri jika lebar layar tidak dikirim, batas ?points=, irisan pie (sisanya "Lainnya")
+app.config['CHART_POINTS'] = int(os.getenv('CHART_POINTS', 400))
+app.config['CHART_MAX_POINTS'] = int(os.getenv('CHART_MAX_POINTS', 2000))
+app.config['CHART_PIE_SLICES'] = int(os.getenv('CHART_PIE_SLICES', 8))
+
+# Kompresi response HTML/JSON (aktif/tidak, ukuran minimal dalam byte, level gzip, quality brotli)
+app.config['COMPRESS_RESPONSES'] = os.getenv('COMPRESS_RESPONSES', '1').lower() in ('1', 'true', 'yes')
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+
+configure_database(app)
+password_hasher = PasswordHasher(rounds=app.config['BCRYPT_LOG_ROUNDS'],
+                                 processes=app.config['BCRYPT_PROCESSES'],
+                                 max_pending=app.config['BCRYPT_MAX_PENDING'],
+                                 max_per_key=app.config['BCRYPT_MAX_PER_KEY'])
+sheet_cache = SheetCache(app.config['SHEET_CACHE_PATH'],
+                         ttl=app.config['SHEET_CACHE_TTL'],
+                         max_entries=app.config['SHEET_CACHE_MAX_ENTRIES'])
+snapshot_store = SnapshotStore(app.config['SNAPSHOT_PATH'], revalidate_after=app.config['SNAPSHOT_REVALIDATE_AFTER'])
+date_index = DateIndex(app.config['DATE_INDEX_PATH'])
+ingest_queue = IngestQueue(app.config['INGEST_QUEUE_PATH'], max_attempts=app.config['INGEST_MAX_ATTEMPTS'])
+single_flight = SingleFlight(app.config['SINGLE_FLIGHT_LOCK_DIR'])
+plan_cache = PlanCache()
+google_pool = GoogleClientPool()
+google_api = GoogleApi(rate_per_minute=app.config['GOOGLE_QUOTA_PER_MINUTE'],
+                       burst=app.config['GOOGLE_QUOTA_BURST'],
+                       max_wait=app.config['GOOGLE_QUOTA_MAX_WAIT'],
+                       max_retries=app.config['GOOGLE_API_MAX_RETRIES'],
+                       timeout=app.config['GOOGLE_API_TIMEOUT'],
+                       failure_threshold=app.config['GOOGLE_CIRCUIT_THRESHOLD'],
+                       reset_timeout=app.config['GOOGLE_CIRCUIT_RESET'])
+
+# Tabel, kolom & index baru dibuat saat start (juga di bawah gunicorn)
+with app.app_context():
+    ensure_schema()
 
 # --- KONFIGURASI FLASK LOGIN ---
 login_manager = LoginManager(app)
@@ -35,12 +164,75 @@ login_manager.login_message_category = "danger"
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Flask-Login menyimpan hasilnya di g selama request -> satu query per request
+    with timed('db_user'):
+        return db.session.get(User, int(user_id))
 
 @app.before_request
 def make_session_permanent():
     session.permanent = True
 
+# --- TIMING PER REQUEST (Server-Timing + histogram /metrics) ---
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.stage_timings = []
+    g.query_counter = query_stats.start()
+    # App context bisa dipakai ulang (mis. test client di dalam app_context): cache request lama dibuang
+    g.pop('user_settings', None)
+    g.pop('folders', None)
+
+@app.after_request
+def add_server_timing(response):
+    start = g.get('request_start')
+    if start is None: return response
+    total = time.perf_counter() - start
+    endpoint = request.endpoint or 'unknown'
+    queries = query_stats.stop(g.query_counter)
+    metrics.observe('http_request_duration_seconds', total, endpoint=endpoint)
+    metrics.observe('db_queries_per_request', queries.count, buckets=query_stats.QUERY_BUCKETS, endpoint=endpoint)
+    # Jumlah query ikut tampil di tab Network/Timing browser (desc entry "db")
+    timing = server_timing_header(g.get('stage_timings', []), total)
+    response.headers['Server-Timing'] = f'{timing}, db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries"'
+    if app.config['QUERY_LOG'] or app.debug:
+        print(f"[query] {request.method} {request.path} {response.status_code}: "
+              f"{queries.count} query, {queries.seconds * 1000:.1f} ms DB, {total * 1000:.1f} ms total")
+    return response
+
+# Didaftarkan setelah Server-Timing: dijalankan lebih dulu, jadi waktu kompresi ikut tercatat
+@app.after_request
+def compress(response):
+    if not app.config['COMPRESS_RESPONSES']: return response
+    return compress_response(response, request.accept_encodings, app.config['COMPRESS_MIN_SIZE'],
+                             app.config['COMPRESS_GZIP_LEVEL'], app.config['COMPRESS_BROTLI_QUALITY'])
+
+@app.teardown_request
+def stop_query_counter(exc):
+    # Request yang gagal sebelum after_request: counter tetap dilepas dari thread
+    if 'query_counter' in g: query_stats.stop(g.query_counter)
+
+# --- CACHE PER REQUEST (user/settings/folder yang sama tidak di-query ulang) ---
+def request_cached(name, key, loader):
+    # Disimpan di g: hilang saat request (atau app context job background) selesai
+    if not has_app_context(): return loader()
+    cache = g.setdefault(name, {})
+    if key not in cache: cache[key] = loader()
+    return cache[key]
+
+def get_user_settings(user_id):
+    return request_cached('user_settings', user_id, lambda: GlobalSettings.query.filter_by(user_id=user_id).first())
+
+def get_folder_or_404(folder_id, with_related=False):
+    # Primary key lewat identity map session; kategori & jadwal laporan (halaman pengaturan)
+    # di-load sekaligus jika dipakai, bukan lazy-load per atribut di template
+    if not with_related: return db.get_or_404(MonitorFolder, folder_id)
+    return request_cached('folders', folder_id, lambda: MonitorFolder.query.options(
+        joinedload(MonitorFolder.categories), selectinload(MonitorFolder.reports)).filter_by(id=folder_id).first_or_404())
+
+# --- [HELPER] BATAS HASH PASSWORD PER IP & USERNAME ---
+def hash_keys(username):
+    return [('ip', request.remote_addr), ('user', (username or '').strip().lower())]
+
 # --- [HELPER] GENERATE RECOVERY CODE ---
 def generate_recovery_code(length=8):
     chars = string.ascii_uppercase + string.digits
@@ -49,12 +241,9 @@ def generate_recovery_code(length=8):
     return f"{part1}-{part2}"
 
 # --- HELPER: GOOGLE CLIENT ---
-def get_google_client():
-    if not current_user.is_authenticated: return None
-    settings = GlobalSettings.query.filter_by(user_id=current_user.id).first()
-    if not settings or not settings.google_creds_encrypted: return None
+def build_google_client(creds_encrypted):
     try:
-        creds_json = crypto.decrypt(settings.google_creds_encrypted)
+        creds_json = crypto.decrypt(creds_encrypted)
         creds_dict = json.loads(creds_json)
         scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
         creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
@@ -64,125 +253,159 @@ def get_google_client():
         print(f"Auth Error: {e}")
         return None
 
+def get_google_client(user_id=None):
+    # user_id diisi oleh job background (tidak ada current_user di luar request)
+    if user_id is None:
+        if not current_user.is_authenticated: return None
+        user_id = current_user.id
+    settings = get_user_settings(user_id)
+    if not settings or not settings.google_creds_encrypted: return None
+    with timed('google_auth'):
+        return google_pool.get(user_id, settings.google_creds_encrypted, build_guarded_client)
+
+def build_guarded_client(creds_encrypted):
+    # Semua panggilan Google lewat google_api (kuota, retry, circuit breaker)
+    client = build_google_client(creds_encrypted)
+    return google_api.wrap(client, account_key(client, creds_encrypted))
+
+# --- HELPER: AMBIL DATA WORKSHEET (lewat cache, hanya sel & kolom yang dipakai) ---
+def get_sheet_extracts(client, folder, sheet_names, force_refresh=False, revalidate=False):
+    url = folder.spreadsheet_url
+    plan = plan_cache.get(folder)
+    result, stale, headers = {}, {}, dict(plan.headers)
+    for name in sheet_names:
+        entry = sheet_cache.get(url, name)
+        if not entry: continue
+        # Entry dari konfigurasi folder yang lain (sel/kolom berbeda) tidak bisa dipakai
+        if entry.values.get('plan') != plan.signature: continue
+        extract = SheetExtract.from_dict(entry.values['extract'])
+        extract.revision = entry.revision
+        # Posisi header tetap dipakai saat force refresh agar tidak perlu probe ulang
+        headers[name] = extract.header
+        if force_refresh: continue
+        # revalidate (sinkron background): abaikan TTL, tetap lewat cek revisi
+        if entry.is_fresh and not revalidate: result[name] = extract
+        else: stale[name] = (entry, extract)
+    missing = [n for n in sheet_names if n not in result]
+    fresh = len(result)
+    metrics.inc('sheet_cache_lookups_total', fresh, result='fresh')
+    if not missing: return result
+
+    # TTL habis: satu cek revisi untuk seluruh spreadsheet
+    with timed('google_revision'):
+        revision = get_sheet_revision(client, url)
+    for name, (entry, extract) in stale.items():
+        if revision and entry.revision == revision:
+            sheet_cache.touch(url, name)
+            result[name] = extract
+            missing.remove(name)
+    metrics.inc('sheet_cache_lookups_total', len(result) - fresh, result='revision_hit')
+    metrics.inc('sheet_cache_lookups_total', len(missing), result='miss')
+    if not missing: return result
+
+    waiting_since = time.time()
+    with single_flight.process_lock([(url, name) for name in missing]):
+        # Selama menunggu lock, worker lain mungkin sudah mengambil sheet yang sama
+        for name in list(missing):
+            entry = sheet_cache.get(url, name)
+            if entry and entry.fetched_at >= waiting_since and entry.values.get('plan') == plan.signature:
+                result[name] = SheetExtract.from_dict(entry.values['extract'])
+                result[name].revision = entry.revision
+                missing.remove(name)
+                metrics.inc('single_flight_deduplicated_total', scope='process')
+        if not missing: return result
+
+        try:
+            with timed('google_fetch'):
+                fetched = snapshot_store.sync(lambda: client.open_by_url(url), folder, plan, missing,
+                                              revision, force_refresh, headers)
+        except Exception as e:
+            # Google lambat / kena limit / circuit terbuka -> pakai data terakhir yang bagus
+            fetched = snapshot_store.load(folder, plan, missing)
+            fetched.update({n: extract for n, (entry, extract) in stale.items() if n in missing and n not in fetched})
+            if len(fetched) < len(missing): raise
+            print(f"Sync Error, memakai data lokal terakhir: {e}")
+            # Tidak ditulis ke cache: isinya belum tentu sesuai revisi terbaru
+            result.update(fetched)
+            return result
+
+        plan.headers.update({n: e.header for n, e in fetched.items() if e.header})
+        for name, extract in fetched.items():
+            sheet_cache.put(url, name, {'plan': plan.signature, 'extract': extract.to_dict()}, revision)
+            extract.revision = revision
+            result[name] = extract
+    return result
+
 # --- HELPER: FETCH DATA ---
-def fetch_sheet_data(folder, sheet_name):
-    client = get_google_client()
-    if not client: return None, None, {}, {}, {}, "Akun Google belum diatur."
-    
-    try:
-        sheet = client.open_by_url(folder.spreadsheet_url)
-        worksheet = sheet.worksheet(sheet_name)
-        raw_data = worksheet.get_all_values()
-        
-        if not raw_data: return None, None, {}, {}, {}, "Sheet kosong."
+def fetch_sheet_data(folder, sheet_name, force_refresh=False, client=None, revalidate=False):
+    client = client or get_google_client()
+    if not client: return None, {}, {}, {}, "Akun Google belum diatur."
 
-        def clean_indo_number(val):
-            try:
-                s = str(val).replace('Rp', '').strip().replace('.', '').replace(',', '.')
-                return float(s) if s else 0
-            except: return 0
+    def load():
+        try:
+            extract = get_sheet_extracts(client, folder, [sheet_name], force_refresh, revalidate).get(sheet_name)
 
-        def get_cell_value(addr):
-            try:
-                if not addr: return 0
-                row, col = a1_to_rowcol(addr.strip())
-                val = raw_data[row-1][col-1]
-                return clean_indo_number(val)
-            except: return 0
-            
-        def sum_cells(cell_list_str):
-            if not cell_list_str: return 0
-            total = 0
-            cells = cell_list_str.split(',')
-            for cell in cells:
-                if cell.strip():
-                    total += get_cell_value(cell)
-            return total
-
-        # Summary
-        sum_kotor = {
-            'income': f"{get_cell_value(folder.cell_addr_income):,.0f}",
-            'expense': f"{get_cell_value(folder.cell_addr_expense):,.0f}",
-            'balance': f"{get_cell_value(folder.cell_addr_balance):,.0f}"
-        }
-        
-        clean_inc_val = sum_cells(folder.clean_income_cells)
-        clean_exp_val = sum_cells(folder.clean_expense_cells)
-        clean_bal_val = clean_inc_val - clean_exp_val
-        sum_clean = {
-            'income': f"{clean_inc_val:,.0f}",
-            'expense': f"{clean_exp_val:,.0f}",
-            'balance': f"{clean_bal_val:,.0f}"
-        }
-
-        # Pie Chart
-        pie_data = {
-            'clean_inc': {'labels': [], 'data': []},
-            'clean_exp': {'labels': [], 'data': []},
-            'dirty_inc': {'labels': [], 'data': []},
-            'dirty_exp': {'labels': [], 'data': []}
-        }
-
-        for cat in folder.categories:
-            val = get_cell_value(cat.cell_addr)
-            if val > 0:
-                if cat.type == 'income':
-                    pie_data['dirty_inc']['labels'].append(cat.name)
-                    pie_data['dirty_inc']['data'].append(val)
-                else:
-                    pie_data['dirty_exp']['labels'].append(cat.name)
-                    pie_data['dirty_exp']['data'].append(val)
-                
-                if cat.is_clean:
-                    if cat.type == 'income':
-                        pie_data['clean_inc']['labels'].append(cat.name)
-                        pie_data['clean_inc']['data'].append(val)
-                    else:
-                        pie_data['clean_exp']['labels'].append(cat.name)
-                        pie_data['clean_exp']['data'].append(val)
-
-        # Trend Chart Logic
-        df_dirty = pd.DataFrame()
-        df_clean = pd.DataFrame()
-        
-        header_index = 0
-        found = False
-        for i, row in enumerate(raw_data):
-            if folder.col_date in row:
-                header_index = i
-                found = True
-                break
-        
-        if found and len(raw_data) > header_index + 1:
-            df = pd.DataFrame(raw_data[header_index+1:], columns=raw_data[header_index])
-            
-            if folder.col_income in df.columns:
-                df[folder.col_income] = df[folder.col_income].apply(clean_indo_number)
-            if folder.col_expense in df.columns:
-                df[folder.col_expense] = df[folder.col_expense].apply(clean_indo_number)
-            
-            df[folder.col_date] = pd.to_datetime(df[folder.col_date], errors='coerce')
-            
-            df_dirty = df.copy()
-            df_clean = df.copy()
-            keywords = [k.strip().lower() for k in folder.debt_keywords.split(',') if k.strip()]
-            
-            if folder.col_source_income in df_clean.columns:
-                mask_debt_inc = df_clean[folder.col_source_income].astype(str).str.lower().apply(
-                    lambda x: any(k in x for k in keywords)
-                )
-                df_clean.loc[mask_debt_inc, folder.col_income] = 0
+            if not extract or extract.is_empty: return None, {}, {}, {}, "Sheet kosong."
 
-            if folder.col_source_expense in df_clean.columns:
-                mask_debt_exp = df_clean[folder.col_source_expense].astype(str).str.lower().apply(
-                    lambda x: any(k in x for k in keywords)
-                )
-                df_clean.loc[mask_debt_exp, folder.col_expense] = 0
+            with timed('parse'):
+                transactions, sum_kotor, sum_clean, pie_data = parse_sheet_values(plan_cache.get(folder), extract)
+            return transactions, format_summary(sum_kotor), format_summary(sum_clean), pie_data, None
 
-        return df_dirty, df_clean, sum_kotor, sum_clean, pie_data, None
+        except Exception as e:
+            return None, {}, {}, {}, str(e)
 
-    except Exception as e:
-        return None, None, {}, {}, {}, str(e)
+    # Request identik yang bersamaan (tab lain, anggota keluarga) berbagi satu fetch + parse
+    return single_flight.do(('month', folder.id, sheet_name, force_refresh, revalidate), load)
+
+YEAR_VIEW_LABEL = 'Setahun Penuh'
+
+# --- HELPER: FETCH DATA SETAHUN (semua bulan dalam satu batch) ---
+def fetch_year_data(folder, force_refresh=False, client=None, revalidate=False):
+    client = client or get_google_client()
+    if not client: return {}, {}, {}, {}, {}, "Akun Google belum diatur."
+
+    def load():
+        try:
+            sheet_names = folder.get_sheet_list()
+            extracts = get_sheet_extracts(client, folder, sheet_names, force_refresh, revalidate)
+
+            total_kotor = {'income': 0, 'expense': 0, 'balance': 0}
+            total_clean = {'income': 0, 'expense': 0, 'balance': 0}
+            chart_dirty = {'labels': [], 'income': [], 'expense': []}
+            chart_clean = {'labels': [], 'income': [], 'expense': []}
+            pie_totals = {key: {} for key in empty_pie_data()}
+
+            for name in sheet_names:
+                extract = extracts.get(name)
+                if not extract or extract.is_empty: continue
+                with timed('parse'):
+                    transactions, sum_kotor, sum_clean, pies = parse_sheet_values(plan_cache.get(folder), extract)
+
+                for key in total_kotor:
+                    total_kotor[key] += sum_kotor[key]
+                    total_clean[key] += sum_clean[key]
+
+                # Trend per bulan: total transaksi tiap worksheet
+                for chart, clean in ((chart_dirty, False), (chart_clean, True)):
+                    income, expense = transactions.totals(clean) if transactions else (0, 0)
+                    chart['labels'].append(name)
+                    chart['income'].append(income)
+                    chart['expense'].append(expense)
+
+                for key, pie in pies.items():
+                    for label, val in zip(pie['labels'], pie['data']):
+                        pie_totals[key][label] = pie_totals[key].get(label, 0) + val
+
+            if not chart_dirty['labels']: return {}, {}, {}, {}, {}, "Sheet kosong."
+
+            pie_data = {key: {'labels': list(vals.keys()), 'data': list(vals.values())}
+                        for key, vals in pie_totals.items()}
+            return format_summary(total_kotor), format_summary(total_clean), chart_dirty, chart_clean, pie_data, None
+
+        except Exception as e:
+            return {}, {}, {}, {}, {}, str(e)
+
+    return single_flight.do(('year', folder.id, force_refresh, revalidate), load)
 
 # --- ROUTES AUTH ---
 
@@ -195,9 +418,24 @@ def login():
         return redirect(url_for('home'))
         
     if request.method == 'POST':
-        user = User.query.filter_by(username=request.form.get('username')).first()
-        if user and bcrypt.check_password_hash(user.password, request.form.get('password')):
+        username, password = request.form.get('username'), request.form.get('password')
+        user = User.query.filter_by(username=username).first()
+        try:
+            valid = user and password_hasher.check(user.password, password, hash_keys(username))
+        except HashBusyError as e:
+            flash(str(e), 'warning')
+            return render_template('login.html'), 429
+        if valid:
+            if password_hasher.needs_rehash(user.password):
+                # Cost bcrypt diubah: hash ulang sekarang selagi password asli tersedia. Tidak wajib:
+                # pool sibuk -> login tetap berhasil, hash ulang dicoba lagi di login berikutnya
+                try:
+                    user.password = password_hasher.hash(password, hash_keys(username))
+                except HashBusyError:
+                    app.logger.warning("Hash ulang password %s ditunda: pool hash sibuk", username)
             login_user(user)
+            user.last_login_at = datetime.utcnow()
+            db.session.commit()
             return redirect(url_for('home'))
         flash('Login gagal. Periksa username atau password Anda.', 'danger')
     return render_template('login.html')
@@ -217,7 +455,7 @@ def register():
             return redirect(url_for('register'))
             
         try:
-            hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+            hashed_password = password_hasher.hash(password, hash_keys(username))
             rec_code = generate_recovery_code()
             new_user = User(username=username, password=hashed_password, recovery_code=rec_code)
             db.session.add(new_user)
@@ -227,6 +465,9 @@ def register():
         except IntegrityError:
             db.session.rollback()
             flash('Username sudah digunakan.', 'warning')
+        except HashBusyError as e:
+            flash(str(e), 'warning')
+            return render_template('register.html'), 429
         except Exception as e:
             db.session.rollback()
             flash(f'Terjadi kesalahan: {str(e)}', 'danger')
@@ -252,7 +493,11 @@ def forgot_password():
             flash('Password baru tidak sama.', 'warning')
             return redirect(url_for('forgot_password'))
 
-        user.password = bcrypt.generate_password_hash(new_pass).decode('utf-8')
+        try:
+            user.password = password_hasher.hash(new_pass, hash_keys(username))
+        except HashBusyError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('forgot_password'))
         new_rec_code = generate_recovery_code()
         user.recovery_code = new_rec_code
         db.session.commit()
@@ -277,7 +522,11 @@ def profile():
         if len(new_password) < 6:
             flash('Gagal: Password minimal 6 karakter.', 'danger')
             return redirect(url_for('profile', origin=origin, folder_id=folder_id))
-        current_user.password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        try:
+            current_user.password = password_hasher.hash(new_password, hash_keys(current_user.username))
+        except HashBusyError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('profile', origin=origin, folder_id=folder_id))
         db.session.commit()
         flash('Berhasil: Password Anda telah diubah!', 'success')
         return redirect(url_for('profile', origin=origin, folder_id=folder_id))
@@ -290,7 +539,7 @@ def profile():
 def home():
     # Halaman ini sekarang adalah HUB UTAMA (Pilih Tipe Dashboard)
     # Kita hanya perlu cek apakah API Key ada untuk mengaktifkan tombol
-    global_set = GlobalSettings.query.filter_by(user_id=current_user.id).first()
+    global_set = get_user_settings(current_user.id)
     has_creds = False
     if global_set and global_set.google_creds_encrypted:
         has_creds = True
@@ -306,7 +555,7 @@ def select_year():
 @app.route('/settings/global', methods=['GET', 'POST'])
 @login_required
 def settings_global():
-    sett = GlobalSettings.query.filter_by(user_id=current_user.id).first()
+    sett = get_user_settings(current_user.id)
 
     # Tangkap state navigasi
     origin = request.args.get('origin', 'home')
@@ -317,6 +566,7 @@ def settings_global():
         if sett:
             sett.google_creds_encrypted = None
             db.session.commit()
+            google_pool.invalidate(current_user.id)
             flash('Service Account berhasil dihapus.', 'warning')
         return redirect(url_for('settings_global', origin=origin, folder_id=folder_id))
 
@@ -343,6 +593,7 @@ def settings_global():
                 sett.google_creds_encrypted = enc
             
             db.session.commit()
+            google_pool.invalidate(current_user.id)
             flash('Service Account berhasil ditambahkan!', 'success')
             return redirect(url_for('settings_global', origin=origin, folder_id=folder_id))
             
@@ -376,10 +627,16 @@ def create_folder():
     # Redirect kembali ke halaman pilih tahun, bukan home utama
     return redirect(url_for('select_year'))
 
+def folder_config_changed(folder):
+    # Versi baru -> plan ekstraksi dikompilasi ulang (juga di worker lain) & data dashboard disinkron ulang
+    folder.config_version = (folder.config_version or 0) + 1
+    plan_cache.invalidate(folder.id)
+    dashboard_sync.invalidate(folder.id)
+
 @app.route('/folder/<int:folder_id>/settings', methods=['GET', 'POST'])
 @login_required
 def folder_settings(folder_id):
-    folder = MonitorFolder.query.get_or_404(folder_id)
+    folder = get_folder_or_404(folder_id, with_related=request.method == 'GET')
     if folder.user_id != current_user.id: return redirect(url_for('home'))
 
     origin = request.args.get('origin', 'dash')
@@ -404,10 +661,12 @@ def folder_settings(folder_id):
         
         folder.clean_income_cells = request.form['clean_income_cells']
         folder.clean_expense_cells = request.form['clean_expense_cells']
+        folder.refresh_interval = max(int(request.form.get('refresh_interval') or 300), 60)
         
+        folder_config_changed(folder)
         db.session.commit()
         flash('Konfigurasi Tahun berhasil disimpan.', 'success')
-        return redirect(url_for('folder_settings', folder_id=folder.id, origin=origin))
+        return redirect(url_for('folder_settings', folder_id=folder_id, origin=origin))
     
     cats_income = [c for c in folder.categories if c.type == 'income']
     cats_expense = [c for c in folder.categories if c.type == 'expense']
@@ -416,7 +675,7 @@ def folder_settings(folder_id):
 @app.route('/folder/<int:folder_id>/category/add', methods=['POST'])
 @login_required
 def add_category(folder_id):
-    folder = MonitorFolder.query.get_or_404(folder_id)
+    folder = get_folder_or_404(folder_id)
     if folder.user_id != current_user.id: return redirect(url_for('home'))
     name = request.form.get('cat_name')
     addr = request.form.get('cat_addr')
@@ -425,42 +684,54 @@ def add_category(folder_id):
     if name and addr and tipe:
         new_cat = CategoryMap(folder_id=folder.id, name=name, cell_addr=addr, type=tipe, is_clean=is_clean)
         db.session.add(new_cat)
+        folder_config_changed(folder)
         db.session.commit()
         label = "Pemasukan" if tipe == 'income' else "Pengeluaran"
         flash(f'Kategori {label} berhasil ditambahkan!', 'success')
-    return redirect(url_for('folder_settings', folder_id=folder.id))
+    return redirect(url_for('folder_settings', folder_id=folder_id))
 
 @app.route('/category/delete/<int:cat_id>')
 @login_required
 def delete_category(cat_id):
-    cat = CategoryMap.query.get_or_404(cat_id)
-    folder = MonitorFolder.query.get(cat.folder_id)
+    cat = CategoryMap.query.options(joinedload(CategoryMap.folder)).filter_by(id=cat_id).first_or_404()
+    folder = cat.folder
     if folder.user_id != current_user.id: return redirect(url_for('home'))
+    folder_id = folder.id
     db.session.delete(cat)
+    folder_config_changed(folder)
     db.session.commit()
-    return redirect(url_for('folder_settings', folder_id=folder.id))
+    return redirect(url_for('folder_settings', folder_id=folder_id))
 
-@app.route('/folder/<int:folder_id>/dashboard')
-@login_required
-def dashboard(folder_id):
-    folder = MonitorFolder.query.get_or_404(folder_id)
-    if folder.user_id != current_user.id: return redirect(url_for('home'))
-    
-    sheet_list = folder.get_sheet_list()
-    selected_month = request.args.get('month', sheet_list[0] if sheet_list else 'Sheet1')
-    
-    # ... logic dashboard sama ...
-    sum_kotor = {'income': 0, 'expense': 0, 'balance': 0}
-    sum_clean = {'income': 0, 'expense': 0, 'balance': 0}
-    chart_clean = {'labels': [], 'income': [], 'expense': []}
-    chart_dirty = {'labels': [], 'income': [], 'expense': []}
-    pie_data = {
-        'clean_inc': {'labels': [], 'data': []}, 'clean_exp': {'labels': [], 'data': []},
-        'dirty_inc': {'labels': [], 'data': []}, 'dirty_exp': {'labels': [], 'data': []}
-    }
+# --- HELPER: HITUNG DATA DASHBOARD ---
+def build_trend_charts(transactions, chart_dirty, chart_clean):
+    # Trend harian kotor & bersih: total pemasukan/pengeluaran per tanggal
+    try:
+        with timed('aggregate'):
+            return transactions.daily()
+    except: return chart_dirty, chart_clean
+
+def empty_dashboard_data():
+    return {'sum_kotor': {'income': 0, 'expense': 0, 'balance': 0},
+            'sum_clean': {'income': 0, 'expense': 0, 'balance': 0},
+            'chart_dirty': {'labels': [], 'income': [], 'expense': []},
+            'chart_clean': {'labels': [], 'income': [], 'expense': []},
+            'pie_data': empty_pie_data(), 'error_msg': None}
+
+def build_dashboard_data(folder, selected_month, year_view, force_refresh=False, client=None, revalidate=False):
+    empty = empty_dashboard_data()
+    sum_kotor, sum_clean = empty['sum_kotor'], empty['sum_clean']
+    chart_clean, chart_dirty = empty['chart_clean'], empty['chart_dirty']
+    pie_data = empty['pie_data']
     error_msg = None
 
-    df_dirty, df_clean, kotor, clean, pies, err = fetch_sheet_data(folder, selected_month)
+    if year_view:
+        # Mode setahun: semua bulan diambil dalam satu batch, trend per bulan
+        transactions = None
+        kotor, clean, trend_dirty, trend_clean, pies, err = fetch_year_data(folder, force_refresh, client, revalidate)
+        if trend_dirty: chart_dirty = trend_dirty
+        if trend_clean: chart_clean = trend_clean
+    else:
+        transactions, kotor, clean, pies, err = fetch_sheet_data(folder, selected_month, force_refresh, client, revalidate)
     
     if kotor: sum_kotor = kotor
     if clean: sum_clean = clean
@@ -473,29 +744,493 @@ def dashboard(folder_id):
         
     if err: error_msg = err
 
-    if df_dirty is not None and not df_dirty.empty:
+    if transactions is not None and not transactions.is_empty:
+        chart_dirty, chart_clean = build_trend_charts(transactions, chart_dirty, chart_clean)
+
+    return {'sum_kotor': sum_kotor, 'sum_clean': sum_clean,
+            'chart_dirty': chart_dirty, 'chart_clean': chart_clean,
+            'pie_data': pie_data, 'error_msg': error_msg}
+
+# --- SINKRON BACKGROUND DASHBOARD ---
+def dashboard_key(folder, selected_month, year_view):
+    # config_version ikut di key (seperti PlanCache): konfigurasi diubah di worker lain -> key baru,
+    # hasil dengan kolom/sel/kategori lama tidak dipakai lagi tanpa perlu sinyal antar proses
+    return (folder.id, selected_month, year_view, folder.config_version or 0)
+
+def refresh_dashboard(key):
+    folder_id, selected_month, year_view, version = key
+    with app.app_context():
+        folder = db.session.get(MonitorFolder, folder_id)
+        if not folder or (folder.config_version or 0) != version:
+            dashboard_sync.forget(key)
+            return None
+        client = get_google_client(folder.user_id)
+        if not client: return None
+        data = build_dashboard_data(folder, selected_month, year_view, client=client, revalidate=True)
+        # Gagal ambil data -> pertahankan hasil terakhir yang bagus
+        return None if data['error_msg'] else data
+
+dashboard_sync = SyncScheduler(refresh_dashboard,
+                               max_workers=app.config['SYNC_MAX_WORKERS'],
+                               tick=app.config['SYNC_TICK'],
+                               recent_window=app.config['SYNC_RECENT_WINDOW'])
+
+def parse_dashboard_args(folder):
+    sheet_list = folder.get_sheet_list()
+    year_view = request.args.get('view') == 'year'
+    selected_month = YEAR_VIEW_LABEL if year_view else request.args.get('month', sheet_list[0] if sheet_list else 'Sheet1')
+    return sheet_list, selected_month, year_view, request.args.get('refresh') == '1'
+
+def format_as_of(as_of):
+    return datetime.fromtimestamp(as_of).strftime('%d %b %Y, %H:%M') if as_of else None
+
+def chart_points():
+    # ?points= dari dashboard.js (lebar grafik dalam piksel); halaman pertama belum tahu lebar layar
+    points = request.args.get('points', type=int)
+    if points is None: return app.config['CHART_POINTS']
+    return max(CHART_MIN_POINTS, min(points, app.config['CHART_MAX_POINTS']))
+
+def compact_chart_data(data):
+    return compact_dashboard(data, chart_points(), app.config['CHART_PIE_SLICES'])
+
+@app.route('/folder/<int:folder_id>/dashboard')
+@login_required
+def dashboard(folder_id):
+    # Kategori tidak di-load: hanya dibutuhkan saat plan ekstraksi dikompilasi ulang
+    folder = get_folder_or_404(folder_id)
+    if folder.user_id != current_user.id: return redirect(url_for('home'))
+    
+    sheet_list, selected_month, year_view, force_refresh = parse_dashboard_args(folder)
+
+    # Halaman langsung dikirim; grafik diisi dashboard.js dari /dashboard/data.
+    # Jika hasil terakhir sudah ada, ikut disisipkan agar tidak perlu request kedua.
+    key = dashboard_key(folder, selected_month, year_view)
+    data, as_of = dashboard_sync.get(key, folder.refresh_interval or app.config['SYNC_DEFAULT_INTERVAL'])
+    initial_data = None
+    if data is not None and not force_refresh:
+        if dashboard_sync.is_stale(key): dashboard_sync.request_refresh(key)
+        dashboard_sync.start()
+        data = compact_chart_data(data)
+        initial_data = dict(data, as_of=format_as_of(as_of), refreshing=dashboard_sync.is_refreshing(key))
+
+    with timed('render'):
+        return render_template('dashboard.html', 
+                               folder=folder, sheet_list=sheet_list, selected_month=selected_month, year_view=year_view,
+                               force_refresh=force_refresh, initial_data=initial_data,
+                               data_as_of=format_as_of(as_of) if initial_data else None,
+                               refreshing=initial_data['refreshing'] if initial_data else False,
+                               **(data if initial_data else empty_dashboard_data()))
+
+@app.route('/folder/<int:folder_id>/dashboard/data')
+@login_required
+def dashboard_data(folder_id):
+    folder = get_folder_or_404(folder_id)
+    if folder.user_id != current_user.id: abort(404)
+
+    sheet_list, selected_month, year_view, force_refresh = parse_dashboard_args(folder)
+
+    # Stale-while-revalidate: pakai hasil terakhir, perbarui di background jika sudah basi
+    key = dashboard_key(folder, selected_month, year_view)
+    interval = folder.refresh_interval or app.config['SYNC_DEFAULT_INTERVAL']
+    data, as_of = dashboard_sync.get(key, interval)
+    if data is None or force_refresh:
+        data = build_dashboard_data(folder, selected_month, year_view, force_refresh)
+        as_of = time.time()
+        if not data['error_msg']: dashboard_sync.put(key, data, as_of)
+    elif dashboard_sync.is_stale(key):
+        dashboard_sync.request_refresh(key)
+    dashboard_sync.start()
+
+    # ETag dari isi data (bukan waktu sinkron): data sama -> 304 tanpa body
+    with timed('serialize'):
+        data = compact_chart_data(data)
+        etag = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        resp = jsonify(dict(data, as_of=format_as_of(as_of), refreshing=dashboard_sync.is_refreshing(key)))
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp.make_conditional(request)
+
+# --- EXPORT TRANSAKSI (streaming per worksheet) ---
+metrics.describe('export_errors_total', 'Export transaksi yang gagal (sebelum / saat streaming)')
+
+def export_sheet_names(client, folder):
+    # Cek sebelum response dimulai (sheet yang gagal -> pesan error, bukan file 200 yang terpotong)
+    # lewat metadata snapshot saja. Sheet yang belum pernah diambil di-sync satu per satu; isinya
+    # tidak disimpan di memori, nanti dibaca lagi dari cache saat streaming.
+    sheet_names = folder.get_sheet_list()
+    synced = set(snapshot_store.synced_sheets(folder.id, plan_cache.get(folder), sheet_names))
+    missing = []
+    for name in sheet_names:
+        if name in synced: continue
         try:
-            grp = df_dirty.groupby(df_dirty[folder.col_date].dt.date).sum(numeric_only=True).reset_index()
-            chart_dirty['labels'] = grp[folder.col_date].astype(str).tolist()
-            chart_dirty['income'] = grp[folder.col_income].tolist() if folder.col_income in grp else []
-            chart_dirty['expense'] = grp[folder.col_expense].tolist() if folder.col_expense in grp else []
-        except: pass
+            if name not in get_sheet_extracts(client, folder, [name]): missing.append(name)
+        except Exception as e:
+            app.logger.warning("Export: sheet %s gagal diambil: %s", name, e)
+            missing.append(name)
+    if missing: raise ExportError(f"Sheet {', '.join(missing)} gagal diambil dari Google.")
+    return sheet_names
+
+def export_chunks(client, folder, sheet_names, fmt, clean, start, end, categories):
+    plan = plan_cache.get(folder)
+    def load_extract(name):
+        # Satu worksheet di memori dalam satu waktu; gagal di tengah -> error diteruskan ke streaming
+        extract = get_sheet_extracts(client, folder, [name]).get(name)
+        if extract is None: raise ExportError(f"Sheet {name} gagal diambil dari Google.")
+        return extract
+    frames = iter_frames(plan, sheet_names, load_extract, clean, start, end, categories)
+    return iter_export(fmt, frames)
+
+@app.route('/folder/<int:folder_id>/export')
+@login_required
+def export_folder(folder_id):
+    folder = get_folder_or_404(folder_id)
+    if folder.user_id != current_user.id: abort(404)
+    fmt = request.args.get('format', 'csv')
+    mode = 'clean' if request.args.get('mode') == 'clean' else 'raw'
+    try:
+        if fmt not in FORMATS: raise ExportError("Format export tidak dikenal.")
+        if fmt == 'parquet' and not parquet_available(): raise ExportError("Export Parquet membutuhkan paket pyarrow.")
+        start, end, categories = parse_filters(request.args.get('start'), request.args.get('end'),
+                                               request.args.getlist('category'))
+        client = get_google_client()
+        if not client: raise ExportError("Akun Google belum diatur.")
+        sheet_names = export_sheet_names(client, folder)
+    except Exception as e:
+        if not isinstance(e, ExportError):
+            metrics.inc('export_errors_total', stage='fetch')
+            app.logger.exception("Export folder %s gagal", folder_id)
+        flash(str(e), 'danger')
+        return redirect(url_for('dashboard', folder_id=folder_id))
 
-    if df_clean is not None and not df_clean.empty:
+    mimetype, ext = FORMATS[fmt]
+    filename = secure_filename(f"{folder.name}-{mode}.{ext}") or f"export.{ext}"
+    def chunks():
         try:
-            grp = df_clean.groupby(df_clean[folder.col_date].dt.date).sum(numeric_only=True).reset_index()
-            chart_clean['labels'] = grp[folder.col_date].astype(str).tolist()
-            chart_clean['income'] = grp[folder.col_income].tolist() if folder.col_income in grp else []
-            chart_clean['expense'] = grp[folder.col_expense].tolist() if folder.col_expense in grp else []
-        except: pass
-
-    return render_template('dashboard.html', 
-                           folder=folder, sheet_list=sheet_list, selected_month=selected_month,
-                           sum_kotor=sum_kotor, sum_clean=sum_clean,
-                           chart_dirty=chart_dirty, chart_clean=chart_clean,
-                           pie_data=pie_data, error_msg=error_msg)
+            yield from export_chunks(client, folder, sheet_names, fmt, mode == 'clean', start, end, categories)
+        except Exception:
+            # Header sudah terkirim: error diteruskan agar koneksi diputus (download gagal di sisi
+            # user), bukan diakhiri normal dengan file yang terpotong
+            metrics.inc('export_errors_total', stage='stream')
+            app.logger.exception("Export folder %s terputus", folder_id)
+            raise
 
-if __name__ == '__main__':
+    return Response(stream_with_context(chunks()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'Cache-Control': 'private, no-store'})
+
+# --- INPUT TRANSAKSI LEWAT API (antrian -> satu values_append per worksheet) ---
+def flush_ingest(folder_id, sheets):
+    # sheets: {nama worksheet: [QueuedRow]} -> {nama worksheet: None (terkirim) / error}
     with app.app_context():
-        db.create_all()
+        folder = db.session.get(MonitorFolder, folder_id)
+        if not folder: raise IngestError("Folder sudah dihapus.")
+        client = get_google_client(folder.user_id)
+        if not client: raise IngestError("Akun Google belum diatur.")
+        plan = plan_cache.get(folder)
+        try:
+            # Posisi header dari cache/snapshot (biasanya tanpa download) + revisi & versi sebelum menulis
+            extracts = get_sheet_extracts(client, folder, list(sheets))
+            revision, version = get_sheet_version(client, folder.spreadsheet_url)
+            spreadsheet = client.open_by_url(folder.spreadsheet_url)
+        except Exception as e:
+            # Belum ada yang ditulis -> aman dicoba lagi nanti
+            raise GoogleApiError(str(e)) from e
+
+        results, written = {}, {}
+        for name, batch in sheets.items():
+            extract = extracts.get(name)
+            if not extract or not extract.header_row:
+                results[name] = IngestError(f"Header '{folder.col_date}' tidak ditemukan di sheet '{name}'.")
+                continue
+            try:
+                values = [sheet_row(folder, extract.col_index, r.values) for r in batch]
+                width = max(len(v) for v in values)
+                resp = spreadsheet.values_append(
+                    absolute_range_name(name, f"A{extract.header_row}"),
+                    {'valueInputOption': 'USER_ENTERED', 'insertDataOption': 'INSERT_ROWS'},
+                    {'values': [v + [''] * (width - len(v)) for v in values]})
+                written[name] = (len(batch), extract.col_index, appended_start(resp, extract.header_row),
+                                 updated_range(resp))
+                results[name] = None
+            except Exception as e:
+                results[name] = e
+        if written: apply_ingested(client, folder, plan, spreadsheet, written, revision, version)
+        return results
+
+def apply_ingested(client, folder, plan, spreadsheet, written, revision_before, version_before):
+    # Baris yang baru ditulis dibaca ulang dari sheet (tanggal/angka dalam format sheet itu sendiri)
+    # bersama sel rumus (total/kategori) semua bulan dalam satu batch kecil, lalu langsung masuk
+    # snapshot & cache tanpa download ulang; hanya untuk sheet yang snapshot-nya berada di revision_before.
+    # Data hasil patch tetap bertanda revision_before (modifiedTime tidak bisa membedakan append kita dari
+    # edit lain di saat yang sama), jadi sinkron berikutnya memverifikasi tail-nya ke Google. Versi Drive
+    # hanya petunjuk: tidak naik persis sebanyak append kita -> kemungkinan ada perubahan lain -> ambil ulang penuh.
+    url = folder.spreadsheet_url
+    try:
+        cells, rows = fetch_written(spreadsheet, plan, folder.get_sheet_list(),
+                                    {name: w[3] for name, w in written.items() if w[3]})
+        _, version = get_sheet_version(client, url)
+    except Exception as e:
+        print(f"Ingest Sync Error: {e}")
+        cells, rows, version = {}, {}, None
+    if version_before is None or version != version_before + len(written):
+        snapshot_store.mark_stale(folder.id, folder.get_sheet_list())
+        for name in written: sheet_cache.invalidate(url, name)
+        dashboard_sync.invalidate(folder.id)
+        return
+    for name in folder.get_sheet_list():
+        count, col_index, start, _ = written.get(name, (0, {}, None, None))
+        new_rows = [snapshot_row(folder, col_index, r) for r in rows.get(name, [])]
+        if len(new_rows) != count:
+            # Baris hasil baca ulang tidak lengkap -> sheet ini diambil ulang penuh saat sinkron berikutnya
+            snapshot_store.mark_stale(folder.id, [name])
+            sheet_cache.invalidate(url, name)
+            continue
+        loaded = snapshot_store.apply_write(folder, plan, name, revision_before, cells.get(name), start, new_rows)
+        if loaded is not None:
+            sheet_cache.put(url, name, {'plan': plan.signature, 'extract': loaded.to_dict()}, revision_before)
+        elif name in written:
+            sheet_cache.invalidate(url, name)
+    dashboard_sync.invalidate(folder.id)
+
+ingest_flusher = IngestFlusher(ingest_queue, flush_ingest,
+                               delay=app.config['INGEST_FLUSH_DELAY'],
+                               interval=app.config['INGEST_FLUSH_INTERVAL'],
+                               batch_rows=app.config['INGEST_BATCH_ROWS'])
+
+def api_folder(folder_id):
+    # Bot/script: header "Authorization: Bearer <token>" (token dibuat di halaman konfigurasi folder)
+    folder = db.session.get(MonitorFolder, folder_id)
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not folder or not check_token(token, folder.ingest_token_hash): return None
+    return folder
+
+@app.route('/api/folder/<int:folder_id>/transactions', methods=['POST'])
+def ingest_transactions(folder_id):
+    folder = api_folder(folder_id)
+    if not folder: return jsonify({'error': "Token API tidak valid."}), 401
+    body = request.get_json(silent=True)
+    items = body.get('transactions') if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': "Body harus berupa {\"transactions\": [...]}."}), 400
+    if len(items) > app.config['INGEST_MAX_ROWS_PER_REQUEST']:
+        return jsonify({'error': f"Maksimal {app.config['INGEST_MAX_ROWS_PER_REQUEST']} transaksi per request."}), 413
+
+    rows, errors = validate_items(folder, plan_cache.get(folder), items)
+    if errors: return jsonify({'error': "Ada transaksi yang tidak valid, tidak ada yang disimpan.", 'errors': errors}), 400
+    # ID yang sudah pernah diterima diabaikan (kiriman ulang dari bot aman)
+    duplicates = ingest_queue.enqueue(folder.id, rows)
+    metrics.inc('ingest_rows_total', len(rows) - len(duplicates), result='queued')
+    metrics.inc('ingest_rows_total', len(duplicates), result='duplicate')
+    ingest_flusher.notify()
+    return jsonify({'accepted': len(rows) - len(duplicates), 'duplicates': duplicates}), 202
+
+@app.route('/api/folder/<int:folder_id>/transactions', methods=['GET'])
+def ingest_status(folder_id):
+    # ?id=a&id=b -> status antrian per id (pending / sending / sent / failed)
+    folder = api_folder(folder_id)
+    if not folder: return jsonify({'error': "Token API tidak valid."}), 401
+    ids = request.args.getlist('id')[:app.config['INGEST_MAX_ROWS_PER_REQUEST']]
+    if not ids: return jsonify({'error': "Isi parameter id."}), 400
+    found = ingest_queue.status(folder.id, ids)
+    return jsonify({'transactions': {i: found.get(i, {'status': 'unknown'}) for i in ids}})
+
+@app.route('/folder/<int:folder_id>/api-token', methods=['POST'])
+@login_required
+def folder_api_token(folder_id):
+    folder = get_folder_or_404(folder_id)
+    if folder.user_id != current_user.id: return redirect(url_for('home'))
+    if request.form.get('action') == 'revoke':
+        folder.ingest_token_hash = None
+        flash('Token API dicabut.', 'success')
+    else:
+        # Token hanya ditampilkan sekali; yang disimpan hanya hash-nya
+        token = new_token()
+        folder.ingest_token_hash = hash_token(token)
+        flash(f'Token API baru: {token} (simpan sekarang, token tidak ditampilkan lagi).', 'success')
+    db.session.commit()
+    return redirect(url_for('folder_settings', folder_id=folder_id))
+
+# --- LAPORAN DASHBOARD TERJADWAL (HTML untuk headless browser, lihat report_worker.py) ---
+REPORT_SENDERS = ('telegram', 'file')
+
+def report_month(folder, today=None):
+    # Sheet bulan berjalan (nama bulan di daftar sheet); tidak ada -> sheet terakhir
+    sheet_list = folder.get_sheet_list()
+    by_name = {s.lower(): s for s in sheet_list}
+    month = MONTHS[(today or date.today()).month - 1].lower()
+    return by_name.get(month, sheet_list[-1] if sheet_list else 'Sheet1')
+
+def build_report_html(job):
+    with app.app_context():
+        folder = db.session.get(MonitorFolder, job.folder_id)
+        if not folder: raise ReportError("Folder sudah dihapus.")
+        client = get_google_client(folder.user_id)
+        if not client: raise ReportError("Akun Google belum diatur.")
+        year_view = job.view == 'year'
+        selected_month = YEAR_VIEW_LABEL if year_view else report_month(folder)
+        data = build_dashboard_data(folder, selected_month, year_view, client=client)
+        if data['error_msg']: raise ReportError(data['error_msg'])
+        data = compact_dashboard(data, app.config['REPORT_WIDTH'], app.config['CHART_PIE_SLICES'])
+        as_of = format_as_of(time.time())
+        # Request palsu tanpa login: sidebar & menu user tidak ikut tergambar
+        with app.test_request_context('/report', base_url=REPORT_ORIGIN):
+            return render_template('dashboard.html',
+                                   folder=folder, sheet_list=folder.get_sheet_list(), selected_month=selected_month,
+                                   year_view=year_view, force_refresh=False, report=True,
+                                   initial_data=dict(data, as_of=as_of, refreshing=False),
+                                   data_as_of=as_of, refreshing=False, **data)
+
+@app.route('/folder/<int:folder_id>/report/add', methods=['POST'])
+@login_required
+def add_report(folder_id):
+    folder = get_folder_or_404(folder_id)
+    if folder.user_id != current_user.id: return redirect(url_for('home'))
+    sender = request.form.get('sender', 'telegram')
+    target = (request.form.get('target') or '').strip()
+    try:
+        cron = CronSpec(request.form.get('cron')).expr
+        if sender not in REPORT_SENDERS: raise ReportError("Pengirim laporan tidak dikenal.")
+        if sender == 'telegram' and not target: raise ReportError("Isi Chat ID Telegram tujuan laporan.")
+    except ReportError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('folder_settings', folder_id=folder_id))
+    view = 'year' if request.form.get('view') == 'year' else 'month'
+    db.session.add(ReportSchedule(folder_id=folder.id, cron=cron, view=view, sender=sender, target=target))
+    db.session.commit()
+    flash('Jadwal laporan berhasil ditambahkan!', 'success')
+    return redirect(url_for('folder_settings', folder_id=folder_id))
+
+@app.route('/report/delete/<int:report_id>')
+@login_required
+def delete_report(report_id):
+    report = ReportSchedule.query.options(joinedload(ReportSchedule.folder)).filter_by(id=report_id).first_or_404()
+    folder_id = report.folder.id
+    if report.folder.user_id != current_user.id: return redirect(url_for('home'))
+    db.session.delete(report)
+    db.session.commit()
+    return redirect(url_for('folder_settings', folder_id=folder_id))
+
+# --- QUERY RENTANG TANGGAL (lintas worksheet & folder) ---
+def folder_range_transactions(client, folder, start, end):
+    # -> ([Transactions per worksheet], [nama worksheet yang dipakai])
+    plan = plan_cache.get(folder)
+    with timed('google_revision'):
+        revision = get_sheet_revision(client, folder.spreadsheet_url)
+    index = date_index.get(folder.id, plan.signature)
+    # Worksheet yang belum terindex (di revisi sekarang) ikut diambil; yang terindex hanya jika beririsan
+    wanted = [n for n in folder.get_sheet_list()
+              if not revision or index.get(n, (None,))[0] != revision or index[n][1].window(start, end)]
+    if not wanted: return [], []
+    extracts = get_sheet_extracts(client, folder, wanted, revalidate=True)
+
+    parts, used = [], []
+    for name in wanted:
+        extract = extracts.get(name)
+        if not extract or extract.is_empty: continue
+        # Data bisa berasal dari snapshot revisi lama (Google gagal): index dipilih sesuai revisi data
+        indexed_revision, sheet_dates = index.get(name, (None, None))
+        if not extract.revision or indexed_revision != extract.revision: sheet_dates = None
+        with timed('parse'):
+            transactions, sheet_dates = range_transactions(plan, extract, start, end, sheet_dates)
+        if sheet_dates is not None: date_index.put(folder.id, name, plan.signature, extract.revision, sheet_dates)
+        if transactions is not None and not transactions.is_empty:
+            parts.append(transactions)
+            used.append(name)
+    return parts, used
+
+def query_date_range(folders, start, end, client=None):
+    # Python API: start/end datetime64[D] (inklusif, lihat parse_range), satu/lebih folder milik user yang sama
+    empty = empty_dashboard_data()
+    result = {'start': str(start), 'end': str(end), 'sheets': [], 'rows': 0, 'error_msg': None,
+              'sum_kotor': empty['sum_kotor'], 'sum_clean': empty['sum_clean'],
+              'chart_dirty': empty['chart_dirty'], 'chart_clean': empty['chart_clean']}
+    client = client or (get_google_client(folders[0].user_id) if folders else None)
+    if not client:
+        result['error_msg'] = "Akun Google belum diatur."
+        return result
+    parts = []
+    try:
+        for folder in folders:
+            folder_parts, used = folder_range_transactions(client, folder, start, end)
+            parts += folder_parts
+            result['sheets'] += [{'folder': folder.name, 'sheet': name} for name in used]
+    except Exception as e:
+        result['error_msg'] = str(e)
+        return result
+    with timed('aggregate'):
+        sum_kotor, sum_clean, chart_dirty, chart_clean, rows = summarize_range(parts)
+    result.update(sum_kotor=format_summary(sum_kotor), sum_clean=format_summary(sum_clean),
+                  chart_dirty=chart_dirty, chart_clean=chart_clean, rows=rows)
+    if not rows: result['error_msg'] = "Tidak ada transaksi pada rentang tanggal ini."
+    return result
+
+@app.route('/range/data')
+@login_required
+def range_data():
+    # ?start=2024-11-01&end=2025-02-15 atau ?days=90; ?folder=1&folder=2 (default semua folder)
+    try:
+        start, end = parse_range(request.args.get('start'), request.args.get('end'), request.args.get('days'))
+    except RangeError as e:
+        return jsonify({'error_msg': str(e)}), 400
+    folder_ids = request.args.getlist('folder', type=int)
+    query = MonitorFolder.query.filter_by(user_id=current_user.id)
+    if folder_ids: query = query.filter(MonitorFolder.id.in_(folder_ids))
+    folders = query.order_by(MonitorFolder.name).all()
+    if folder_ids and len(folders) != len(set(folder_ids)): abort(404)
+
+    data = query_date_range(folders, start, end)
+    with timed('serialize'):
+        resp = jsonify(compact_chart_data(data))
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+# --- ANALITIK LINTAS TAHUN ---
+cross_year = CrossYearAnalytics(fetch_workers=app.config['ANALYTICS_FETCH_WORKERS'],
+                                process_workers=app.config['ANALYTICS_PROCESSES'])
+
+def fetch_folder_extracts(client, folder_id):
+    # Jalan di thread pool analitik: app context (dan sesi DB) sendiri per thread
+    with app.app_context():
+        folder = db.session.get(MonitorFolder, folder_id)
+        return get_sheet_extracts(client, folder, folder.get_sheet_list())
+
+@app.route('/analytics')
+@login_required
+def analytics():
+    folders = (MonitorFolder.query.options(selectinload(MonitorFolder.categories))
+               .filter_by(user_id=current_user.id).order_by(MonitorFolder.name).all())
+    client = get_google_client()
+    data, error_msg = None, None
+    if not client:
+        error_msg = "Akun Google belum diatur."
+    elif folders:
+        with timed('analytics'):
+            data = cross_year.run([folder_spec(f) for f in folders],
+                                  lambda spec: fetch_folder_extracts(client, spec.id))
+    with timed('render'):
+        return render_template('analytics.html', data=data, error_msg=error_msg)
+
+# --- METRICS (Prometheus) ---
+def runtime_gauges():
+    pool = google_pool.stats()
+    gauges = [(f"google_client_pool_{k}", {}, v) for k, v in pool.items()]
+    gauges += [('dashboard_sync_views', {}, dashboard_sync.view_count()),
+               ('dashboard_sync_inflight', {}, dashboard_sync.inflight_count()),
+               ('password_hash_inflight', {}, password_hasher.inflight())]
+    gauges += [('ingest_queue_rows', {'status': status}, count) for status, count in ingest_queue.counts().items()]
+    return gauges + google_api.gauges()
+
+metrics.register_gauges(runtime_gauges)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        given = request.headers.get('Authorization', '').removeprefix('Bearer ') or request.args.get('token', '')
+        if not secrets.compare_digest(given.encode(), token.encode()): abort(403)
+    elif not app.config['METRICS_PUBLIC']:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""Benchmark offline untuk fetch_sheet_data / route dashboard dengan fake Google Sheets.
+
+Contoh:
+    python -m benchmarks.bench_dashboard --rows 1000 10000 100000 --latency 0.05
+    python -m benchmarks.bench_dashboard --rows 10000 --json bench.json
+    python -m benchmarks.bench_dashboard --rows 10000 --compare bench.json --threshold 1.25
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+MONTHS = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+          'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+
+def measure(fn, repeat):
+    wall, cpu = [], []
+    for _ in range(repeat):
+        t0, c0 = time.perf_counter(), time.process_time()
+        fn()
+        wall.append(time.perf_counter() - t0)
+        cpu.append(time.process_time() - c0)
+    # Satu putaran terpisah dengan tracemalloc (memperlambat, jadi tidak ikut diukur waktunya)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'p50_ms': percentile(wall, 50) * 1000,
+        'p95_ms': percentile(wall, 95) * 1000,
+        'cpu_ms': sum(cpu) / len(cpu) * 1000,
+        'peak_mb': peak / 1024 / 1024,
+    }
+
+
+def setup_app(tmpdir):
+    # Semua state app (DB, cache, snapshot) diarahkan ke folder sementara
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    os.environ['SHEET_CACHE_PATH'] = os.path.join(tmpdir, 'sheet_cache.db')
+    os.environ['SNAPSHOT_PATH'] = os.path.join(tmpdir, 'snapshots.db')
+    os.environ['DATE_INDEX_PATH'] = os.path.join(tmpdir, 'date_index.db')
+    os.environ['INGEST_QUEUE_PATH'] = os.path.join(tmpdir, 'ingest_queue.db')
+    os.environ['SINGLE_FLIGHT_LOCK_DIR'] = os.path.join(tmpdir, 'locks')
+    os.environ['REPORT_OUTPUT_DIR'] = os.path.join(tmpdir, 'reports')
+    import app as app_module
+    return app_module
+
+
+def seed_folder(app_module, sheet_names, cat_names):
+    from models import db, User, GlobalSettings, MonitorFolder, CategoryMap, ReportSchedule, crypto
+    from benchmarks.fake_sheets import CATEGORY_COL
+    from sheet_plan import col_letter
+
+    user = User(username=f"bench{time.time_ns()}",
+                password=app_module.password_hasher.hash('bench'))
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(GlobalSettings(user_id=user.id, google_creds_encrypted=crypto.encrypt('{}')))
+    folder = MonitorFolder(user_id=user.id, name='Bench', sheet_list_str=','.join(sheet_names),
+                           spreadsheet_url=f"https://docs.google.com/spreadsheets/d/bench{user.id}/edit",
+                           clean_income_cells='K1', clean_expense_cells='K2')
+    db.session.add(folder)
+    db.session.commit()
+    letter = col_letter(CATEGORY_COL)
+    for i, name in enumerate(cat_names):
+        db.session.add(CategoryMap(folder_id=folder.id, name=name, cell_addr=f"{letter}{i+1}",
+                                   type='expense', is_clean=i % 2 == 0))
+    # Beberapa jadwal laporan: halaman pengaturan folder ikut menampilkannya
+    for cron in ('0 7 * * *', '0 20 * * 0'):
+        db.session.add(ReportSchedule(folder_id=folder.id, cron=cron, enabled=False))
+    db.session.commit()
+    return user, folder
+
+
+def run_case(app_module, rows, args):
+    from benchmarks.fake_sheets import FakeClient, make_month_sheet
+    import query_stats
+
+    sheet_names = MONTHS[:args.months]
+    sheets, cat_names = {}, []
+    for i, name in enumerate(sheet_names):
+        sheets[name], cat_names = make_month_sheet(rows, month=i + 1, categories=args.categories,
+                                                   debt_density=args.debt_density, seed=args.seed)
+    client = FakeClient(sheets, latency=args.latency, latency_per_1k_cells=args.latency_per_1k_cells)
+    app_module.build_google_client = lambda creds_encrypted: client
+
+    results = {}
+    def stage(name, fn):
+        before = sum(client.calls.values())
+        queries = query_stats.start()
+        results[name] = measure(fn, args.repeat)
+        query_stats.stop(queries)
+        results[name]['api_calls'] = (sum(client.calls.values()) - before) / (args.repeat + 1)
+        results[name]['queries'] = queries.count / (args.repeat + 1)
+
+    with app_module.app.app_context():
+        user, folder = seed_folder(app_module, sheet_names, cat_names)
+        username, folder_id = user.username, folder.id
+        month = sheet_names[0]
+
+        stage('google_fetch', lambda: app_module.get_sheet_extracts(client, folder, [month], force_refresh=True))
+        extract = app_module.get_sheet_extracts(client, folder, [month])[month]
+        plan = app_module.plan_cache.get(folder)
+        stage('parse', lambda: app_module.parse_sheet_values(plan, extract))
+        transactions = app_module.parse_sheet_values(plan, extract)[0]
+        stage('aggregate', lambda: transactions.daily())
+
+    # Route diukur di luar app context di atas: setiap request punya context (dan sesi DB) sendiri
+    http = app_module.app.test_client()
+    http.post('/login', data={'username': username, 'password': 'bench'})
+    base = f"/folder/{folder_id}/dashboard"
+    stage('route_data_cold', lambda: http.get(f"{base}/data?month={month}&refresh=1"))
+    stage('route_data_warm', lambda: http.get(f"{base}/data?month={month}"))
+    stage('route_page', lambda: http.get(f"{base}?month={month}"))
+    stage('route_settings', lambda: http.get(f"/folder/{folder_id}/settings"))
+    if args.months > 1:
+        stage('route_year_cold', lambda: http.get(f"{base}/data?view=year&refresh=1"))
+    return results
+
+
+def print_table(all_results):
+    print(f"{'rows':>8}  {'stage':<18}{'p50 ms':>10}{'p95 ms':>10}{'cpu ms':>10}{'peak MB':>10}{'api':>6}{'sql':>6}")
+    for rows, stages in all_results.items():
+        for name, r in stages.items():
+            print(f"{rows:>8}  {name:<18}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['cpu_ms']:>10.1f}"
+                  f"{r['peak_mb']:>10.1f}{r['api_calls']:>6.1f}{r.get('queries', 0):>6.1f}")
+
+
+def compare(all_results, baseline_path, threshold):
+    # Regresi: p50 lebih lambat dari baseline x threshold, atau query SQL per request bertambah
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    failed = []
+    for rows, stages in all_results.items():
+        for name, r in stages.items():
+            base = baseline.get(str(rows), {}).get(name)
+            if base and r['p50_ms'] > base['p50_ms'] * threshold:
+                failed.append(f"{rows} rows / {name}: {base['p50_ms']:.1f} ms -> {r['p50_ms']:.1f} ms")
+            if base and 'queries' in base and r['queries'] > base['queries']:
+                failed.append(f"{rows} rows / {name}: {base['queries']:.1f} -> {r['queries']:.1f} query SQL")
+    for line in failed: print(f"REGRESI  {line}")
+    return not failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--months', type=int, default=1, help='jumlah sheet bulanan (maks 12)')
+    parser.add_argument('--categories', type=int, default=8)
+    parser.add_argument('--debt-density', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0, help='detik per panggilan API')
+    parser.add_argument('--latency-per-1k-cells', type=float, default=0.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='simpan hasil ke file JSON')
+    parser.add_argument('--compare', help='file JSON baseline untuk cek regresi')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args(argv)
+    args.months = max(1, min(args.months, 12))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app_module = setup_app(tmpdir)
+        all_results = {rows: run_case(app_module, rows, args) for rows in args.rows}
+
+    print_table(all_results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({str(k): v for k, v in all_results.items()}, f, indent=2)
+    if args.compare and not compare(all_results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
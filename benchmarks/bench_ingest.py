@@ -0,0 +1,167 @@
+"""Input transaksi lewat API: antrian + values_append per worksheet vs append per baris.
+
+Beberapa bot mengirim transaksi bersamaan ke fake Google Sheets dengan kuota tulis per
+menit. Mode 'naive' memanggil values_append sekali per transaksi (seperti append_row),
+mode 'queue' lewat POST /api/folder/<id>/transactions lalu flusher menggabungkan baris.
+
+Contoh:
+    python -m benchmarks.bench_ingest --bots 8 --rows 400 --batch 10
+    python -m benchmarks.bench_ingest --quota 60 --latency 0.2
+    python -m benchmarks.bench_ingest --date-format '%Y-%m-%d %H:%M:%S'
+
+Fake sheet menampilkan tanggal dengan --date-format (locale spreadsheet, default dd/mm/yyyy),
+termasuk baris hasil append. Kolom 'beda' = baris data dashboard (snapshot/cache) yang tidak
+sama dengan isi sheet sebenarnya setelah ingest (harus 0).
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks.bench_dashboard import MONTHS, percentile, setup_app, seed_folder
+
+
+def make_items(bot, count, months):
+    return [{'id': f"bot{bot}-{i}", 'date': f"2025-{i % months + 1:02d}-{i % 28 + 1:02d} 12:00:00",
+             'expense': (i + 1) * 1000, 'source_expense': f"Kategori {i % 8 + 1}"} for i in range(count)]
+
+
+def run_naive(app_module, client, folder_id, args):
+    from models import db, MonitorFolder
+    from ingest import validate_items, sheet_row
+    from gspread.utils import absolute_range_name
+    with app_module.app.app_context():
+        folder = db.session.get(MonitorFolder, folder_id)
+        extracts = app_module.get_sheet_extracts(client, folder, folder.get_sheet_list())
+        plan = app_module.plan_cache.get(folder)
+        guarded = app_module.get_google_client(folder.user_id)
+        spreadsheet = guarded.open_by_url(folder.spreadsheet_url)
+        rows = {bot: validate_items(folder, plan, make_items(bot, args.rows // args.bots, args.months))[0]
+                for bot in range(args.bots)}
+
+    latencies, failed = [], [0]
+    lock = threading.Lock()
+
+    def bot(idx):
+        for client_id, name, values in rows[idx]:
+            extract = extracts[name]
+            t0 = time.perf_counter()
+            try:
+                spreadsheet.values_append(absolute_range_name(name, f"A{extract.header_row}"),
+                                          {'valueInputOption': 'USER_ENTERED'},
+                                          {'values': [sheet_row(folder, extract.col_index, values)]})
+                with lock: latencies.append(time.perf_counter() - t0)
+            except Exception:
+                with lock: failed[0] += 1
+
+    return run_bots(bot, args), latencies, failed[0]
+
+
+def run_queue(app_module, client, folder_id, token, args):
+    http = app_module.app.test_client()
+    headers = {'Authorization': f"Bearer {token}"}
+    latencies, failed = [], [0]
+    lock = threading.Lock()
+
+    def bot(idx):
+        items = make_items(idx, args.rows // args.bots, args.months)
+        for i in range(0, len(items), args.batch):
+            t0 = time.perf_counter()
+            resp = http.post(f"/api/folder/{folder_id}/transactions", json={'transactions': items[i:i + args.batch]},
+                             headers=headers)
+            with lock:
+                if resp.status_code == 202: latencies.append(time.perf_counter() - t0)
+                else: failed[0] += 1
+
+    elapsed = run_bots(bot, args)
+    # Waktu sampai antrian kosong (flusher background)
+    while app_module.ingest_queue.counts().get('pending') or app_module.ingest_queue.counts().get('sending'):
+        time.sleep(0.05)
+    return elapsed, latencies, failed[0]
+
+
+def count_mismatch(app_module, client, folder_id, sheet_names):
+    # Data dashboard (snapshot/cache, lewat cek revisi seperti sinkron background) vs isi fake sheet
+    from models import db, MonitorFolder
+    from sheet_plan import extract_from_values
+    with app_module.app.app_context():
+        folder = db.session.get(MonitorFolder, folder_id)
+        plan = app_module.plan_cache.get(folder)
+        mismatch = 0
+        for name, extract in app_module.get_sheet_extracts(client, folder, sheet_names, revalidate=True).items():
+            actual = extract_from_values(plan, client.sheets[name])
+            for col, values in actual.columns.items():
+                stored = extract.columns.get(col, [])
+                mismatch += sum(a != b for a, b in zip(values, stored)) + abs(len(values) - len(stored))
+        return mismatch
+
+
+def run_bots(bot, args):
+    threads = [threading.Thread(target=bot, args=(i,)) for i in range(args.bots)]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bots', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=400, help='total transaksi semua bot')
+    parser.add_argument('--batch', type=int, default=10, help='transaksi per POST (mode queue)')
+    parser.add_argument('--months', type=int, default=3)
+    parser.add_argument('--quota', type=int, default=60, help='kuota fake Google per menit')
+    parser.add_argument('--latency', type=float, default=0.05, help='detik per panggilan fake Google')
+    parser.add_argument('--date-format', default='%d/%m/%Y %H:%M:%S', help='format tanggal tampilan sheet')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('BCRYPT_PROCESSES', '0')
+    os.environ.setdefault('INGEST_FLUSH_DELAY', '0.2')
+    # Jangan menunggu lama saat kuota fake habis: dibandingkan jumlah panggilan & baris gagal
+    os.environ.setdefault('GOOGLE_QUOTA_MAX_WAIT', '1')
+    os.environ.setdefault('GOOGLE_API_MAX_RETRIES', '1')
+    from benchmarks.fake_sheets import FakeClient, make_month_sheet
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app_module = setup_app(tmpdir)
+        sheet_names = MONTHS[:args.months]
+        print(f"{'mode':<7}{'rows':>6}{'appends':>9}{'429':>6}{'failed':>8}{'beda':>6}{'p50 ms':>9}{'p95 ms':>9}{'seconds':>9}")
+        for mode in ('naive', 'queue'):
+            sheets, cat_names = {}, []
+            for i, name in enumerate(sheet_names):
+                sheets[name], cat_names = make_month_sheet(50, month=i + 1, year=2025, date_format=args.date_format)
+            client = FakeClient(sheets, latency=args.latency, quota_per_minute=args.quota, date_format=args.date_format)
+            app_module.build_google_client = lambda creds_encrypted: client
+            with app_module.app.app_context():
+                from ingest import new_token, hash_token
+                from models import db
+                user, folder = seed_folder(app_module, sheet_names, cat_names)
+                token = new_token()
+                folder.ingest_token_hash = hash_token(token)
+                db.session.commit()
+                folder_id = folder.id
+                # Cache & snapshot diisi dulu: yang diukur hanya penulisan
+                app_module.get_sheet_extracts(client, folder, sheet_names)
+
+            before = client.calls.get('values_append', 0)
+            t0 = time.perf_counter()
+            if mode == 'naive': elapsed, latencies, failed = run_naive(app_module, client, folder_id, args)
+            else: elapsed, latencies, failed = run_queue(app_module, client, folder_id, token, args)
+            total = time.perf_counter() - t0
+            if mode == 'queue': failed += app_module.ingest_queue.counts(folder_id).get('failed', 0)
+            written = sum(len(v) for v in sheets.values()) - 51 * len(sheet_names)
+            mismatch = count_mismatch(app_module, client, folder_id, sheet_names)
+
+            def ms(pct): return percentile(latencies, pct) * 1000 if latencies else 0
+            print(f"{mode:<7}{written:>6}{client.calls.get('values_append', 0) - before:>9}{client.errors.get(429, 0):>6}"
+                  f"{failed:>8}{mismatch:>6}{ms(50):>9.1f}{ms(95):>9.1f}{total:>9.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
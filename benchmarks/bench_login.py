@@ -0,0 +1,103 @@
+"""Throughput login (bcrypt) dan latensi route lain selama lonjakan login.
+
+Setiap mode --processes dijalankan bergantian: 0 = hash langsung di thread request,
+N = process pool bcrypt. Satu client lain terus memanggil /home untuk melihat apakah
+route biasa ikut tertahan oleh hashing.
+
+Contoh:
+    python -m benchmarks.bench_login --clients 16 --seconds 5 --processes 0 2
+    python -m benchmarks.bench_login --rounds 12 --old-rounds 10   # termasuk rehash saat login
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks.bench_dashboard import percentile, setup_app
+
+
+def seed_users(app_module, count, rounds):
+    from sqlalchemy import insert
+    from models import db, User
+    from password_hasher import hash_password
+    hashed = hash_password('bench', rounds)  # hash sama untuk semua user: seed cepat
+    with app_module.app.app_context():
+        db.session.execute(insert(User), [{'username': f"login{i}", 'password': hashed} for i in range(count)])
+        db.session.commit()
+
+
+def run_mode(app_module, processes, args):
+    from password_hasher import PasswordHasher
+    app = app_module.app
+    app_module.password_hasher = PasswordHasher(rounds=args.rounds, processes=processes,
+                                                max_pending=args.max_pending, max_per_key=args.max_per_key)
+    app_module.password_hasher.hash('warmup')  # start process pool di luar pengukuran
+
+    watcher = app.test_client()
+    watcher.post('/login', data={'username': 'login0', 'password': 'bench'})
+
+    logins, rejected, home = [], [0], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def login_client(idx):
+        i = idx
+        while time.perf_counter() < deadline:
+            http = app.test_client()  # client baru: belum login
+            t0 = time.perf_counter()
+            resp = http.post('/login', data={'username': f"login{i % args.users}", 'password': 'bench'})
+            with lock:
+                if resp.status_code == 429: rejected[0] += 1
+                else: logins.append(time.perf_counter() - t0)
+            i += args.clients
+
+    def home_client():
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            watcher.get('/home')
+            home.append(time.perf_counter() - t0)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_client, args=(i,)) for i in range(args.clients)]
+    threads.append(threading.Thread(target=home_client))
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    def ms(values, pct): return percentile(values, pct) * 1000 if values else 0
+    print(f"{processes:>9}{len(logins) / args.seconds:>10.1f}{ms(logins, 50):>10.0f}{ms(logins, 95):>10.0f}"
+          f"{rejected[0]:>8}{ms(home, 50):>10.1f}{ms(home, 95):>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, nargs='+', default=[0, 2], help='BCRYPT_PROCESSES yang dibandingkan')
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--old-rounds', type=int, default=None, help='cost hash tersimpan (default = --rounds)')
+    parser.add_argument('--clients', type=int, default=16, help='client login paralel')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--max-pending', type=int, default=8)
+    parser.add_argument('--max-per-key', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app_module = setup_app(tmpdir)
+        print(f"{'processes':>9}{'login/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'429':>8}{'home p50':>10}{'home p95':>10}")
+        for processes in args.processes:
+            # Seed ulang per mode agar rehash (--old-rounds) terukur di setiap mode
+            from models import db, User
+            with app_module.app.app_context():
+                User.query.delete()
+                db.session.commit()
+            seed_users(app_module, args.users, args.old_rounds or args.rounds)
+            run_mode(app_module, processes, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Ukuran payload dashboard: data grafik penuh vs diringkas (LTTB + pie "Lainnya") + gzip/brotli.
+
+Data transaksi beberapa tahun di fake Google Sheets, lalu dibandingkan:
+  - range  : /range/data seluruh rentang (trend harian multi-tahun)
+  - month  : /dashboard/data satu bulan (banyak kategori -> pie panjang)
+  - page   : halaman dashboard dengan data awal tersisip
+'raw' = bentuk lama (semua titik, semua kategori), 'compact' = response sekarang.
+Dengan --render, waktu gambar Chart.js diukur di Chromium lewat BrowserPool
+(butuh: python -m playwright install chromium).
+
+Contoh:
+    python -m benchmarks.bench_payload --years 3 --points 400 800
+    python -m benchmarks.bench_payload --categories 40 --render
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks.bench_dashboard import MONTHS, percentile, setup_app, seed_folder
+
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+def seed(app_module, args):
+    from benchmarks.fake_sheets import FakeClient, make_month_sheet
+    sheets, cat_names = {}, []
+    for y in range(args.years):
+        for m in range(12):
+            sheets[f"{MONTHS[m]} {2023 + y}"], cat_names = make_month_sheet(
+                args.rows, month=m + 1, year=2023 + y, categories=args.categories, seed=args.seed)
+    client = FakeClient(sheets)
+    app_module.build_google_client = lambda creds_encrypted: client
+    with app_module.app.app_context():
+        user, folder = seed_folder(app_module, list(sheets), cat_names)
+        return user.username, folder.id, list(sheets)
+
+
+def raw_sizes(app_module, data):
+    from compression import brotli, compress_body
+    body = app_module.app.json.dumps(data).encode()
+    return {'identity': len(body), 'gzip': len(compress_body(body, 'gzip')),
+            'br': len(compress_body(body, 'br')) if brotli else None}
+
+
+def http_sizes(http, url):
+    from compression import brotli
+    sizes, elapsed = {}, []
+    for encoding in ENCODINGS:
+        if encoding == 'br' and not brotli:
+            sizes[encoding] = None
+            continue
+        t0 = time.perf_counter()
+        resp = http.get(url, headers={'Accept-Encoding': encoding})
+        elapsed.append(time.perf_counter() - t0)
+        assert resp.status_code == 200, f"{url}: HTTP {resp.status_code}"
+        assert resp.headers.get('Content-Encoding', 'identity') == encoding or encoding == 'identity'
+        sizes[encoding] = len(resp.data)
+    return sizes, percentile(elapsed, 50)
+
+
+def count_points(data):
+    charts = [data.get('chart_dirty'), data.get('chart_clean')]
+    return sum(len(c['labels']) for c in charts if c)
+
+
+def print_row(name, mode, points, sizes, ms=None):
+    def kb(n): return f"{n / 1024:>9.1f}" if n is not None else f"{'-':>9}"
+    print(f"{name:<7}{mode:<9}{points if points is not None else '-':>8}" + ''.join(kb(sizes[e]) for e in ENCODINGS)
+          + (f"{ms * 1000:>9.1f}" if ms is not None else f"{'':>9}"))
+
+
+def measure_render(app_module, folder_id, payloads, args):
+    # Halaman laporan (tanpa login) berisi trend range: waktu sampai grafik selesai digambar
+    from reports import BrowserPool, REPORT_ORIGIN
+    from flask import render_template
+    from models import db, MonitorFolder
+    pool = BrowserPool(size=1, static_folder=app_module.app.static_folder)
+    try:
+        print(f"\n{'render':<16}{'points':>8}{'p50 ms':>9}{'p95 ms':>9}")
+        for mode, data in payloads:
+            with app_module.app.app_context():
+                folder = db.session.get(MonitorFolder, folder_id)
+                page = dict(app_module.empty_dashboard_data(), chart_dirty=data['chart_dirty'],
+                            chart_clean=data['chart_clean'], sum_kotor=data['sum_kotor'], sum_clean=data['sum_clean'])
+                with app_module.app.test_request_context('/report', base_url=REPORT_ORIGIN):
+                    html = render_template('dashboard.html', folder=folder, sheet_list=[], selected_month='',
+                                           year_view=False, force_refresh=False, report=True,
+                                           initial_data=dict(page, as_of=None, refreshing=False),
+                                           data_as_of=None, refreshing=False, **page)
+            pool.render(html)  # pemanasan (aset CDN masuk cache pool)
+            times = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                pool.render(html)
+                times.append(time.perf_counter() - t0)
+            print(f"{mode:<16}{count_points(data):>8}{percentile(times, 50) * 1000:>9.1f}"
+                  f"{percentile(times, 95) * 1000:>9.1f}")
+    finally:
+        pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=200, help='transaksi per sheet bulanan')
+    parser.add_argument('--categories', type=int, default=30)
+    parser.add_argument('--points', type=int, nargs='+', default=[400], help='lebar grafik (?points=)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--render', action='store_true', help='ukur waktu gambar Chart.js di Chromium')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('BCRYPT_PROCESSES', '0')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app_module = setup_app(tmpdir)
+        from models import db, MonitorFolder
+        from date_range import parse_range
+        username, folder_id, sheet_names = seed(app_module, args)
+        start, end = "2023-01-01", f"{2022 + args.years}-12-31"
+
+        with app_module.app.app_context():
+            folder = db.session.get(MonitorFolder, folder_id)
+            range_raw = app_module.query_date_range([folder], *parse_range(start, end, None))
+            month_raw = app_module.build_dashboard_data(folder, sheet_names[0], False,
+                                                      client=app_module.get_google_client(folder.user_id))
+
+        http = app_module.app.test_client()
+        http.post('/login', data={'username': username, 'password': 'bench'})
+        base = f"/folder/{folder_id}/dashboard"
+        http.get(f"{base}/data?month={sheet_names[0]}")  # isi cache sinkron -> data awal ikut di halaman
+
+        print(f"{'data':<7}{'mode':<9}{'points':>8}{'KB':>9}{'gzip KB':>9}{'br KB':>9}{'ms':>9}")
+        print_row('range', 'raw', count_points(range_raw), raw_sizes(app_module, range_raw))
+        for points in args.points:
+            sizes, ms = http_sizes(http, f"/range/data?start={start}&end={end}&points={points}")
+            compact = http.get(f"/range/data?start={start}&end={end}&points={points}").get_json()
+            print_row('range', 'compact', count_points(compact), sizes, ms)
+
+        pies = sum(len(p['labels']) for p in month_raw['pie_data'].values())
+        print_row('month', 'raw', count_points(month_raw), raw_sizes(app_module, month_raw))
+        sizes, ms = http_sizes(http, f"{base}/data?month={sheet_names[0]}&points={args.points[0]}")
+        compact = http.get(f"{base}/data?month={sheet_names[0]}&points={args.points[0]}").get_json()
+        print_row('month', 'compact', count_points(compact), sizes, ms)
+        print(f"{'':<16}irisan pie: {pies} -> {sum(len(p['labels']) for p in compact['pie_data'].values())}")
+
+        sizes, ms = http_sizes(http, f"{base}?month={sheet_names[0]}")
+        print_row('page', 'compact', None, sizes, ms)
+
+        if args.render:
+            compact = http.get(f"/range/data?start={start}&end={end}&points={args.points[0]}").get_json()
+            try:
+                measure_render(app_module, folder_id, [('raw', range_raw), ('compact', compact)], args)
+            except Exception as e:
+                print(f"❌ render: {e}")
+                return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
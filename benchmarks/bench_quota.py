@@ -0,0 +1,84 @@
+"""Beban dashboard terhadap fake Google Sheets yang punya kuota per menit (APIError 429).
+
+Contoh:
+    python -m benchmarks.bench_quota --quota-per-minute 30 --clients 8 --requests 20
+    python -m benchmarks.bench_quota --quota-per-minute 30 --app-rate 25 --fail-503 10
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks.bench_dashboard import MONTHS, percentile, setup_app, seed_folder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--clients', type=int, default=8, help='request paralel')
+    parser.add_argument('--requests', type=int, default=20, help='request per client')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--quota-per-minute', type=int, default=30, help='kuota fake Google')
+    parser.add_argument('--app-rate', type=int, default=None, help='GOOGLE_QUOTA_PER_MINUTE di app')
+    parser.add_argument('--fail-503', type=int, default=0, help='jumlah 503 di awal')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.app_rate: os.environ['GOOGLE_QUOTA_PER_MINUTE'] = str(args.app_rate)
+        os.environ.setdefault('GOOGLE_QUOTA_MAX_WAIT', '2')
+        app_module = setup_app(tmpdir)
+        from benchmarks.fake_sheets import FakeClient, make_month_sheet
+
+        sheet_names = MONTHS[:max(1, min(args.months, 12))]
+        sheets, cat_names = {}, []
+        for i, name in enumerate(sheet_names):
+            sheets[name], cat_names = make_month_sheet(args.rows, month=i + 1, seed=1)
+        client = FakeClient(sheets, latency=args.latency, quota_per_minute=args.quota_per_minute)
+        if args.fail_503: client.fail_next(503, args.fail_503)
+        app_module.build_google_client = lambda creds_encrypted: client
+        app_module.sheet_cache.ttl = 0  # setiap request lewat cek revisi + Google
+
+        with app_module.app.app_context():
+            user, folder = seed_folder(app_module, sheet_names, cat_names)
+            username, folder_id = user.username, folder.id
+
+        outcomes, latencies, lock = {}, [], threading.Lock()
+
+        def worker(idx):
+            http = app_module.app.test_client()
+            http.post('/login', data={'username': username, 'password': 'bench'})
+            for i in range(args.requests):
+                month = sheet_names[(idx + i) % len(sheet_names)]
+                client.revision = f"r{time.monotonic_ns()}"  # sheet selalu berubah
+                t0 = time.perf_counter()
+                data = http.get(f"/folder/{folder_id}/dashboard/data?month={month}&refresh=1").get_json()
+                with lock:
+                    latencies.append(time.perf_counter() - t0)
+                    key = data['error_msg'] or 'ok'
+                    outcomes[key] = outcomes.get(key, 0) + 1
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.clients)]
+        start = time.perf_counter()
+        for t in threads: t.start()
+        for t in threads: t.join()
+        elapsed = time.perf_counter() - start
+
+        print(f"{len(latencies)} request dalam {elapsed:.1f} s  "
+              f"p50 {percentile(latencies, 50) * 1000:.0f} ms  p95 {percentile(latencies, 95) * 1000:.0f} ms")
+        for key, count in sorted(outcomes.items(), key=lambda kv: -kv[1]):
+            print(f"  {count:>5}  {key}")
+        print(f"panggilan ke fake Google: {client.calls}  error: {client.errors}")
+        for line in app_module.metrics.render().splitlines():
+            if line.startswith(('google_api_retries_total', 'google_quota_rejected_total', 'google_circuit_state')):
+                print(f"  {line}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Throughput laporan dashboard PNG: pool browser hangat vs browser baru per laporan.
+
+Setiap folder memakai fake Google Sheets (tanpa jaringan ke Google); gambar dibuang oleh
+StubSender. Mode 'cold' meluncurkan Chromium baru untuk setiap laporan (cara naif),
+mode 'pool' memakai BrowserPool dengan N context yang dipakai ulang.
+Butuh browser Playwright: python -m playwright install chromium
+
+Contoh:
+    python -m benchmarks.bench_reports --folders 20 --contexts 1 2 4
+    python -m benchmarks.bench_reports --folders 5 --cold
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks.bench_dashboard import MONTHS, percentile, setup_app, seed_folder
+
+
+def seed(app_module, args):
+    from benchmarks.fake_sheets import FakeClient, make_month_sheet
+    sheet_names = MONTHS[:args.months]
+    sheets, cat_names = {}, []
+    for i, name in enumerate(sheet_names):
+        sheets[name], cat_names = make_month_sheet(args.rows, month=i + 1, year=2025)
+    client = FakeClient(sheets)
+    app_module.build_google_client = lambda creds_encrypted: client
+    with app_module.app.app_context():
+        return [seed_folder(app_module, sheet_names, cat_names)[1].id for _ in range(args.folders)]
+
+
+def run(app_module, folder_ids, pool_factory, contexts, args):
+    from reports import ReportService, ReportJob, StubSender
+    pool = pool_factory(contexts)
+    latencies = []
+    # Latensi = antri + data + render + kirim
+    service = ReportService(app_module.build_report_html, pool, {'stub': StubSender()},
+                            workers=contexts * 2, max_queue=len(folder_ids) * args.repeat,
+                            on_done=lambda job, error: latencies.append(time.perf_counter() - job.created_at))
+    pool.render('<html><body data-report-ready="1"></body></html>')  # start browser di luar pengukuran
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for folder_id in folder_ids:
+            job = ReportJob(folder_id, args.view, 'stub')
+            job.created_at = time.perf_counter()
+            service.submit(job)
+    service.join()
+    elapsed = time.perf_counter() - t0
+    pool.close()
+    stats = service.stats()
+    return stats['sent'], stats['failed'], stats['sent'] * 60.0 / elapsed, percentile(latencies, 50), percentile(latencies, 95)
+
+
+class ColdPool:
+    # Pembanding: Chromium baru untuk setiap laporan
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def render(self, html):
+        from reports import BrowserPool
+        pool = BrowserPool(size=1, **self.kwargs)
+        try: return pool.render(html)
+        finally: pool.close()
+
+    def close(self):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--folders', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=1, help='laporan per folder')
+    parser.add_argument('--months', type=int, default=3)
+    parser.add_argument('--rows', type=int, default=300, help='transaksi per sheet')
+    parser.add_argument('--view', choices=['month', 'year'], default='month')
+    parser.add_argument('--contexts', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--cold', action='store_true', help='bandingkan dengan browser baru per laporan')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('BCRYPT_PROCESSES', '0')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app_module = setup_app(tmpdir)
+        from reports import BrowserPool
+        folder_ids = seed(app_module, args)
+        static = app_module.app.static_folder
+        modes = [('pool', n, lambda n: BrowserPool(size=n, static_folder=static)) for n in args.contexts]
+        if args.cold: modes.insert(0, ('cold', 1, lambda n: ColdPool(static_folder=static)))
+
+        print(f"{'mode':<6}{'contexts':>9}{'sent':>6}{'failed':>8}{'per min':>9}{'p50 s':>8}{'p95 s':>8}")
+        for mode, contexts, factory in modes:
+            try:
+                sent, failed, per_minute, p50, p95 = run(app_module, folder_ids, factory, contexts, args)
+            except Exception as e:
+                print(f"❌ {mode}: {e}")
+                return 2
+            print(f"{mode:<6}{contexts:>9}{sent:>6}{failed:>8}{per_minute:>9.1f}{p50:>8.2f}{p95:>8.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Beban SQLite dari beberapa worker (proses) sekaligus: mode bawaan vs mode produksi.
+
+Mode 'default' meniru database lama: journal DELETE, tanpa busy_timeout/pool khusus
+dan tanpa index foreign key. Mode 'production' = WAL + synchronous NORMAL + busy_timeout
++ pool per worker + index dari ensure_schema().
+
+Contoh:
+    python -m benchmarks.bench_sqlite --workers 4 --threads 4 --seconds 5
+    python -m benchmarks.bench_sqlite --users 20000 --write-ratio 0.2 --mode production
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from benchmarks.bench_dashboard import percentile
+
+
+def make_app(db_path, mode):
+    from flask import Flask
+    from models import configure_database
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_MODE'] = mode
+    configure_database(app)
+    return app
+
+
+def seed(db_path, mode, users, folders_per_user, categories):
+    from sqlalchemy import insert, text
+    from models import db, User, GlobalSettings, MonitorFolder, CategoryMap, ensure_schema, NEW_INDEXES
+    app = make_app(db_path, mode)
+    with app.app_context():
+        if mode == 'production':
+            ensure_schema()
+        else:
+            db.create_all()
+            for name, table, column in NEW_INDEXES:
+                db.session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        db.session.execute(insert(User), [{'id': u, 'username': f"user{u}", 'password': 'x'}
+                                          for u in range(1, users + 1)])
+        db.session.execute(insert(GlobalSettings), [{'user_id': u, 'google_creds_encrypted': 'x'}
+                                                    for u in range(1, users + 1)])
+        folders = [{'id': (u - 1) * folders_per_user + i + 1, 'user_id': u, 'name': f"{2020 + i}",
+                    'spreadsheet_url': 'https://example.com', 'config_version': 0}
+                   for u in range(1, users + 1) for i in range(folders_per_user)]
+        db.session.execute(insert(MonitorFolder), folders)
+        db.session.execute(insert(CategoryMap), [{'folder_id': f['id'], 'name': f"Kategori {c}",
+                                                  'cell_addr': f"Z{c + 1}", 'type': 'expense'}
+                                                 for f in folders for c in range(categories)])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def worker(db_path, mode, seconds, threads, users, write_ratio, seed_value):
+    # Satu proses = satu worker gunicorn dengan beberapa thread
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import selectinload
+    from models import db, GlobalSettings, MonitorFolder
+    app = make_app(db_path, mode)
+    reads, writes, errors, lock = [], [], [0], threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def run(idx):
+        rng = random.Random(seed_value * 1000 + idx)
+        while time.perf_counter() < deadline:
+            user_id = rng.randint(1, users)
+            is_write = rng.random() < write_ratio
+            t0 = time.perf_counter()
+            with app.app_context():
+                try:
+                    if is_write:
+                        folder = MonitorFolder.query.filter_by(user_id=user_id).first()
+                        folder.config_version = (folder.config_version or 0) + 1
+                        db.session.commit()
+                    else:
+                        # Pola request dashboard/settings: settings user + folder + kategori
+                        GlobalSettings.query.filter_by(user_id=user_id).first()
+                        folders = (MonitorFolder.query.options(selectinload(MonitorFolder.categories))
+                                   .filter_by(user_id=user_id).all())
+                        sum(len(f.categories) for f in folders)
+                except OperationalError:
+                    db.session.rollback()
+                    with lock: errors[0] += 1
+                    continue
+            with lock: (writes if is_write else reads).append(time.perf_counter() - t0)
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    return reads, writes, errors[0]
+
+
+def run_mode(mode, args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'bench.db')
+        seed(db_path, mode, args.users, args.folders, args.categories)
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(args.workers, mp_context=ctx) as pool:
+            futures = [pool.submit(worker, db_path, mode, args.seconds, args.threads,
+                                   args.users, args.write_ratio, i) for i in range(args.workers)]
+            reads, writes, errors = [], [], 0
+            for f in futures:
+                r, w, e = f.result()
+                reads += r
+                writes += w
+                errors += e
+    return reads, writes, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', nargs='+', default=['default', 'production'], choices=['default', 'production'])
+    parser.add_argument('--workers', type=int, default=4, help='jumlah proses (worker gunicorn)')
+    parser.add_argument('--threads', type=int, default=4, help='thread per worker')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--folders', type=int, default=3, help='folder per user')
+    parser.add_argument('--categories', type=int, default=8, help='kategori per folder')
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<12}{'ops/s':>10}{'read p50':>10}{'read p95':>10}{'write p50':>11}{'write p95':>11}{'locked':>8}")
+    for mode in args.mode:
+        reads, writes, errors = run_mode(mode, args)
+        ops = (len(reads) + len(writes)) / args.seconds
+        def ms(values, pct): return percentile(values, pct) * 1000 if values else 0
+        print(f"{mode:<12}{ops:>10.0f}{ms(reads, 50):>10.2f}{ms(reads, 95):>10.2f}"
+              f"{ms(writes, 50):>11.2f}{ms(writes, 95):>11.2f}{errors:>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
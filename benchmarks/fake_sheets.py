@@ -0,0 +1,240 @@
+import re
+import time
+import random
+import threading
+from datetime import datetime
+from collections import deque
+from gspread.exceptions import APIError
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+
+# --- FAKE GOOGLE SHEETS (in-process, tanpa jaringan) ---
+# Meniru bagian gspread yang dipakai app: open_by_url, worksheet().get_all_values(),
+# values_batch_get (ROWS/COLUMNS), values_append (input API) dan get_file_drive_metadata
+# untuk cek revisi (setiap append mengganti revisi & menaikkan version, seperti di Drive).
+# values_append USER_ENTERED menyimpan tanggal dalam format locale sheet (date_format), seperti
+# Google Sheets: yang dibaca kembali bukan string ISO yang dikirim.
+# Bisa mensimulasikan kuota per menit (APIError 429) dan error yang dipaksa (fail_next).
+
+HEADER = ['Timestamp', 'Nominal Pemasukan', 'Sumber Pemasukan', 'Nominal Pengeluaran', 'Sumber Pengeluaran']
+SUMMARY_COL = 11      # K: K1 pemasukan, K2 pengeluaran, K3 saldo
+CATEGORY_COL = 13     # M: M1.. nilai per kategori
+
+
+def rupiah(value):
+    return 'Rp ' + f"{value:,}".replace(',', '.')
+
+
+ISO_FORMAT = '%Y-%m-%d %H:%M:%S'
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}(:\d{2})?)?$')
+
+
+def make_month_sheet(rows, month=1, year=2024, categories=8, debt_density=0.05, seed=0, date_format=ISO_FORMAT):
+    rnd = random.Random(seed * 100 + month)
+    cat_names = [f"Kategori {i+1}" for i in range(categories)]
+    width = max(CATEGORY_COL, len(HEADER))
+    values = [HEADER + [''] * (width - len(HEADER))]
+    total_inc = total_exp = 0
+    cat_totals = [0] * categories
+    for i in range(rows):
+        day = i * 28 // max(rows, 1) + 1
+        ts = datetime(year, month, day, rnd.randint(0, 23), rnd.randint(0, 59)).strftime(date_format)
+        amount = rnd.randint(1, 500) * 1000
+        cat = rnd.randrange(categories)
+        source = f"Hutang {cat_names[cat]}" if rnd.random() < debt_density else cat_names[cat]
+        if rnd.random() < 0.3:
+            row = [ts, rupiah(amount), source, '', '']
+            total_inc += amount
+        else:
+            row = [ts, '', '', rupiah(amount), source]
+            total_exp += amount
+            cat_totals[cat] += amount
+        values.append(row + [''] * (width - len(row)))
+
+    # Sel ringkasan & kategori (seperti rumus SUM di sheet asli)
+    for r, val in enumerate([total_inc, total_exp, total_inc - total_exp]):
+        _set(values, r, SUMMARY_COL - 1, rupiah(val), width)
+    for c, val in enumerate(cat_totals):
+        _set(values, c, CATEGORY_COL - 1, rupiah(val), width)
+    return values, cat_names
+
+
+def _set(values, r, c, val, width):
+    while len(values) <= r: values.append([''] * width)
+    values[r][c] = val
+
+
+def _col_number(letters):
+    n = 0
+    for ch in letters: n = n * 26 + ord(ch.upper()) - 64
+    return n
+
+
+def _trim(rows):
+    rows = [list(r) for r in rows]
+    for r in rows:
+        while r and r[-1] == '': r.pop()
+    while rows and not rows[-1]: rows.pop()
+    return rows
+
+
+class FakeResponse:
+    # Cukup untuk membangun gspread APIError
+    def __init__(self, status, retry_after=None):
+        self.status_code = status
+        self.headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+        self.text = f"HTTP {status}"
+
+    def json(self):
+        return {'error': {'code': self.status_code, 'message': self.text, 'status': 'FAKE'}}
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, url):
+        self.client = client
+        self.url = url
+
+    def worksheet(self, name):
+        self.client._call('worksheet')
+        return FakeWorksheet(self.client, name)
+
+    def values_batch_get(self, ranges, params=None):
+        major = (params or {}).get('majorDimension', 'ROWS')
+        result = [self.client._get_range(r, major) for r in ranges]
+        cells = sum(len(v) for vr in result for v in vr.get('values', []))
+        self.client._call('values_batch_get', cells)
+        return {'valueRanges': result}
+
+    def values_append(self, range, params, body):
+        m = re.match(r"^'?(.*?)'?!", range)
+        name = m.group(1).replace("''", "'")
+        rows = [['' if v is None else str(v)[1:] if str(v).startswith("'") else str(v) for v in row]
+                for row in body['values']]
+        if params.get('valueInputOption') == 'USER_ENTERED':
+            rows = [[self.client._user_entered(v) for v in row] for row in rows]
+        self.client._call('values_append', sum(len(r) for r in rows))
+        with self.client._lock:
+            values = self.client.sheets[name]
+            # Tabel berakhir di baris terakhir yang masih berisi (sel ringkasan di kolom K/M ikut dihitung)
+            end = len(_trim(values))
+            width = max((len(r) for r in values), default=0)
+            for i, row in enumerate(rows):
+                row = row + [''] * (width - len(row))
+                if end + i < len(values): values[end + i] = [a or b for a, b in zip(row, values[end + i])]
+                else: values.append(row)
+            self.client.writes += 1
+            self.client.touch()
+        last = rowcol_to_a1(end + len(rows), max(len(r) for r in rows))
+        return {'updates': {'updatedRange': f"'{name}'!A{end + 1}:{last}", 'updatedRows': len(rows)}}
+
+
+class FakeDrive:
+    # client.http_client.request(...) untuk Drive files.get (fields modifiedTime,version)
+    def __init__(self, client):
+        self.client = client
+
+    def request(self, method, url, params=None):
+        self.client._call('drive_metadata')
+        return FakeJson({'modifiedTime': self.client.revision, 'version': str(self.client.version)})
+
+
+class FakeJson:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeWorksheet:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def get_all_values(self):
+        values = self.client.sheets[self.name]
+        self.client._call('get_all_values', sum(len(r) for r in values))
+        return [list(r) for r in values]
+
+
+class FakeClient:
+    def __init__(self, sheets, latency=0.0, latency_per_1k_cells=0.0, revision='r1', quota_per_minute=None,
+                 date_format=ISO_FORMAT):
+        self.sheets = sheets                 # {sheet_name: [[...], ...]}
+        self.date_format = date_format       # format tampilan tanggal (locale spreadsheet)
+        self.version = 1
+        self.http_client = FakeDrive(self)
+        self.latency = latency               # detik per panggilan API
+        self.latency_per_1k_cells = latency_per_1k_cells
+        self.revision = revision
+        self.quota_per_minute = quota_per_minute
+        self.calls = {}
+        self.errors = {}
+        self.writes = 0
+        self._window = deque()
+        self._failures = deque()
+        self._lock = threading.Lock()
+
+    def touch(self):
+        # File berubah (append atau edit manual di test): revisi & version Drive berganti
+        self.version += 1
+        self.revision = f"v{self.version}"
+
+    def _user_entered(self, value):
+        if ISO_DATE.match(value):
+            return datetime.fromisoformat(value).strftime(self.date_format)
+        return value
+
+    def fail_next(self, status, count=1):
+        # count panggilan berikutnya gagal dengan status HTTP ini (mis. 503)
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _call(self, name, cells=0):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            status = self._failures.popleft() if self._failures else None
+            if status is None and self.quota_per_minute and name != 'drive_metadata':
+                now = time.monotonic()
+                while self._window and now - self._window[0] > 60: self._window.popleft()
+                if len(self._window) >= self.quota_per_minute: status = 429
+                else: self._window.append(now)
+            if status is not None:
+                self.errors[status] = self.errors.get(status, 0) + 1
+        if status is not None:
+            raise APIError(FakeResponse(status, retry_after=1 if status == 429 else None))
+        delay = self.latency + self.latency_per_1k_cells * cells / 1000.0
+        if delay: time.sleep(delay)
+
+    def open_by_url(self, url):
+        self._call('open_by_url')
+        return FakeSpreadsheet(self, url)
+
+    def get_file_drive_metadata(self, file_id):
+        self._call('drive_metadata')
+        return {'modifiedTime': self.revision}
+
+    def _get_range(self, range_name, major='ROWS'):
+        m = re.match(r"^'?(.*?)'?(?:!(.*))?$", range_name)
+        name, rng = m.group(1).replace("''", "'"), m.group(2)
+        rows = self.sheets[name]
+        if rng is None:
+            sub = rows
+        elif re.fullmatch(r'\d+:\d+', rng):
+            a, b = map(int, rng.split(':'))
+            sub = rows[a-1:b]
+        elif re.fullmatch(r'[A-Za-z]+\d+:[A-Za-z]+\d+', rng):
+            (r1, c1), (r2, c2) = a1_to_rowcol(rng.split(':')[0]), a1_to_rowcol(rng.split(':')[1])
+            sub = [r[c1-1:c2] for r in rows[r1-1:r2]]
+        elif re.fullmatch(r'[A-Za-z]+\d+:[A-Za-z]+', rng):
+            m2 = re.match(r'([A-Za-z]+)(\d+):([A-Za-z]+)', rng)
+            col, start = _col_number(m2.group(1)), int(m2.group(2))
+            sub = [[r[col-1]] if col - 1 < len(r) else [] for r in rows[start-1:]]
+        else:
+            r, c = a1_to_rowcol(rng)
+            sub = [[rows[r-1][c-1]]] if r - 1 < len(rows) and c - 1 < len(rows[r-1]) else []
+
+        sub = _trim(sub)
+        if major == 'COLUMNS':
+            width = max((len(r) for r in sub), default=0)
+            sub = _trim([[r[i] if i < len(r) else '' for r in sub] for i in range(width)])
+        return {'range': range_name, 'values': sub} if sub else {'range': range_name}
@@ -0,0 +1,75 @@
+import numpy as np
+
+# --- DATA GRAFIK RINGKAS (DOWNSAMPLING + PIE "LAINNYA") ---
+# Trend harian rentang panjang bisa ribuan titik, padahal layar hanya punya beberapa
+# ratus piksel. Seri dikurangi dengan LTTB (Largest-Triangle-Three-Buckets): per bucket
+# dipilih titik yang paling membentuk sudut, sehingga puncak & lembah tetap terlihat.
+# Data asli di cache sinkron tidak diubah; peringkasan hanya saat response dibuat.
+
+CHART_MIN_POINTS = 10
+OTHER_LABEL = 'Lainnya'
+
+
+def compact_number(value):
+    # 150000.0 -> 150000, pecahan dibulatkan ke sen: JSON lebih pendek
+    if value is None: return 0
+    value = float(value)
+    if value != value: return 0
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+def lttb_indices(values, threshold):
+    # Index titik terpilih (urut, titik pertama & terakhir selalu ikut)
+    n = len(values)
+    if threshold >= n or threshold < 3: return np.arange(n)
+    y = np.asarray(values, dtype=float)
+    x = np.arange(n, dtype=float)
+    # threshold-2 bucket di antara titik pertama dan terakhir
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    picked = np.empty(threshold, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Titik ketiga segitiga: rata-rata bucket berikutnya (bucket terakhir: titik terakhir)
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def downsample_chart(chart, points):
+    # chart: {'labels', 'income', 'expense'}; kedua seri berbagi label, jadi index
+    # hasil LTTB masing-masing seri digabung (maksimal `points` titik)
+    labels = chart.get('labels') or []
+    income, expense = chart.get('income') or [], chart.get('expense') or []
+    if len(labels) > max(points, CHART_MIN_POINTS) and len(income) == len(expense) == len(labels):
+        half = max(points, CHART_MIN_POINTS) // 2
+        keep = np.union1d(lttb_indices(income, half), lttb_indices(expense, half)).tolist()
+        labels = [labels[i] for i in keep]
+        income, expense = [income[i] for i in keep], [expense[i] for i in keep]
+    return {'labels': list(labels), 'income': [compact_number(v) for v in income],
+            'expense': [compact_number(v) for v in expense]}
+
+
+def bucket_pie(pie, max_slices):
+    # Kategori kecil di ekor digabung jadi satu irisan "Lainnya"; urutan yang tersisa tetap
+    labels, data = pie.get('labels') or [], [compact_number(v) for v in pie.get('data') or []]
+    if max_slices < 2 or len(labels) <= max_slices:
+        return {'labels': list(labels), 'data': data}
+    order = sorted(range(len(data)), key=lambda i: data[i], reverse=True)
+    keep = sorted(order[:max_slices - 1])
+    rest = compact_number(sum(data[i] for i in order[max_slices - 1:]))
+    return {'labels': [labels[i] for i in keep] + [OTHER_LABEL], 'data': [data[i] for i in keep] + [rest]}
+
+
+def compact_dashboard(data, points, pie_slices):
+    # Salinan data dashboard/rentang tanggal yang siap dikirim ke browser
+    out = dict(data)
+    for key in ('chart_dirty', 'chart_clean'):
+        if data.get(key): out[key] = downsample_chart(data[key], points)
+    if data.get('pie_data'):
+        out['pie_data'] = {key: bucket_pie(pie, pie_slices) for key, pie in data['pie_data'].items()}
+    return out
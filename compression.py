@@ -0,0 +1,48 @@
+import gzip
+from metrics import metrics, timed
+
+try:
+    import brotli
+except ImportError:  # brotli opsional; tanpa paket ini response tetap dikompres gzip
+    brotli = None
+
+# --- KOMPRESI RESPONSE (BROTLI / GZIP) ---
+# HTML dashboard & JSON grafik berisi label tanggal dan angka yang berulang, jadi
+# ukurannya turun drastis setelah dikompres. Response streaming (export) dan file
+# statis (send_file) dilewati: body-nya tidak dibaca ke memori.
+
+COMPRESSIBLE_TYPES = {'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+                      'application/javascript', 'application/json', 'image/svg+xml'}
+
+metrics.describe('http_response_bytes_total', 'Byte body response per encoding (setelah kompresi)')
+
+
+def choose_encoding(accept_encodings):
+    # accept_encodings: request.accept_encodings (q=0 berarti ditolak)
+    if brotli is not None and accept_encodings['br'] > 0: return 'br'
+    if accept_encodings['gzip'] > 0: return 'gzip'
+    return None
+
+
+def compress_body(body, encoding, gzip_level=6, brotli_quality=5):
+    if encoding == 'br': return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response, accept_encodings, min_size=1024, gzip_level=6, brotli_quality=5):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    body = response.get_data()
+    encoding = choose_encoding(accept_encodings) if len(body) >= min_size else None
+    if encoding:
+        with timed('compress'):
+            body = compress_body(body, encoding, gzip_level, brotli_quality)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # Isi byte berubah: ETag kuat jadi lemah (If-None-Match tetap cocok)
+        etag, weak = response.get_etag()
+        if etag and not weak: response.set_etag(etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    metrics.inc('http_response_bytes_total', len(body), encoding=encoding or 'identity')
+    return response
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing, contextmanager
+import numpy as np
+from datetime import date, timedelta
+from transactions import Transactions, build_transactions, infer_date_format
+
+# --- QUERY RENTANG TANGGAL LINTAS WORKSHEET ---
+# Index per folder: worksheet -> tanggal min/max + rentang baris per hari. Query hanya
+# mengambil & mem-parse worksheet yang beririsan dengan rentang, dan hanya baris di
+# antara baris pertama & terakhir hari-hari yang diminta. Entry index ditandai revisi
+# data yang diindex (Drive modifiedTime) & signature plan; sheet yang berubah diindex ulang.
+# Format tanggal hasil tebakan kolom penuh ikut disimpan: potongan baris di-parse dengan
+# format yang sama, bukan ditebak ulang dari baris pertama potongan.
+
+
+class RangeError(Exception):
+    pass
+
+
+def parse_range(start=None, end=None, days=None, today=None):
+    # start/end 'YYYY-MM-DD' (inklusif) atau days = N hari terakhir termasuk hari ini
+    today = today or date.today()
+    try:
+        if days:
+            days = int(days)
+            if days < 1: raise ValueError
+            start, end = today - timedelta(days=days - 1), today
+        else:
+            if not start: raise RangeError("Isi tanggal awal atau jumlah hari.")
+            start = date.fromisoformat(start)
+            end = date.fromisoformat(end) if end else today
+    except ValueError:
+        raise RangeError("Format tanggal harus YYYY-MM-DD dan jumlah hari minimal 1.")
+    if start > end: raise RangeError("Tanggal awal harus sebelum tanggal akhir.")
+    return np.datetime64(start, 'D'), np.datetime64(end, 'D')
+
+
+class SheetDates:
+    def __init__(self, days=(), rows=0, date_format=None):
+        self.days = [(np.datetime64(d, 'D'), first, last) for d, first, last in days]  # urut per tanggal
+        self.rows = rows
+        self.date_format = date_format
+
+    @classmethod
+    def from_transactions(cls, transactions, date_format=None):
+        if transactions is None or transactions.is_empty: return cls(date_format=date_format)
+        days = transactions.dates.astype('datetime64[D]')
+        rows = np.flatnonzero(~np.isnat(days))
+        if not len(rows): return cls(rows=len(days), date_format=date_format)
+        unique_days, first = np.unique(days[rows], return_index=True)
+        # Baris terakhir per hari: unique pada urutan terbalik
+        _, last_rev = np.unique(days[rows][::-1], return_index=True)
+        last = len(rows) - 1 - last_rev
+        return cls(zip(unique_days, rows[first].tolist(), rows[last].tolist()), len(days), date_format)
+
+    def window(self, start, end):
+        # (baris awal, baris akhir + 1) yang memuat semua baris bertanggal di [start, end]
+        hits = [(first, last) for d, first, last in self.days if start <= d <= end]
+        if not hits: return None
+        return min(h[0] for h in hits), max(h[1] for h in hits) + 1
+
+    def to_json(self):
+        return json.dumps({'rows': self.rows, 'format': self.date_format,
+                           'days': [[str(d), f, l] for d, f, l in self.days]})
+
+    @classmethod
+    def from_json(cls, text):
+        # Entry lama tanpa format -> None (diindex ulang)
+        data = json.loads(text)
+        if 'format' not in data: return None
+        return cls(data['days'], data['rows'], data['format'])
+
+
+class DateIndex:
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder: os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS date_index (
+                    folder_id INTEGER NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    plan TEXT NOT NULL,
+                    revision TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (folder_id, sheet_name)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+            yield conn
+
+    def get(self, folder_id, plan_signature):
+        # {worksheet: (revisi data yang diindex, SheetDates)} untuk konfigurasi yang sama
+        with self._connect() as conn:
+            rows = conn.execute("SELECT sheet_name, revision, payload FROM date_index WHERE folder_id = ? AND plan = ?",
+                                (folder_id, plan_signature)).fetchall()
+        entries = {name: (revision, SheetDates.from_json(payload)) for name, revision, payload in rows}
+        return {name: entry for name, entry in entries.items() if entry[1] is not None}
+
+    def put(self, folder_id, sheet_name, plan_signature, revision, sheet_dates):
+        if not revision: return
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO date_index VALUES (?, ?, ?, ?, ?, ?)",
+                         (folder_id, sheet_name, plan_signature, revision, sheet_dates.to_json(), time.time()))
+
+    def delete_folders(self, folder_ids, batch_size=500):
+        folder_ids = list(folder_ids)
+        with self._connect() as conn:
+            for i in range(0, len(folder_ids), batch_size):
+                batch = folder_ids[i:i + batch_size]
+                conn.execute(f"DELETE FROM date_index WHERE folder_id IN ({','.join('?' * len(batch))})", batch)
+
+
+def slice_columns(columns, first, stop):
+    return {name: values[first:stop] for name, values in columns.items()}
+
+
+def range_transactions(plan, extract, start, end, sheet_dates=None):
+    # -> (Transactions dalam rentang, SheetDates baru atau None jika index sudah ada)
+    if sheet_dates is None:
+        date_format = infer_date_format(extract.columns.get(plan.roles['date']) or [])
+        transactions = build_transactions(plan, extract.columns, date_format)
+        sheet_dates = SheetDates.from_transactions(transactions, date_format)
+        window = sheet_dates.window(start, end)
+        if window is None: return None, sheet_dates
+        return transactions.take(slice(*window)).between(start, end), sheet_dates
+
+    window = sheet_dates.window(start, end)
+    if window is None: return None, None
+    transactions = build_transactions(plan, slice_columns(extract.columns, *window), sheet_dates.date_format)
+    return (transactions.between(start, end) if transactions is not None else None), None
+
+
+def summarize_range(parts):
+    # Ringkasan kotor/bersih + trend harian, bentuknya sama dengan data dashboard
+    transactions = Transactions.concat(parts)
+    summaries = {}
+    for key, clean in (('sum_kotor', False), ('sum_clean', True)):
+        income, expense = transactions.totals(clean)
+        summaries[key] = {'income': income, 'expense': expense, 'balance': income - expense}
+    chart_dirty, chart_clean = transactions.daily()
+    return summaries['sum_kotor'], summaries['sum_clean'], chart_dirty, chart_clean, len(transactions)
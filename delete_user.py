@@ -1,48 +1,172 @@
-from app import app
-from models import db, User, MonitorFolder, GlobalSettings, CategoryMap
+import sys
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func
+from app import app, snapshot_store, date_index, ingest_queue
+from models import db, User, MonitorFolder, GlobalSettings, CategoryMap, ReportSchedule
+
+# Contoh:
+#   python delete_user.py                                  (interaktif, satu username)
+#   python delete_user.py --file akun_test.txt --dry-run    (satu username per baris)
+#   python delete_user.py --pattern 'test_*' --yes
+#   python delete_user.py --pattern 'test_*' --inactive-days 365 --dry-run   (akun test DAN tidak aktif)
+#   python delete_user.py --inactive-days 365 --include-never --batch-size 200
+# Kriteria --file, --pattern & --inactive-days digabung dengan AND (semua harus cocok).
+# --include-never ditolak selama sebagian besar user belum punya catatan login (kolom baru).
+
+BATCH_SIZE = 500
+# --include-never hanya boleh jika user tanpa last_login_at paling banyak sebagian ini
+MAX_NEVER_SHARE = 0.5
+# DELETE langsung di database, tanpa menyinkronkan objek di session (tidak ada yang dimuat)
+SYNC_OFF = {'synchronize_session': False}
+
+
+# --- PILIH USER ---
+def like_pattern(pattern):
+    # Pola gaya shell (* dan ?) -> LIKE, karakter % dan _ dianggap literal
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+def read_usernames(path):
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    with f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def select_users(usernames=None, pattern=None, inactive_days=None, include_never=False):
+    # -> [(id, username)]; semua kriteria yang diisi harus cocok (AND)
+    conds = []
+    if pattern:
+        conds.append(User.username.like(like_pattern(pattern), escape='\\'))
+    if inactive_days is not None:
+        cutoff = datetime.utcnow() - timedelta(days=inactive_days)
+        cond = User.last_login_at < cutoff
+        # Akun lama belum punya last_login_at (kolom baru): hanya ikut jika diminta
+        if include_never: cond = cond | User.last_login_at.is_(None)
+        conds.append(cond)
+    query = select(User.id, User.username).where(*conds)
+    if usernames is None:
+        return [tuple(r) for r in db.session.execute(query.order_by(User.id))] if conds else []
+    rows = []
+    for i in range(0, len(usernames), BATCH_SIZE):
+        rows += [tuple(r) for r in db.session.execute(query.where(User.username.in_(usernames[i:i + BATCH_SIZE])))]
+    return sorted(rows)
+
+def select_user_ids(*args, **kwargs):
+    return [user_id for user_id, _ in select_users(*args, **kwargs)]
+
+def never_login_share():
+    total = db.session.scalar(select(func.count()).select_from(User))
+    never = db.session.scalar(select(func.count()).select_from(User).where(User.last_login_at.is_(None)))
+    return never / total if total else 0.0
+
+
+# --- HAPUS MASSAL (set-based, per batch dalam satu transaksi) ---
+def count_related(user_ids):
+    totals = {'user': len(user_ids), 'settings': 0, 'folder': 0, 'category': 0}
+    for i in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[i:i + BATCH_SIZE]
+        folders = select(MonitorFolder.id).where(MonitorFolder.user_id.in_(batch))
+        totals['settings'] += db.session.scalar(select(func.count()).where(GlobalSettings.user_id.in_(batch)))
+        totals['folder'] += db.session.scalar(select(func.count()).where(MonitorFolder.user_id.in_(batch)))
+        totals['category'] += db.session.scalar(select(func.count()).where(CategoryMap.folder_id.in_(folders)))
+    return totals
+
+def delete_users(user_ids, batch_size=BATCH_SIZE, progress=print):
+    deleted = {'user': 0, 'settings': 0, 'folder': 0, 'category': 0}
+    for i in range(0, len(user_ids), batch_size):
+        batch = user_ids[i:i + batch_size]
+        folder_ids = list(db.session.scalars(select(MonitorFolder.id).where(MonitorFolder.user_id.in_(batch))))
+        folders = select(MonitorFolder.id).where(MonitorFolder.user_id.in_(batch))
+        try:
+            # Urutan anak -> induk agar tidak melanggar foreign key
+            deleted['category'] += db.session.execute(
+                delete(CategoryMap).where(CategoryMap.folder_id.in_(folders)), execution_options=SYNC_OFF).rowcount
+            db.session.execute(
+                delete(ReportSchedule).where(ReportSchedule.folder_id.in_(folders)), execution_options=SYNC_OFF)
+            deleted['folder'] += db.session.execute(
+                delete(MonitorFolder).where(MonitorFolder.user_id.in_(batch)), execution_options=SYNC_OFF).rowcount
+            deleted['settings'] += db.session.execute(
+                delete(GlobalSettings).where(GlobalSettings.user_id.in_(batch)), execution_options=SYNC_OFF).rowcount
+            deleted['user'] += db.session.execute(
+                delete(User).where(User.id.in_(batch)), execution_options=SYNC_OFF).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        # Snapshot transaksi lokal, index tanggal & antrian input API ada di database terpisah
+        snapshot_store.delete_folders(folder_ids)
+        date_index.delete_folders(folder_ids)
+        ingest_queue.delete_folders(folder_ids)
+        if progress: progress(f"🔄 {min(i + batch_size, len(user_ids))}/{len(user_ids)} user dihapus...")
+    return deleted
+
+def format_counts(counts):
+    return (f"{counts['user']} user, {counts['settings']} service account, "
+            f"{counts['folder']} folder, {counts['category']} kategori")
+
 
 def hapus_user_by_username(username_target):
     with app.app_context():
-        # 1. Cari User
-        user = User.query.filter_by(username=username_target).first()
-        
-        if not user:
+        user_ids = select_user_ids(usernames=[username_target])
+        if not user_ids:
             print(f"❌ User '{username_target}' tidak ditemukan!")
             return
 
-        print(f"🔄 Sedang menghapus user: {user.username} (ID: {user.id})...")
-
+        print(f"🔄 Sedang menghapus user: {username_target} (ID: {user_ids[0]})...")
         try:
-            # 2. Hapus Data Terkait (Manual Cascade Delete)
-            # Agar tidak error foreign key atau meninggalkan data sampah
-            
-            # Hapus Global Settings milik user
-            GlobalSettings.query.filter_by(user_id=user.id).delete()
-            
-            # Cari semua folder milik user
-            folders = MonitorFolder.query.filter_by(user_id=user.id).all()
-            for f in folders:
-                # Hapus category map di dalam folder tersebut
-                CategoryMap.query.filter_by(folder_id=f.id).delete()
-                # Hapus folder itu sendiri
-                db.session.delete(f)
-            
-            # 3. Hapus User Utama
-            db.session.delete(user)
-            
-            # 4. Simpan Perubahan
-            db.session.commit()
+            delete_users(user_ids, progress=None)
             print(f"✅ SUKSES: User '{username_target}' dan seluruh datanya telah dihapus.")
-            
         except Exception as e:
-            db.session.rollback()
             print(f"❌ GAGAL: Terjadi error - {str(e)}")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hapus user beserta service account, folder & kategorinya.")
+    parser.add_argument('--file', help="file berisi username (satu per baris, '-' = stdin)")
+    parser.add_argument('--pattern', help="pola username, mis. 'test_*'")
+    parser.add_argument('--inactive-days', type=int, help='user yang terakhir login lebih dari N hari lalu')
+    parser.add_argument('--include-never', action='store_true', help='ikutkan user tanpa catatan login')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='hanya tampilkan user & jumlah data yang akan dihapus')
+    parser.add_argument('--yes', action='store_true', help='tanpa konfirmasi')
+    args = parser.parse_args(argv)
+
+    if not (args.file or args.pattern or args.inactive_days is not None):
+        # Mode lama: satu username, interaktif
+        target = input("Masukkan USERNAME yang ingin dihapus: ")
+        confirmation = input(f"Yakin ingin menghapus '{target}' selamanya? (y/n): ")
+        if confirmation.lower() == 'y':
+            hapus_user_by_username(target)
+        else:
+            print("Dibatalkan.")
+        return 0
+
+    with app.app_context():
+        if args.include_never and never_login_share() > MAX_NEVER_SHARE:
+            # Tepat setelah deploy kolom last_login_at masih kosong untuk semua akun lama
+            print(f"❌ {never_login_share():.0%} user belum punya catatan login; --include-never akan memilih "
+                  f"hampir semua user. Tunggu sampai sebagian besar user login, atau pakai --file/--pattern.")
+            return 2
+        users = select_users(read_usernames(args.file) if args.file else None, args.pattern,
+                             args.inactive_days, args.include_never)
+        if not users:
+            print("Tidak ada user yang cocok.")
+            return 0
+        user_ids = [user_id for user_id, _ in users]
+        if args.dry_run:
+            for user_id, username in users: print(f"  - {username} (ID: {user_id})")
+        print(f"Akan dihapus: {format_counts(count_related(user_ids))}")
+        if args.dry_run: return 0
+        if not args.yes and input("Lanjutkan? (y/n): ").lower() != 'y':
+            print("Dibatalkan.")
+            return 1
+        try:
+            deleted = delete_users(user_ids, max(1, args.batch_size))
+        except Exception as e:
+            print(f"❌ GAGAL: Terjadi error - {str(e)}")
+            return 1
+        print(f"✅ SUKSES: {format_counts(deleted)} dihapus.")
+    return 0
+
 if __name__ == "__main__":
-    target = input("Masukkan USERNAME yang ingin dihapus: ")
-    confirmation = input(f"Yakin ingin menghapus '{target}' selamanya? (y/n): ")
-    
-    if confirmation.lower() == 'y':
-        hapus_user_by_username(target)
-    else:
-        print("Dibatalkan.")
\ No newline at end of file
+    sys.exit(main())
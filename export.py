@@ -0,0 +1,138 @@
+import io
+import numpy as np
+import pandas as pd
+from transactions import build_transactions
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet opsional; CSV selalu tersedia
+    pa = pq = None
+
+# --- EXPORT TRANSAKSI (CSV / PARQUET, STREAMING) ---
+# Satu worksheet diambil & diubah ke tabel dalam satu waktu, lalu langsung dikirim
+# (CSV per potongan baris, Parquet per row group). Memori tidak ikut membesar
+# dengan jumlah bulan dalam setahun. Mode 'clean' = nominal hutang dinolkan,
+# sama seperti data bersih di dashboard.
+
+EXPORT_COLUMNS = ['tanggal', 'sheet', 'pemasukan', 'pengeluaran', 'sumber_pemasukan', 'sumber_pengeluaran']
+CSV_CHUNK_ROWS = 5000
+FORMATS = {'csv': ('text/csv; charset=utf-8', 'csv'), 'parquet': ('application/vnd.apache.parquet', 'parquet')}
+
+
+class ExportError(Exception):
+    pass
+
+
+def parquet_available():
+    return pq is not None
+
+
+def parse_filters(start=None, end=None, categories=None):
+    # Tanggal 'YYYY-MM-DD' (inklusif); kategori = nilai kolom sumber pemasukan/pengeluaran
+    try:
+        start = pd.Timestamp(start) if start else None
+        end = pd.Timestamp(end) + pd.Timedelta(days=1) if end else None
+    except ValueError:
+        raise ExportError("Format tanggal harus YYYY-MM-DD.")
+    if start is not None and end is not None and start >= end:
+        raise ExportError("Tanggal awal harus sebelum tanggal akhir.")
+    categories = {c.strip().lower() for c in (categories or []) if c and c.strip()} or None
+    return start, end, categories
+
+
+def sheet_frame(plan, sheet_name, extract, clean=False, start=None, end=None, categories=None):
+    transactions = build_transactions(plan, extract.columns)
+    if transactions is None or transactions.is_empty: return None
+    size = len(transactions)
+    income, expense = transactions.series(clean)
+
+    def text(role):
+        values = extract.columns.get(plan.roles[role])
+        if values is None: return np.full(size, '', dtype=object)
+        return pd.Series(values, dtype=object).fillna('').astype(str).str.strip().to_numpy()
+
+    frame = pd.DataFrame({
+        'tanggal': transactions.dates,
+        'sheet': sheet_name,
+        'pemasukan': income if income is not None else np.full(size, np.nan),
+        'pengeluaran': expense if expense is not None else np.full(size, np.nan),
+        'sumber_pemasukan': text('source_income'),
+        'sumber_pengeluaran': text('source_expense'),
+    }, columns=EXPORT_COLUMNS)
+
+    # Baris kosong (tanpa tanggal & nominal) dari padding sheet dibuang
+    keep = frame['tanggal'].notna() | frame['pemasukan'].notna() | frame['pengeluaran'].notna()
+    if start is not None: keep &= frame['tanggal'] >= start
+    if end is not None: keep &= frame['tanggal'] < end
+    if categories:
+        keep &= (frame['sumber_pemasukan'].str.lower().isin(categories)
+                 | frame['sumber_pengeluaran'].str.lower().isin(categories))
+    return frame[keep.to_numpy()].reset_index(drop=True)
+
+
+def iter_frames(plan, sheet_names, load_extract, clean=False, start=None, end=None, categories=None):
+    # load_extract(sheet_name) -> SheetExtract/None; dipanggil satu per satu
+    for name in sheet_names:
+        extract = load_extract(name)
+        if extract is None or extract.is_empty: continue
+        frame = sheet_frame(plan, name, extract, clean, start, end, categories)
+        if frame is not None and len(frame): yield frame
+
+
+def iter_csv(frames, chunk_rows=CSV_CHUNK_ROWS):
+    header = True
+    for frame in frames:
+        for i in range(0, len(frame), chunk_rows):
+            yield frame.iloc[i:i + chunk_rows].to_csv(index=False, header=header, date_format='%Y-%m-%d %H:%M:%S')
+            header = False
+    if header: yield ','.join(EXPORT_COLUMNS) + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    # Tujuan tulis ParquetWriter: isinya diambil (drain) setiap selesai satu row group
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data, self._buffer = bytes(self._buffer), bytearray()
+        return data
+
+
+def parquet_schema():
+    return pa.schema([('tanggal', pa.timestamp('ms')), ('sheet', pa.string()),
+                      ('pemasukan', pa.float64()), ('pengeluaran', pa.float64()),
+                      ('sumber_pemasukan', pa.string()), ('sumber_pengeluaran', pa.string())])
+
+
+def iter_parquet(frames):
+    if pq is None: raise ExportError("Export Parquet membutuhkan paket pyarrow.")
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for frame in frames:
+            frame = frame.assign(tanggal=frame['tanggal'].astype('datetime64[ms]'))
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            data = sink.drain()
+            if data: yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(fmt, frames):
+    if fmt == 'parquet': return iter_parquet(frames)
+    return (chunk.encode('utf-8') for chunk in iter_csv(frames))
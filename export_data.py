@@ -0,0 +1,60 @@
+import sys
+import argparse
+from app import app, get_google_client, export_sheet_names, export_chunks
+from models import db, MonitorFolder
+from export import FORMATS, ExportError, parse_filters, parquet_available
+
+# Contoh:
+#   python export_data.py 3 -o keuangan-2025.csv
+#   python export_data.py 3 --format parquet --mode clean --start 2025-01-01 --end 2025-06-30 -o semester1.parquet
+#   python export_data.py 3 --category Makan --category Transport > makan-transport.csv
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export transaksi satu folder (tahun) ke CSV/Parquet.")
+    parser.add_argument('folder_id', type=int)
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('--mode', choices=['raw', 'clean'], default='raw', help="clean = nominal hutang dinolkan")
+    parser.add_argument('--start', help='tanggal awal YYYY-MM-DD')
+    parser.add_argument('--end', help='tanggal akhir YYYY-MM-DD (inklusif)')
+    parser.add_argument('--category', action='append', help='sumber pemasukan/pengeluaran (boleh berulang)')
+    parser.add_argument('-o', '--output', help='file tujuan (default stdout)')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.format == 'parquet' and not parquet_available():
+            raise ExportError("Export Parquet membutuhkan paket pyarrow.")
+        start, end, categories = parse_filters(args.start, args.end, args.category)
+    except ExportError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    with app.app_context():
+        folder = db.session.get(MonitorFolder, args.folder_id)
+        if not folder:
+            print(f"❌ Folder {args.folder_id} tidak ditemukan!", file=sys.stderr)
+            return 1
+        client = get_google_client(folder.user_id)
+        if not client:
+            print("❌ Akun Google pemilik folder belum diatur.", file=sys.stderr)
+            return 1
+
+        try:
+            sheet_names = export_sheet_names(client, folder)
+        except Exception as e:
+            print(f"❌ GAGAL: {str(e)}", file=sys.stderr)
+            return 1
+
+        out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in export_chunks(client, folder, sheet_names, args.format, args.mode == 'clean', start, end, categories):
+                out.write(chunk)
+        except Exception as e:
+            print(f"❌ GAGAL: Terjadi error - {str(e)}", file=sys.stderr)
+            return 1
+        finally:
+            if args.output: out.close()
+    if args.output: print(f"✅ Export selesai: {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
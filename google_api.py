@@ -0,0 +1,249 @@
+import time
+import random
+import hashlib
+import threading
+import requests
+from gspread.exceptions import APIError
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from metrics import metrics
+
+# --- LAPISAN PANGGILAN GOOGLE API (kuota, retry, circuit breaker) ---
+# Semua panggilan gspread dari app lewat GuardedClient: token bucket per service account,
+# retry dengan exponential backoff + jitter untuk 429/5xx/timeout, dan circuit breaker.
+# Saat circuit terbuka panggilan langsung gagal, sehingga app memakai data terakhir yang bagus.
+# Token bucket disimpan per proses: dengan N worker gunicorn, kuota efektif = N x rate.
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN = 0, 1, 2
+
+metrics.describe('google_api_errors_total', 'Panggilan Google API yang gagal per status')
+metrics.describe('google_api_retries_total', 'Panggilan Google API yang diulang')
+metrics.describe('google_quota_wait_seconds', 'Waktu menunggu token bucket sebelum memanggil Google')
+metrics.describe('google_quota_rejected_total', 'Panggilan yang ditolak lokal karena kuota habis')
+
+
+class GoogleApiError(Exception):
+    pass
+
+class QuotaExceededError(GoogleApiError):
+    def __init__(self, message="Kuota Google Sheets sedang penuh, coba lagi sebentar lagi."):
+        super().__init__(message)
+
+class CircuitOpenError(GoogleApiError):
+    def __init__(self, message="Google Sheets sedang tidak bisa dihubungi, menampilkan data terakhir."):
+        super().__init__(message)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait):
+        # Tunggu token; jika perlu menunggu lebih dari max_wait -> None tanpa mengambil token
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            if wait > max_wait: return None
+            self.tokens -= 1  # token dipesan sekarang, boleh negatif selama menunggu
+        if wait: time.sleep(wait)
+        return wait
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None: return CIRCUIT_CLOSED
+            if time.monotonic() - self.opened_at >= self.reset_timeout: return CIRCUIT_HALF_OPEN
+            return CIRCUIT_OPEN
+
+    def allow(self):
+        # Half-open: hanya satu panggilan percobaan, sisanya tetap ditolak
+        with self._lock:
+            if self.opened_at is None: return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial: return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures, self.opened_at, self._trial = 0, None, False
+
+    def release(self):
+        # Panggilan percobaan batal (bukan karena Google): izinkan percobaan berikutnya
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+def error_status(error):
+    # Status HTTP dari error gspread/requests; None = bukan error sementara
+    if isinstance(error, APIError):
+        response = getattr(error, 'response', None)
+        return getattr(response, 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(error, requests.exceptions.Timeout): return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError): return 'connection'
+    return None
+
+
+def retry_after(error):
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    try: return float(value) if value else None
+    except ValueError: return None
+
+
+class GoogleApi:
+    def __init__(self, rate_per_minute=60, burst=10, max_wait=10, max_retries=4,
+                 backoff_base=0.5, backoff_cap=16, failure_threshold=5, reset_timeout=60, timeout=30):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timeout = timeout
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _for_account(self, account):
+        with self._lock:
+            if account not in self._buckets:
+                self._buckets[account] = TokenBucket(self.rate_per_minute, self.burst)
+                self._breakers[account] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._buckets[account], self._breakers[account]
+
+    def wrap(self, client, account):
+        if client is None: return None
+        if self.timeout and hasattr(client, 'set_timeout'): client.set_timeout(self.timeout)
+        return GuardedClient(client, self, account)
+
+    def call(self, account, name, fn, *args, limited=True, idempotent=True, **kwargs):
+        bucket, breaker = self._for_account(account)
+        metrics.inc('google_api_calls_total', call=name)
+        if not breaker.allow(): raise CircuitOpenError()
+
+        for attempt in range(self.max_retries + 1):
+            if limited:
+                waited = bucket.acquire(self.max_wait)
+                if waited is None:
+                    metrics.inc('google_quota_rejected_total', call=name)
+                    breaker.release()
+                    raise QuotaExceededError()
+                metrics.observe('google_quota_wait_seconds', waited)
+            try:
+                result = fn(*args, **kwargs)
+                breaker.success()
+                return result
+            except Exception as e:
+                status = error_status(e)
+                metrics.inc('google_api_errors_total', call=name, status=status or 'other')
+                if status is None:
+                    breaker.release()
+                    raise
+                if isinstance(status, int) and status not in RETRY_STATUS:
+                    # Error permanen (403, 404, range tidak valid): Google sendiri tetap sehat
+                    breaker.success()
+                    raise
+                if attempt == self.max_retries or (not idempotent and status != 429):
+                    # Tulis (append) hanya diulang untuk 429: pada 5xx/timeout datanya mungkin sudah tersimpan
+                    breaker.failure()
+                    if status == 429: raise QuotaExceededError() from e
+                    raise
+                # Full jitter, dibatasi backoff_cap; Retry-After dari Google dihormati
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                delay = max(delay, retry_after(e) or 0)
+                metrics.inc('google_api_retries_total', call=name)
+                time.sleep(delay)
+
+    def gauges(self):
+        with self._lock:
+            accounts = list(self._buckets.items())
+            breakers = dict(self._breakers)
+        result = []
+        for account, bucket in accounts:
+            result.append(('google_quota_tokens', {'account': account}, round(bucket.available(), 2)))
+            result.append(('google_circuit_state', {'account': account}, breakers[account].state))
+        return result
+
+
+def account_key(client, fallback):
+    # Kuota Google dihitung per service account; label pendek agar email tidak terekspos di /metrics
+    http_client = getattr(client, 'http_client', None)
+    creds = getattr(http_client, 'auth', None) or getattr(client, 'auth', None)
+    email = getattr(creds, 'service_account_email', None) or fallback
+    return hashlib.sha1(str(email).encode()).hexdigest()[:10]
+
+
+def drive_file_version(client, file_id):
+    # gspread hanya meminta modifiedTime; 'version' naik satu setiap file berubah
+    resp = client.http_client.request('get', f"{DRIVE_FILES_API_V3_URL}/{file_id}",
+                                      params={'supportsAllDrives': True, 'fields': 'modifiedTime,version'})
+    return resp.json()
+
+
+# --- PROXY GSPREAD: panggilan yang dipakai app lewat GoogleApi.call ---
+
+class _Guarded:
+    def __init__(self, target, api, account):
+        self._target = target
+        self._api = api
+        self._account = account
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def _call(self, name, *args, limited=True, **kwargs):
+        return self._api.call(self._account, name, getattr(self._target, name), *args, limited=limited, **kwargs)
+
+
+class GuardedClient(_Guarded):
+    def open_by_url(self, url):
+        return GuardedSpreadsheet(self._call('open_by_url', url), self._api, self._account)
+
+    def get_file_drive_metadata(self, file_id):
+        # Drive API punya kuota sendiri yang jauh lebih besar -> tidak lewat token bucket Sheets
+        return self._call('get_file_drive_metadata', file_id, limited=False)
+
+    def get_file_version(self, file_id):
+        return self._api.call(self._account, 'get_file_version', drive_file_version, self._target, file_id,
+                              limited=False)
+
+
+class GuardedSpreadsheet(_Guarded):
+    def values_batch_get(self, ranges, params=None):
+        return self._call('values_batch_get', ranges, params=params)
+
+    def values_append(self, range, params, body):
+        return self._call('values_append', range, params, body, idempotent=False)
@@ -0,0 +1,66 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- POOL CLIENT GOOGLE PER USER ---
+# Client gspread yang sudah authorize (beserta HTTP session keep-alive-nya) disimpan
+# per user, sehingga request berikutnya tidak perlu decrypt + token exchange ulang.
+# Token tidak di-refresh di sini: AuthorizedSession milik gspread sudah me-refresh
+# credentials sebelum request jika kadaluarsa (dan sekali lagi saat mendapat 401).
+
+class _PoolEntry:
+    def __init__(self, fingerprint, client):
+        self.fingerprint = fingerprint
+        self.client = client
+
+
+def creds_fingerprint(creds_encrypted):
+    return hashlib.sha256(creds_encrypted.encode()).hexdigest()
+
+
+class GoogleClientPool:
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id, creds_encrypted, factory):
+        # Fingerprint dari creds terenkripsi: jika worker lain menyimpan creds baru,
+        # entry lama otomatis tidak cocok lagi.
+        fingerprint = creds_fingerprint(creds_encrypted)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry.fingerprint == fingerprint:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry: return entry.client
+
+        client = factory(creds_encrypted)
+        if client is None: return None
+        with self._lock:
+            self._entries[user_id] = _PoolEntry(fingerprint, client)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return client
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,412 @@
+import os
+import json
+import math
+import time
+import hashlib
+import secrets
+import sqlite3
+from contextlib import closing, contextmanager
+import threading
+from datetime import datetime
+from gspread.utils import a1_to_rowcol
+from google_api import GoogleApiError, QuotaExceededError, CircuitOpenError, error_status
+from metrics import metrics
+
+# --- INPUT TRANSAKSI LEWAT API (bot/script -> antrian lokal -> Google Sheets) ---
+# Baris yang dikirim lewat API disimpan dulu di SQLite (tahan restart, dipakai bersama
+# semua worker gunicorn). Flusher mengambil antrian & menulis semua baris satu worksheet
+# dengan SATU values_append, bukan append_row per transaksi, sehingga kuota tulis Google
+# tidak habis. ID dari client unik per folder: kiriman ulang tidak menambah baris dobel.
+
+PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+ROLE_ATTRS = {'date': 'col_date', 'income': 'col_income', 'expense': 'col_expense',
+              'source_income': 'col_source_income', 'source_expense': 'col_source_expense'}
+MONTHS = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+          'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+MAX_ID_LENGTH = 100
+MAX_TEXT_LENGTH = 200
+APPEND_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+metrics.describe('ingest_rows_total', 'Baris input API per hasil (queued/duplicate/sent/retry/failed)')
+metrics.describe('ingest_append_rows', 'Jumlah baris per panggilan values_append')
+
+
+class IngestError(Exception):
+    pass
+
+
+# --- TOKEN API PER FOLDER (yang disimpan hanya hash-nya) ---
+
+def new_token():
+    return secrets.token_urlsafe(32)
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def check_token(token, token_hash):
+    if not token or not token_hash: return False
+    return secrets.compare_digest(hash_token(token), token_hash)
+
+
+# --- VALIDASI ---
+
+def _amount(value):
+    if value is None or value == '': return None
+    if isinstance(value, bool): raise ValueError
+    amount = float(value)
+    if not math.isfinite(amount) or amount < 0: raise ValueError
+    return int(amount) if amount == int(amount) else round(amount, 2)
+
+
+def _timestamp(value, now):
+    if value is None or value == '': return now.replace(microsecond=0)
+    return datetime.fromisoformat(str(value).strip().replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def _sheet_for(folder, sheet, when):
+    sheets = folder.get_sheet_list()
+    if sheet:
+        if sheet not in sheets: raise IngestError(f"Sheet '{sheet}' tidak ada di konfigurasi folder.")
+        return sheet
+    # Tanpa field sheet: worksheet bulan dari tanggal transaksi (Januari, Februari, ...)
+    by_name = {s.lower(): s for s in sheets}
+    name = by_name.get(MONTHS[when.month - 1].lower())
+    if not name: raise IngestError(f"Sheet bulan {MONTHS[when.month - 1]} tidak ada, isi field 'sheet'.")
+    return name
+
+
+def validate_item(folder, plan, item, now):
+    # -> (client_id, sheet_name, {role: nilai}); nilai sudah dinormalisasi
+    if not isinstance(item, dict): raise IngestError("Setiap transaksi harus berupa object JSON.")
+    client_id = item.get('id')
+    if not isinstance(client_id, (str, int)) or isinstance(client_id, bool) or not str(client_id).strip():
+        raise IngestError("Field 'id' wajib diisi (string unik dari client).")
+    client_id = str(client_id).strip()
+    if len(client_id) > MAX_ID_LENGTH: raise IngestError(f"Field 'id' maksimal {MAX_ID_LENGTH} karakter.")
+
+    try: when = _timestamp(item.get('date'), now)
+    except (TypeError, ValueError): raise IngestError("Format 'date' harus ISO 8601 (YYYY-MM-DD atau YYYY-MM-DD HH:MM:SS).")
+    values = {'date': when.strftime('%Y-%m-%d %H:%M:%S')}
+    for role in ('income', 'expense'):
+        try: values[role] = _amount(item.get(role))
+        except (TypeError, ValueError): raise IngestError(f"'{role}' harus angka >= 0.")
+    if not values['income'] and not values['expense']:
+        raise IngestError("Isi 'income' atau 'expense' (lebih dari 0).")
+    for role in ('source_income', 'source_expense'):
+        text = item.get(role)
+        if text is None or text == '': continue
+        if not isinstance(text, str): raise IngestError(f"'{role}' harus string.")
+        if len(text) > MAX_TEXT_LENGTH: raise IngestError(f"'{role}' maksimal {MAX_TEXT_LENGTH} karakter.")
+        values[role] = text.strip()
+
+    sheet_name = _sheet_for(folder, item.get('sheet'), when)
+    # Setiap nilai harus punya kolom: dari konfigurasi folder & (jika sudah diketahui) header sheet
+    header = plan.headers.get(sheet_name)
+    for role, value in values.items():
+        if value is None or value == '': continue
+        column = getattr(folder, ROLE_ATTRS[role])
+        if not column: raise IngestError(f"Kolom untuk '{role}' belum diatur di konfigurasi folder.")
+        if header and column not in header['cols']:
+            raise IngestError(f"Kolom '{column}' tidak ditemukan di header sheet '{sheet_name}'.")
+    return client_id, sheet_name, values
+
+
+def validate_items(folder, plan, items, now=None):
+    # -> (baris valid, error per index); satu error = seluruh kiriman ditolak oleh route
+    now = now or datetime.now()
+    rows, errors, seen = [], [], set()
+    for i, item in enumerate(items):
+        try:
+            row = validate_item(folder, plan, item, now)
+            if row[0] in seen: raise IngestError(f"'id' {row[0]} dobel dalam satu kiriman.")
+            seen.add(row[0])
+            rows.append(row)
+        except IngestError as e:
+            errors.append({'index': i, 'id': item.get('id') if isinstance(item, dict) else None, 'error': str(e)})
+    return rows, errors
+
+
+# --- BARIS SHEET ---
+
+def _cell_text(value):
+    # USER_ENTERED: teks diawali = + - @ akan dianggap rumus -> paksa sebagai teks
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'): return "'" + value
+    return value
+
+
+def sheet_row(folder, col_index, values):
+    # Nilai per peran -> list sel sesuai posisi kolom header (1-based) di worksheet
+    positions = {role: col_index.get(getattr(folder, ROLE_ATTRS[role])) for role in values}
+    missing = [getattr(folder, ROLE_ATTRS[r]) for r, v in values.items() if v not in (None, '') and not positions[r]]
+    if missing: raise IngestError(f"Kolom {', '.join(missing)} tidak ditemukan di header sheet.")
+    row = [''] * max((p for p in positions.values() if p), default=0)
+    for role, value in values.items():
+        if positions[role] and value is not None: row[positions[role] - 1] = _cell_text(value)
+    return row
+
+
+def snapshot_row(folder, col_index, cells):
+    # Satu baris hasil baca ulang dari sheet -> nilai per kolom snapshot (col_date, col_income, ...)
+    row = {}
+    for role, attr in ROLE_ATTRS.items():
+        position = col_index.get(getattr(folder, attr))
+        if position and position <= len(cells) and cells[position - 1] != '': row[attr] = cells[position - 1]
+    return row
+
+
+def updated_range(response):
+    return (response or {}).get('updates', {}).get('updatedRange')
+
+
+def appended_start(response, header_row):
+    # updatedRange "'Januari'!A42:E44" -> indeks baris data pertama (0-based setelah header)
+    updated = updated_range(response)
+    if not updated: return None
+    row, _ = a1_to_rowcol(updated.split('!')[-1].split(':')[0])
+    return row - header_row - 1
+
+
+def is_retryable(error):
+    # True = belum tersimpan di Google (kuota/circuit/429), aman dikirim ulang nanti
+    if isinstance(error, (QuotaExceededError, CircuitOpenError)): return True
+    if isinstance(error, IngestError): return False
+    if isinstance(error, GoogleApiError): return True
+    return error_status(error) == 429
+
+
+def is_uncertain(error):
+    # 5xx/timeout saat menulis: Google mungkin sudah menyimpan barisnya, jadi tidak dikirim ulang otomatis
+    status = error_status(error)
+    return status is not None and status != 429 and (not isinstance(status, int) or status >= 500)
+
+
+# --- ANTRIAN (SQLite) ---
+
+class QueuedRow:
+    def __init__(self, id, folder_id, client_id, sheet_name, values, attempts):
+        self.id = id
+        self.folder_id = folder_id
+        self.client_id = client_id
+        self.sheet_name = sheet_name
+        self.values = values
+        self.attempts = attempts
+
+
+class IngestQueue:
+    def __init__(self, path, lease=300, max_attempts=8, backoff_base=5, backoff_cap=600):
+        self.path = path
+        self.lease = lease                  # detik; batch 'sending' lebih lama dari ini dianggap worker mati
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        folder = os.path.dirname(path)
+        if folder: os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    folder_id INTEGER NOT NULL,
+                    client_id TEXT NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    claimed_until REAL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    sent_at REAL,
+                    UNIQUE (folder_id, client_id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ingest_queue_status ON ingest_queue (status, next_attempt_at)")
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+            yield conn
+
+    def enqueue(self, folder_id, rows):
+        # rows: [(client_id, sheet_name, values)] -> [client_id yang sudah pernah diterima]
+        now = time.time()
+        with self._connect() as conn:
+            duplicates = []
+            for client_id, sheet_name, values in rows:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO ingest_queue (folder_id, client_id, sheet_name, payload, status, "
+                    "next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (folder_id, client_id, sheet_name, json.dumps(values), PENDING, now, now)
+                )
+                if not cur.rowcount: duplicates.append(client_id)
+        return duplicates
+
+    def claim(self, limit=5000):
+        # Ambil baris siap kirim & tandai 'sending' dalam satu transaksi (aman lintas worker)
+        now = time.time()
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE ingest_queue SET status = ? WHERE status = ? AND claimed_until < ?",
+                         (PENDING, SENDING, now))
+            rows = conn.execute(
+                "SELECT id, folder_id, client_id, sheet_name, payload, attempts FROM ingest_queue "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?", (PENDING, now, limit)
+            ).fetchall()
+            conn.executemany("UPDATE ingest_queue SET status = ?, claimed_until = ? WHERE id = ?",
+                             [(SENDING, now + self.lease, r[0]) for r in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return [QueuedRow(r[0], r[1], r[2], r[3], json.loads(r[4]), r[5]) for r in rows]
+
+    def renew(self, rows):
+        # Perpanjang lease baris yang masih 'sending' (flush yang lama, mis. menunggu Retry-After)
+        with self._connect() as conn:
+            conn.executemany("UPDATE ingest_queue SET claimed_until = ? WHERE id = ? AND status = ?",
+                             [(time.time() + self.lease, r.id, SENDING) for r in rows])
+
+    def mark_sent(self, rows):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("UPDATE ingest_queue SET status = ?, sent_at = ?, error = NULL, claimed_until = NULL "
+                             "WHERE id = ?", [(SENT, now, r.id) for r in rows])
+
+    def mark_error(self, rows, error, retry):
+        # retry: kembali ke antrian dengan backoff; habis percobaan / error permanen -> failed
+        now = time.time()
+        updates = []
+        for r in rows:
+            attempts = r.attempts + 1
+            again = retry and attempts < self.max_attempts
+            delay = min(self.backoff_cap, self.backoff_base * 2 ** (attempts - 1))
+            updates.append((PENDING if again else FAILED, attempts, now + delay, str(error)[:500], r.id))
+        with self._connect() as conn:
+            conn.executemany("UPDATE ingest_queue SET status = ?, attempts = ?, next_attempt_at = ?, error = ?, "
+                             "claimed_until = NULL WHERE id = ?", updates)
+
+    def status(self, folder_id, client_ids):
+        marks = ','.join('?' * len(client_ids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT client_id, sheet_name, status, attempts, error, created_at, sent_at FROM ingest_queue "
+                f"WHERE folder_id = ? AND client_id IN ({marks})", (folder_id, *client_ids)
+            ).fetchall()
+        return {r[0]: {'sheet': r[1], 'status': r[2], 'attempts': r[3], 'error': r[4],
+                       'created_at': r[5], 'sent_at': r[6]} for r in rows}
+
+    def counts(self, folder_id=None):
+        query = "SELECT status, COUNT(*) FROM ingest_queue"
+        args = ()
+        if folder_id is not None: query, args = query + " WHERE folder_id = ?", (folder_id,)
+        with self._connect() as conn:
+            return dict(conn.execute(query + " GROUP BY status", args).fetchall())
+
+    def prune(self, older_than):
+        # Baris terkirim disimpan selama jendela idempotensi, setelah itu dibuang
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM ingest_queue WHERE status = ? AND sent_at < ?",
+                                (SENT, time.time() - older_than)).rowcount
+
+    def delete_folders(self, folder_ids, batch_size=500):
+        folder_ids = list(folder_ids)
+        with self._connect() as conn:
+            for i in range(0, len(folder_ids), batch_size):
+                batch = folder_ids[i:i + batch_size]
+                conn.execute(f"DELETE FROM ingest_queue WHERE folder_id IN ({','.join('?' * len(batch))})", batch)
+
+
+# --- FLUSHER BACKGROUND ---
+
+class IngestFlusher:
+    def __init__(self, queue, flush_fn, delay=2, interval=30, batch_rows=1000, keep_sent=7 * 86400):
+        self.queue = queue
+        self.flush_fn = flush_fn            # flush_fn(folder_id, {sheet_name: [QueuedRow]}) -> {sheet_name: error/None}
+        self.delay = delay                  # tunggu sebentar setelah ada kiriman agar baris lain ikut satu batch
+        self.interval = interval            # cek antrian berkala (retry, sisa dari worker lain)
+        self.batch_rows = batch_rows
+        self.keep_sent = keep_sent
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self._loop, name='ingest-flusher', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        self.start()
+        self._wake.set()
+
+    def flush_once(self):
+        # -> jumlah baris yang berhasil ditulis ke Google
+        written, claimed = 0, self.batch_rows
+        while claimed >= self.batch_rows:
+            claimed, count = self._flush_batch()
+            written += count
+        return written
+
+    def _keep_leased(self, rows, stop):
+        # Selama worker ini masih hidup lease terus diperpanjang, jadi flush yang lebih lama dari lease
+        # (backoff/Retry-After Google) tidak di-claim worker lain yang lalu menulis baris yang sama lagi
+        while not stop.wait(self.queue.lease / 3):
+            try: self.queue.renew(rows)
+            except Exception as e: print(f"Ingest Lease Error: {e}")
+
+    def _flush_batch(self):
+        rows = self.queue.claim(self.batch_rows)
+        if not rows: return 0, 0
+        stop = threading.Event()
+        keeper = threading.Thread(target=self._keep_leased, args=(rows, stop), name='ingest-lease', daemon=True)
+        keeper.start()
+        try:
+            return self._flush_rows(rows)
+        finally:
+            stop.set()
+            keeper.join()
+
+    def _flush_rows(self, rows):
+        by_folder = {}
+        for r in rows:
+            by_folder.setdefault(r.folder_id, {}).setdefault(r.sheet_name, []).append(r)
+        written = 0
+        for folder_id, sheets in by_folder.items():
+            try:
+                results = self.flush_fn(folder_id, sheets)
+            except Exception as e:
+                results = {name: e for name in sheets}
+            for name, batch in sheets.items():
+                error = results.get(name)
+                if error is None:
+                    self.queue.mark_sent(batch)
+                    metrics.inc('ingest_rows_total', len(batch), result='sent')
+                    metrics.observe('ingest_append_rows', len(batch), buckets=APPEND_BUCKETS)
+                    written += len(batch)
+                else:
+                    print(f"Ingest Error folder {folder_id} '{name}': {error}")
+                    retry = is_retryable(error)
+                    message = f"{error} (cek sheet sebelum kirim ulang dengan id baru)" if is_uncertain(error) else error
+                    self.queue.mark_error(batch, message, retry)
+                    metrics.inc('ingest_rows_total', len(batch), result='retry' if retry else 'failed')
+        return len(rows), written
+
+    def _loop(self):
+        last_prune = 0
+        while True:
+            if self._wake.wait(self.interval):
+                time.sleep(self.delay)
+            self._wake.clear()
+            try:
+                self.flush_once()
+                if time.time() - last_prune > 3600:
+                    self.queue.prune(self.keep_sent)
+                    last_prune = time.time()
+            except Exception as e:
+                print(f"Ingest Flusher Error: {e}")
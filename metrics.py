@@ -0,0 +1,123 @@
+import time
+import threading
+from contextlib import contextmanager
+from flask import g, has_request_context
+
+# --- METRIK (format teks Prometheus) + SERVER-TIMING PER REQUEST ---
+# Angka disimpan per proses; setiap worker gunicorn punya /metrics sendiri.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_str(labels):
+    if not labels: return ''
+    def esc(v): return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    inner = ','.join(f'{k}="{esc(v)}"' for k, v in sorted(labels.items()))
+    return '{' + inner + '}'
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound: self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._gauge_fns = []
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None: hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def register_gauges(self, fn):
+        # fn() -> [(nama, {label}, nilai), ...], dibaca saat /metrics diakses
+        self._gauge_fns.append(fn)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda kv: kv[0])
+            snapshots = [(k, list(h.buckets), list(h.counts), h.total, h.sum) for k, h in histograms]
+
+        seen = set()
+        def header(name, kind):
+            if name in seen: return
+            seen.add(name)
+            if name in self._help: lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f"{name}{_label_str(dict(labels))} {value}")
+        for (name, labels), buckets, counts, total, total_sum in snapshots:
+            header(name, 'histogram')
+            labels = dict(labels)
+            for bound, count in zip(buckets, counts):
+                lines.append(f"{name}_bucket{_label_str(dict(labels, le=bound))} {count}")
+            lines.append(f"{name}_bucket{_label_str(dict(labels, le='+Inf'))} {total}")
+            lines.append(f"{name}_sum{_label_str(labels)} {total_sum}")
+            lines.append(f"{name}_count{_label_str(labels)} {total}")
+        for fn in self._gauge_fns:
+            for name, labels, value in fn():
+                header(name, 'gauge')
+                lines.append(f"{name}{_label_str(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('stage_duration_seconds', 'Durasi per tahap request dashboard')
+metrics.describe('http_request_duration_seconds', 'Durasi request per endpoint')
+metrics.describe('google_api_calls_total', 'Jumlah panggilan Google API per jenis')
+metrics.describe('sheet_cache_lookups_total', 'Lookup cache worksheet per hasil')
+
+
+# --- TIMING PER TAHAP ---
+
+def record_stage(stage, seconds):
+    metrics.observe('stage_duration_seconds', seconds, stage=stage)
+    if has_request_context():
+        timings = g.setdefault('stage_timings', [])
+        timings.append((stage, seconds))
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing_header(timings, total=None):
+    # Tahap yang sama (mis. parse per bulan) dijumlahkan
+    merged = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0) + seconds
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in merged.items()]
+    if total is not None: parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
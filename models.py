@@ -1,5 +1,7 @@
 import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text, event
+from sqlalchemy.exc import OperationalError
 from flask_login import UserMixin
 from cryptography.fernet import Fernet
 
@@ -22,18 +24,19 @@ class User(db.Model, UserMixin):
     
     # [BARU] Kolom untuk Kode Pemulihan
     recovery_code = db.Column(db.String(20), nullable=True)
+    last_login_at = db.Column(db.DateTime, nullable=True)  # untuk bersih-bersih akun tidak aktif
     
     folders = db.relationship('MonitorFolder', backref='owner', lazy=True)
 
 # ... (Model GlobalSettings, MonitorFolder, CategoryMap biarkan tetap sama) ...
 class GlobalSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) 
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     google_creds_encrypted = db.Column(db.Text, nullable=False)
 
 class MonitorFolder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     spreadsheet_url = db.Column(db.String(500), nullable=False)
     sheet_list_str = db.Column(db.Text, default="Januari,Februari,Maret")
@@ -48,13 +51,95 @@ class MonitorFolder(db.Model):
     cell_addr_balance = db.Column(db.String(10), default="K3")
     clean_income_cells = db.Column(db.Text, default="") 
     clean_expense_cells = db.Column(db.Text, default="") 
+    refresh_interval = db.Column(db.Integer, default=300)  # detik, untuk sinkron background
+    config_version = db.Column(db.Integer, default=0)  # naik setiap konfigurasi sel/kolom/kategori berubah
+    ingest_token_hash = db.Column(db.String(64), nullable=True)  # sha256 token API input transaksi
     categories = db.relationship('CategoryMap', backref='folder', lazy=True, cascade="all, delete-orphan")
+    reports = db.relationship('ReportSchedule', backref='folder', lazy=True, cascade="all, delete-orphan")
     def get_sheet_list(self): return [x.strip() for x in self.sheet_list_str.split(',') if x.strip()]
 
 class CategoryMap(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    folder_id = db.Column(db.Integer, db.ForeignKey('monitor_folder.id'), nullable=False)
+    folder_id = db.Column(db.Integer, db.ForeignKey('monitor_folder.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     cell_addr = db.Column(db.String(10), nullable=False)
     type = db.Column(db.String(20), default='expense')
-    is_clean = db.Column(db.Boolean, default=False)
\ No newline at end of file
+    is_clean = db.Column(db.Boolean, default=False)
+
+class ReportSchedule(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    folder_id = db.Column(db.Integer, db.ForeignKey('monitor_folder.id'), nullable=False, index=True)
+    cron = db.Column(db.String(100), nullable=False, default="0 7 * * *")  # menit jam tanggal bulan hari
+    view = db.Column(db.String(10), default='month')  # 'month' = sheet bulan berjalan, 'year' = setahun penuh
+    sender = db.Column(db.String(20), default='telegram')
+    target = db.Column(db.String(200), default="")  # chat_id Telegram / subfolder untuk sender file
+    enabled = db.Column(db.Boolean, default=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)  # menit jadwal terakhir yang sudah diklaim worker
+    last_error = db.Column(db.Text, nullable=True)
+
+# Kolom baru untuk database lama (db.create_all() tidak menambah kolom ke tabel yang sudah ada)
+NEW_COLUMNS = [
+    ('monitor_folder', 'refresh_interval', 'INTEGER DEFAULT 300'),
+    ('monitor_folder', 'config_version', 'INTEGER DEFAULT 0'),
+    ('user', 'last_login_at', 'DATETIME'),
+    ('monitor_folder', 'ingest_token_hash', 'VARCHAR(64)'),
+]
+
+# Index baru untuk database lama (nama sama dengan yang dibuat db.create_all() dari index=True)
+NEW_INDEXES = [
+    ('ix_monitor_folder_user_id', 'monitor_folder', 'user_id'),
+    ('ix_global_settings_user_id', 'global_settings', 'user_id'),
+    ('ix_category_map_folder_id', 'category_map', 'folder_id'),
+]
+
+def ensure_schema():
+    db.create_all()
+    insp = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table, column, ddl in NEW_COLUMNS:
+            if column not in [c['name'] for c in insp.get_columns(table)]:
+                try:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                except OperationalError:
+                    pass  # sudah ditambahkan oleh worker lain
+        for name, table, column in NEW_INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
+
+# --- SQLITE MODE PRODUKSI (beberapa worker gunicorn pada satu file DB) ---
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+def configure_database(app):
+    # Pengganti db.init_app(app): WAL + busy_timeout + pool koneksi per worker untuk SQLite file
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    production = (uri.startswith('sqlite:///') and ':memory:' not in uri
+                  and app.config.get('SQLITE_MODE', 'production') == 'production')
+    if production:
+        busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT', 5000))
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('pool_size', int(app.config.get('SQLITE_POOL_SIZE', 5)))
+        options.setdefault('max_overflow', 10)
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('timeout', busy_timeout / 1000)
+        connect_args.setdefault('check_same_thread', False)
+    db.init_app(app)
+    if not production: return
+
+    synchronous = str(app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL')).upper()
+    if synchronous not in SYNCHRONOUS_LEVELS: synchronous = 'NORMAL'
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        # WAL: pembaca tidak menunggu penulis; NORMAL aman untuk WAL (tidak korup, hanya bisa
+        # kehilangan commit terakhir saat listrik mati)
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    # Koneksi yang dibuka sebelum fork (gunicorn --preload) tidak boleh dipakai bersama worker
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
@@ -0,0 +1,118 @@
+import time
+import threading
+import multiprocessing
+import bcrypt
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from metrics import metrics
+
+# --- HASH PASSWORD (bcrypt) DI PROCESS POOL ---
+# bcrypt sengaja berat di CPU. Hash dijalankan di process pool kecil dengan antrian terbatas,
+# jadi lonjakan login tidak menghabiskan CPU worker dan request dashboard tidak ikut antri.
+# Percobaan bersamaan per IP / username juga dibatasi. Semua batas berlaku per worker gunicorn.
+# Hash lama dengan cost berbeda otomatis di-hash ulang saat login berhasil.
+
+metrics.describe('password_hash_seconds', 'Durasi hash/cek password bcrypt (termasuk antri)')
+metrics.describe('password_hash_rejected_total', 'Hash password yang ditolak karena batas konkurensi')
+
+
+class HashBusyError(Exception):
+    def __init__(self, message="Terlalu banyak percobaan login bersamaan, coba lagi sebentar."):
+        super().__init__(message)
+
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def check_password(hashed, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:  # hash rusak / bukan bcrypt
+        return False
+
+
+def hash_rounds(hashed):
+    # Format bcrypt: $2b$12$<salt+hash>
+    try: return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError): return None
+
+
+class PasswordHasher:
+    def __init__(self, rounds=12, processes=2, max_pending=8, max_per_key=2, queue_wait=2, timeout=30):
+        self.rounds = rounds
+        self.processes = processes
+        self.max_per_key = max_per_key
+        self.queue_wait = queue_wait
+        self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(max(1, max_pending))
+        self._active = {}
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _process_pool(self):
+        # spawn: aman dipakai dari proses yang sudah punya banyak thread (sama seperti analitik)
+        if self._pool is None and self.processes > 0:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    @contextmanager
+    def _limit(self, keys):
+        # keys: mis. [('ip', '1.2.3.4'), ('user', 'budi')]; batas per key ditolak langsung,
+        # antrian penuh ditunggu paling lama queue_wait detik
+        keys = [k for k in keys if k[1]]
+        with self._lock:
+            if any(self._active.get(k, 0) >= self.max_per_key for k in keys):
+                metrics.inc('password_hash_rejected_total', reason='per_key')
+                raise HashBusyError()
+            for k in keys: self._active[k] = self._active.get(k, 0) + 1
+            self._inflight += 1
+        try:
+            if not self._pending.acquire(timeout=self.queue_wait):
+                metrics.inc('password_hash_rejected_total', reason='queue_full')
+                raise HashBusyError()
+            try:
+                yield
+            finally:
+                self._pending.release()
+        finally:
+            with self._lock:
+                self._inflight -= 1
+                for k in keys:
+                    self._active[k] -= 1
+                    if not self._active[k]: del self._active[k]
+
+    def _run(self, op, fn, *args, keys=()):
+        with self._limit(keys):
+            start = time.perf_counter()
+            try:
+                pool = self._process_pool()
+                if pool is None: return fn(*args)
+                try:
+                    return pool.submit(fn, *args).result(timeout=self.timeout)
+                except FutureTimeout:
+                    # Pool macet/terlalu lambat: diperlakukan sama seperti antrian penuh (429, bukan 500)
+                    metrics.inc('password_hash_rejected_total', reason='timeout')
+                    raise HashBusyError()
+                except BrokenProcessPool:
+                    self._pool = None
+                    return fn(*args)
+            finally:
+                metrics.observe('password_hash_seconds', time.perf_counter() - start, op=op)
+
+    def hash(self, password, keys=()):
+        return self._run('hash', hash_password, password, self.rounds, keys=keys)
+
+    def check(self, hashed, password, keys=()):
+        if not hashed or password is None: return False
+        return self._run('check', check_password, hashed, password, keys=keys)
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def inflight(self):
+        with self._lock:
+            return self._inflight
@@ -0,0 +1,76 @@
+import time
+import threading
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from metrics import metrics
+
+# --- HITUNG QUERY SQL (per request & guard untuk test/benchmark) ---
+# Listener dipasang di semua Engine SQLAlchemy; query dihitung per thread, jadi
+# request Flask (satu thread per request) dan test client (satu thread) terukur terpisah.
+# Cache SQLite lain (sheet_cache, snapshot) memakai sqlite3 langsung dan tidak ikut dihitung.
+
+metrics.describe('db_queries_per_request', 'Jumlah query SQL per request')
+
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class TooManyQueriesError(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+
+_local = threading.local()
+
+
+def _counters():
+    if not hasattr(_local, 'counters'): _local.counters = []
+    return _local.counters
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _counters(): conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    counters = _counters()
+    if not counters: return
+    starts = conn.info.get('query_start')
+    seconds = time.perf_counter() - starts.pop() if starts else 0.0
+    for counter in counters:
+        counter.count += 1
+        counter.seconds += seconds
+        counter.statements.append(statement)
+
+
+def start():
+    counter = QueryCounter()
+    _counters().append(counter)
+    return counter
+
+
+def stop(counter):
+    counters = _counters()
+    if counter in counters: counters.remove(counter)
+    return counter
+
+
+@contextmanager
+def query_guard(max_queries):
+    # Contoh: with query_guard(3): client.get('/folder/1/dashboard/data')
+    counter = start()
+    try:
+        yield counter
+    finally:
+        stop(counter)
+    if counter.count > max_queries:
+        listing = '\n'.join(f"  {i + 1}. {s}" for i, s in enumerate(counter.statements))
+        raise TooManyQueriesError(f"{counter.count} query (batas {max_queries}):\n{listing}")
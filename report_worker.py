@@ -0,0 +1,89 @@
+import sys
+import argparse
+from datetime import datetime
+from sqlalchemy import select, update, or_
+from app import app, build_report_html
+from models import db, ReportSchedule, MonitorFolder
+from reports import BrowserPool, ReportService, ReportScheduler, ReportJob, CronSpec, ReportError, make_senders
+
+# Contoh:
+#   python report_worker.py                                   # jalankan jadwal (cek setiap awal menit)
+#   python report_worker.py --now 3 --sender file             # satu laporan sekarang -> REPORT_OUTPUT_DIR
+#   python report_worker.py --now 3 --view year --sender telegram --target 123456789
+# Boleh dijalankan di beberapa server: setiap jadwal diklaim lewat database sebelum dikirim.
+
+_specs = {}
+
+def cron_spec(expr):
+    if expr not in _specs: _specs[expr] = CronSpec(expr)
+    return _specs[expr]
+
+def due_jobs(now):
+    jobs = []
+    with app.app_context():
+        rows = db.session.execute(select(ReportSchedule, MonitorFolder.name).join(MonitorFolder)
+                                  .where(ReportSchedule.enabled)).all()
+        for schedule, folder_name in rows:
+            try:
+                if not cron_spec(schedule.cron).matches(now): continue
+            except ReportError:
+                continue
+            # Klaim menit ini: hanya satu worker yang berhasil mengubah last_run_at
+            claimed = db.session.execute(
+                update(ReportSchedule)
+                .where(ReportSchedule.id == schedule.id,
+                       or_(ReportSchedule.last_run_at.is_(None), ReportSchedule.last_run_at < now))
+                .values(last_run_at=now)).rowcount
+            db.session.commit()
+            if claimed:
+                jobs.append(ReportJob(schedule.folder_id, schedule.view, schedule.sender, schedule.target,
+                                      caption=f"📊 {folder_name} — {now:%d %b %Y %H:%M}", schedule_id=schedule.id))
+    return jobs
+
+def save_status(job, error):
+    if job.schedule_id is None: return
+    with app.app_context():
+        db.session.execute(update(ReportSchedule).where(ReportSchedule.id == job.schedule_id)
+                           .values(last_error=str(error)[:500] if error else None))
+        db.session.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render & kirim laporan dashboard (PNG) sesuai jadwal.")
+    parser.add_argument('--now', type=int, metavar='FOLDER_ID', help='kirim satu laporan sekarang lalu keluar')
+    parser.add_argument('--view', choices=['month', 'year'], default='month')
+    parser.add_argument('--sender', choices=['telegram', 'file', 'stub'], default='file')
+    parser.add_argument('--target', default='', help='chat_id Telegram / subfolder output')
+    parser.add_argument('--contexts', type=int, default=app.config['REPORT_CONTEXTS'], help='browser context paralel')
+    parser.add_argument('--workers', type=int, default=None, help='thread data+render (default 2x contexts)')
+    args = parser.parse_args(argv)
+
+    pool = BrowserPool(size=args.contexts, width=app.config['REPORT_WIDTH'],
+                       recycle_after=app.config['REPORT_RECYCLE_AFTER'], timeout=app.config['REPORT_TIMEOUT'],
+                       static_folder=app.static_folder)
+    senders = make_senders(app.config['TELEGRAM_BOT_TOKEN'], app.config['REPORT_OUTPUT_DIR'])
+    # Thread lebih banyak dari context: data dashboard berikutnya disiapkan selagi browser menggambar
+    service = ReportService(build_report_html, pool, senders, workers=args.workers or args.contexts * 2,
+                            max_queue=app.config['REPORT_QUEUE_SIZE'], on_done=save_status)
+    try:
+        if args.now:
+            service.submit(ReportJob(args.now, args.view, args.sender, args.target,
+                                     caption=f"📊 Laporan {datetime.now():%d %b %Y %H:%M}"))
+            service.join()
+            stats = service.stats()
+            if not stats['sent']: return 1
+            if args.sender == 'file': print(f"✅ Laporan disimpan di {app.config['REPORT_OUTPUT_DIR']}")
+            else: print("✅ Laporan terkirim.")
+            return 0
+
+        print(f"🕖 Report worker berjalan ({args.contexts} browser context, antrian {app.config['REPORT_QUEUE_SIZE']}).")
+        ReportScheduler(service, due_jobs).run_forever()
+    except ReportError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
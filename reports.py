@@ -0,0 +1,417 @@
+import os
+import time
+import queue
+import asyncio
+import mimetypes
+import threading
+from collections import deque
+from datetime import datetime
+import requests
+from metrics import metrics
+
+# --- LAPORAN DASHBOARD TERJADWAL (PNG via headless Chromium) ---
+# Satu proses Chromium dipakai terus; beberapa browser context (slot) yang sudah hangat
+# dipinjamkan bergantian, jadi biaya start browser (detik & ratusan MB) hanya dibayar sekali.
+# HTML dashboard dirender Flask di proses yang sama lalu disajikan ke browser lewat route
+# interception (tanpa server HTTP & tanpa login); file /static dibaca dari disk dan aset
+# CDN (bootstrap, chart.js) disimpan di memori untuk render berikutnya.
+
+REPORT_ORIGIN = 'http://report.local'
+REPORT_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+metrics.describe('reports_total', 'Laporan dashboard per hasil (sent/failed/rejected)')
+metrics.describe('report_seconds', 'Durasi satu laporan (data + render + kirim)')
+
+
+class ReportError(Exception):
+    pass
+
+class ReportBusyError(ReportError):
+    def __init__(self, message="Antrian laporan penuh, coba lagi nanti."):
+        super().__init__(message)
+
+
+# --- JADWAL CRON (menit jam tanggal bulan hari-minggu) ---
+
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _cron_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        base, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if base == '*': start, end = low, high
+        elif '-' in base: start, end = map(int, base.split('-', 1))
+        else:
+            start = end = int(base)
+            if step > 1: end = high
+        if step < 1 or start < low or end > high or start > end: raise ValueError
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSpec:
+    def __init__(self, expr):
+        parts = (expr or '').split()
+        if len(parts) != 5: raise ReportError("Jadwal harus 5 bagian cron: menit jam tanggal bulan hari (mis. '0 7 * * 1').")
+        try:
+            # Hari minggu: 0 dan 7 sama-sama Minggu
+            parts[4] = ','.join('0' if p == '7' else p for p in parts[4].split(','))
+            self.minute, self.hour, self.day, self.month, self.weekday = (
+                _cron_field(p, low, high) for p, (low, high) in zip(parts, CRON_FIELDS))
+        except ValueError:
+            raise ReportError(f"Jadwal cron tidak valid: '{expr}'.")
+        self.expr = ' '.join(expr.split())
+        self._any_day, self._any_weekday = parts[2] == '*', parts[4] == '*'
+
+    def matches(self, when):
+        if when.minute not in self.minute or when.hour not in self.hour or when.month not in self.month:
+            return False
+        day_ok = when.day in self.day
+        weekday_ok = (when.weekday() + 1) % 7 in self.weekday
+        # Seperti cron: jika tanggal & hari sama-sama dibatasi, cukup salah satu yang cocok
+        if self._any_day or self._any_weekday: return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+
+# --- PENGIRIM (pluggable) ---
+
+class ReportJob:
+    def __init__(self, folder_id, view='month', sender='file', target='', caption='', schedule_id=None):
+        self.folder_id = folder_id
+        self.view = view                # 'month' = sheet bulan berjalan, 'year' = setahun penuh
+        self.sender = sender
+        self.target = target            # chat_id Telegram / subfolder untuk FileSender
+        self.caption = caption
+        self.schedule_id = schedule_id
+        self.created_at = time.time()
+
+
+class FileSender:
+    # Simpan PNG ke disk (pengujian / arsip lokal)
+    def __init__(self, directory):
+        self.directory = directory
+
+    def send(self, job, png):
+        folder = os.path.join(self.directory, os.path.basename(job.target or ''))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"folder{job.folder_id}-{job.view}-{datetime.now():%Y%m%d-%H%M%S-%f}.png")
+        with open(path, 'wb') as f: f.write(png)
+        return path
+
+
+class StubSender:
+    # Tidak mengirim ke mana pun; hanya dicatat (benchmark / uji tanpa jaringan)
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, job, png):
+        with self._lock: self.sent.append((job.folder_id, len(png)))
+        return len(png)
+
+
+# Error sendPhoto yang khusus gambarnya (dimensi / ukuran): cukup dikirim ulang sebagai file.
+# Error 400 lain (chat_id salah, bot diblokir, ...) langsung dilaporkan apa adanya.
+TELEGRAM_PHOTO_ERRORS = ('PHOTO_INVALID_DIMENSIONS', 'PHOTO_SAVE_FILE_INVALID', 'IMAGE_PROCESS_FAILED',
+                         'file is too big')
+TELEGRAM_PHOTO_MAX_BYTES = 10 * 1024 * 1024
+
+
+def telegram_photo_rejected(resp):
+    if resp.status_code == 413: return True
+    if resp.status_code != 400: return False
+    try: description = resp.json().get('description', '')
+    except ValueError: description = resp.text
+    return any(marker.lower() in description.lower() for marker in TELEGRAM_PHOTO_ERRORS)
+
+
+class TelegramSender:
+    def __init__(self, token, timeout=30, api_url='https://api.telegram.org'):
+        self.token = token
+        self.timeout = timeout
+        self.api_url = api_url
+        self._local = threading.local()   # requests.Session per thread: koneksi keep-alive dipakai ulang
+
+    def _session(self):
+        if not hasattr(self._local, 'session'): self._local.session = requests.Session()
+        return self._local.session
+
+    def _post(self, method, job, field, png):
+        return self._session().post(f"{self.api_url}/bot{self.token}/{method}",
+                                    data={'chat_id': job.target, 'caption': job.caption[:1024]},
+                                    files={field: ('dashboard.png', png, 'image/png')}, timeout=self.timeout)
+
+    def send(self, job, png):
+        if not self.token: raise ReportError("TELEGRAM_BOT_TOKEN belum diatur.")
+        if not job.target: raise ReportError("Chat ID Telegram belum diisi.")
+        # Foto di atas 10 MB pasti ditolak Telegram -> langsung sebagai file
+        method, field = ('sendPhoto', 'photo') if len(png) <= TELEGRAM_PHOTO_MAX_BYTES else ('sendDocument', 'document')
+        resp = self._post(method, job, field, png)
+        if resp.status_code == 429:
+            # Batas kirim Telegram: tunggu sesuai retry_after lalu coba sekali lagi
+            wait = resp.json().get('parameters', {}).get('retry_after', 1)
+            time.sleep(min(wait, 60))
+            resp = self._post(method, job, field, png)
+        if method == 'sendPhoto' and telegram_photo_rejected(resp):
+            # Dashboard terlalu tinggi/besar untuk foto (batas Telegram) -> kirim sebagai file
+            resp = self._post('sendDocument', job, 'document', png)
+        if not resp.ok:
+            raise ReportError(f"Telegram menolak laporan: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp.json().get('result', {}).get('message_id')
+
+
+def make_senders(telegram_token=None, output_dir=None):
+    senders = {'stub': StubSender()}
+    if output_dir: senders['file'] = FileSender(output_dir)
+    senders['telegram'] = TelegramSender(telegram_token)
+    return senders
+
+
+# --- POOL BROWSER (Playwright async, satu event loop di thread sendiri) ---
+
+class _Slot:
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.html = ''
+        self.uses = 0
+
+
+class BrowserPool:
+    def __init__(self, size=2, width=1280, height=900, scale=1, recycle_after=200, timeout=30,
+                 static_folder=None, origin=REPORT_ORIGIN):
+        self.size = size
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.recycle_after = recycle_after  # context dibuat ulang setelah N render (cegah memori bocor)
+        self.timeout = timeout
+        self.static_folder = static_folder
+        self.origin = origin
+        self._assets = {}                   # url CDN -> (status, headers, body)
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Browser diluncurkan sekali; pemanggil lain menunggu di lock sampai slot siap
+        with self._lock:
+            if self._thread is not None: return
+            self._loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=self._loop.run_forever, name='report-browser', daemon=True)
+            thread.start()
+            try:
+                self._submit(self._launch(), self.timeout * 2)
+            except Exception:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                thread.join(self.timeout)
+                raise
+            self._thread = thread
+
+    def close(self):
+        with self._lock:
+            if self._thread is None: return
+        try: self._submit(self._shutdown(), self.timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(self.timeout)
+            self._thread = None
+
+    def render(self, html):
+        # Dipanggil dari thread mana pun; menunggu slot kosong lalu -> PNG bytes
+        self.start()
+        return self._submit(self._render(html), self.timeout * 2)
+
+    def _submit(self, coro, timeout):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(args=['--disable-dev-shm-usage'])
+        self._idle = asyncio.Queue()
+        for _ in range(self.size): self._idle.put_nowait(await self._new_slot())
+
+    async def _shutdown(self):
+        await self._browser.close()
+        await self._playwright.stop()
+
+    async def _new_slot(self):
+        context = await self._browser.new_context(viewport={'width': self.width, 'height': self.height},
+                                                  device_scale_factor=self.scale)
+        slot = _Slot(context, None)
+        await context.route('**/*', lambda route: self._route(slot, route))
+        slot.page = await context.new_page()
+        return slot
+
+    async def _route(self, slot, route):
+        url = route.request.url.split('#')[0]
+        if url == f"{self.origin}/report":
+            return await route.fulfill(body=slot.html, content_type='text/html; charset=utf-8')
+        if url.startswith(f"{self.origin}/static/"):
+            path = url[len(self.origin) + len('/static/'):].split('?')[0]
+            root = os.path.abspath(self.static_folder or '')
+            full = os.path.abspath(os.path.join(root, path))
+            # commonpath, bukan startswith: '/app/static_private' tidak boleh lolos sebagai '/app/static'
+            if self.static_folder and os.path.commonpath([root, full]) == root and os.path.isfile(full):
+                return await route.fulfill(path=full, content_type=mimetypes.guess_type(full)[0])
+            return await route.fulfill(status=404, body='')
+        if url.startswith(self.origin):
+            return await route.fulfill(status=404, body='')
+
+        # Routing mematikan HTTP cache browser -> aset CDN disimpan sendiri, dipakai semua slot
+        cached = self._assets.get(url)
+        if cached is None and route.request.method == 'GET':
+            response = await route.fetch()
+            if response.status != 200: return await route.fulfill(response=response)
+            # body() sudah didekompresi: header encoding/panjang asli tidak berlaku lagi
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in ('content-encoding', 'content-length')}
+            cached = self._assets[url] = (response.status, headers, await response.body())
+        if cached is None: return await route.continue_()
+        status, headers, body = cached
+        await route.fulfill(status=status, headers=headers, body=body)
+
+    async def _render(self, html):
+        slot = await self._idle.get()
+        try:
+            if slot.uses >= self.recycle_after:
+                await slot.context.close()
+                slot = await self._new_slot()
+            slot.html, slot.uses = html, slot.uses + 1
+            ms = self.timeout * 1000
+            await slot.page.goto(f"{self.origin}/report", wait_until='load', timeout=ms)
+            # dashboard.js menandai body setelah KPI & grafik selesai digambar (mode laporan tanpa animasi)
+            await slot.page.wait_for_selector('body[data-report-ready]', state='attached', timeout=ms)
+            return await slot.page.screenshot(full_page=True, type='png')
+        except Exception:
+            # Halaman bisa macet/crash: slot diganti context baru agar render berikutnya bersih
+            try: await slot.context.close()
+            except Exception: pass
+            slot = await self._new_slot()
+            raise
+        finally:
+            self._idle.put_nowait(slot)
+
+
+# --- ANTRIAN LAPORAN (bounded) + WORKER ---
+
+class ReportService:
+    def __init__(self, build_html, pool, senders, workers=2, max_queue=50, on_done=None, window=300):
+        self.build_html = build_html        # build_html(job) -> HTML dashboard mode laporan
+        self.pool = pool
+        self.senders = senders
+        self.workers = workers
+        self.on_done = on_done              # on_done(job, error/None), mis. simpan status jadwal
+        self.window = window
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._done = deque()
+        self._counts = {'sent': 0, 'failed': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started = None
+
+    def start(self):
+        with self._lock:
+            if self._threads: return
+            self._started = time.monotonic()
+            self._threads = [threading.Thread(target=self._worker, name=f'report-worker-{i}', daemon=True)
+                             for i in range(self.workers)]
+        for t in self._threads: t.start()
+
+    def submit(self, job):
+        # Antrian penuh -> ditolak (bukan menumpuk tanpa batas di memori)
+        if job.sender not in self.senders: raise ReportError(f"Pengirim laporan '{job.sender}' tidak dikenal.")
+        self.start()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._record('rejected')
+            raise ReportBusyError()
+
+    def join(self):
+        self._queue.join()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _record(self, result, seconds=None):
+        metrics.inc('reports_total', result=result)
+        if seconds is not None: metrics.observe('report_seconds', seconds, buckets=REPORT_BUCKETS)
+        with self._lock:
+            self._counts[result] += 1
+            if result == 'sent': self._done.append(time.monotonic())
+
+    def throughput(self):
+        # Laporan terkirim per menit dalam jendela terakhir
+        now = time.monotonic()
+        with self._lock:
+            if self._started is None: return 0.0
+            while self._done and now - self._done[0] > self.window: self._done.popleft()
+            count = len(self._done)
+            span = min(self.window, max(now - self._started, 1))
+        return count * 60.0 / span
+
+    def stats(self):
+        with self._lock: counts = dict(self._counts)
+        return dict(counts, pending=self.pending(), per_minute=round(self.throughput(), 1))
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            start, error = time.perf_counter(), None
+            try:
+                png = self.pool.render(self.build_html(job))
+                self.senders[job.sender].send(job, png)
+                self._record('sent', time.perf_counter() - start)
+            except Exception as e:
+                error = e
+                self._record('failed', time.perf_counter() - start)
+                print(f"Report Error folder {job.folder_id}: {e}")
+            finally:
+                if self.on_done:
+                    try: self.on_done(job, error)
+                    except Exception as e: print(f"Report Status Error: {e}")
+                self._queue.task_done()
+
+
+# --- SCHEDULER (cek jadwal setiap awal menit) ---
+
+class ReportScheduler:
+    def __init__(self, service, due_jobs, log_every=60):
+        self.service = service
+        self.due_jobs = due_jobs            # due_jobs(menit sekarang) -> [ReportJob] (sudah diklaim)
+        self.log_every = log_every
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self.run_forever, name='report-scheduler', daemon=True)
+            self._thread.start()
+
+    def run_once(self, now=None):
+        now = (now or datetime.now()).replace(second=0, microsecond=0)
+        submitted = 0
+        for job in self.due_jobs(now):
+            try:
+                self.service.submit(job)
+                submitted += 1
+            except ReportError as e:
+                print(f"Report Schedule Error folder {job.folder_id}: {e}")
+                if self.service.on_done: self.service.on_done(job, e)
+        return submitted
+
+    def run_forever(self):
+        last_log = time.monotonic()
+        while True:
+            time.sleep(60 - time.time() % 60)
+            try: self.run_once()
+            except Exception as e: print(f"Report Scheduler Error: {e}")
+            if time.monotonic() - last_log >= self.log_every:
+                stats = self.service.stats()
+                print(f"[report] {stats['sent']} terkirim, {stats['failed']} gagal, {stats['rejected']} ditolak, "
+                      f"antri {stats['pending']}, {stats['per_minute']} laporan/menit")
+                last_log = time.monotonic()
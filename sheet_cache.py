@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing, contextmanager
+from gspread.utils import extract_id_from_url
+
+# --- CACHE DATA WORKSHEET (SQLite, dipakai bersama oleh semua worker gunicorn) ---
+
+class CacheEntry:
+    def __init__(self, values, revision, fetched_at, ttl):
+        self.values = values
+        self.revision = revision
+        self.fetched_at = fetched_at
+        self.ttl = ttl
+
+    @property
+    def is_fresh(self):
+        return (time.time() - self.fetched_at) < self.ttl
+
+
+class SheetCache:
+    def __init__(self, path, ttl=300, max_entries=256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        folder = os.path.dirname(path)
+        if folder: os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sheet_cache (
+                    spreadsheet_url TEXT NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    revision TEXT,
+                    payload TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (spreadsheet_url, sheet_name)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sheet_cache_accessed ON sheet_cache (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        # Koneksi baru per operasi: aman dipakai lintas thread & proses
+        # sqlite3 sebagai context manager hanya commit/rollback; closing() yang menutup file handle
+        with closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+            yield conn
+
+    def get(self, spreadsheet_url, sheet_name):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload, revision, fetched_at FROM sheet_cache WHERE spreadsheet_url = ? AND sheet_name = ?",
+                (spreadsheet_url, sheet_name)
+            ).fetchone()
+            if not row: return None
+            conn.execute(
+                "UPDATE sheet_cache SET accessed_at = ? WHERE spreadsheet_url = ? AND sheet_name = ?",
+                (time.time(), spreadsheet_url, sheet_name)
+            )
+        return CacheEntry(json.loads(row[0]), row[1], row[2], self.ttl)
+
+    def put(self, spreadsheet_url, sheet_name, values, revision=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sheet_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (spreadsheet_url, sheet_name, revision, json.dumps(values), now, now)
+            )
+            # LRU: buang entry yang paling lama tidak diakses
+            conn.execute("""
+                DELETE FROM sheet_cache WHERE rowid NOT IN (
+                    SELECT rowid FROM sheet_cache ORDER BY accessed_at DESC LIMIT ?
+                )
+            """, (self.max_entries,))
+
+    def touch(self, spreadsheet_url, sheet_name):
+        # Revisi tidak berubah -> perpanjang umur entry tanpa download ulang
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE sheet_cache SET fetched_at = ?, accessed_at = ? WHERE spreadsheet_url = ? AND sheet_name = ?",
+                (now, now, spreadsheet_url, sheet_name)
+            )
+
+    def invalidate(self, spreadsheet_url, sheet_name=None):
+        with self._connect() as conn:
+            if sheet_name is None:
+                conn.execute("DELETE FROM sheet_cache WHERE spreadsheet_url = ?", (spreadsheet_url,))
+            else:
+                conn.execute(
+                    "DELETE FROM sheet_cache WHERE spreadsheet_url = ? AND sheet_name = ?",
+                    (spreadsheet_url, sheet_name)
+                )
+
+
+# --- HELPER: CEK REVISI SPREADSHEET (1 panggilan Drive API, tanpa download isi sheet) ---
+def get_sheet_revision(client, spreadsheet_url):
+    try:
+        file_id = extract_id_from_url(spreadsheet_url)
+        return client.get_file_drive_metadata(file_id).get('modifiedTime')
+    except Exception:
+        return None
+
+def get_sheet_version(client, spreadsheet_url):
+    # (modifiedTime, version): version Drive naik setiap file berubah, jadi bisa dicek apakah
+    # ada perubahan lain selain penulisan app sendiri. Gagal -> (None, None)
+    try:
+        meta = client.get_file_version(extract_id_from_url(spreadsheet_url))
+        return meta.get('modifiedTime'), int(meta['version'])
+    except Exception:
+        return None, None
@@ -0,0 +1,54 @@
+import re
+import numpy as np
+import pandas as pd
+
+# --- PARSING ANGKA FORMAT INDONESIA ("Rp 1.234.567,50") ---
+# Kolom nominal berisi banyak nilai berulang (sel kosong, nominal bulat), jadi kolom
+# di-factorize dulu dan hanya nilai uniknya yang di-parse, lalu disebar lagi lewat kode.
+
+def clean_indo_number(val):
+    try:
+        s = str(val).replace('Rp', '').strip().replace('.', '').replace(',', '.')
+        return float(s) if s else 0
+    except: return 0
+
+def _parse_unique(values):
+    s = np.char.replace(values.astype(str), 'Rp', '')
+    s = np.char.strip(s)
+    s = np.char.replace(np.char.replace(s, '.', ''), ',', '.')
+
+    out = np.zeros(len(s), dtype='float64')
+    filled = s != ''
+    # Parser cepat pandas bisa meleset 1 ulp di atas 15 digit signifikan: string
+    # sepanjang itu (jarang, mis. hasil rumus) langsung lewat float()
+    fast = filled & (np.char.str_len(s) <= 15)
+    out[fast] = pd.to_numeric(pd.Series(s[fast], dtype=object), errors='coerce').to_numpy(dtype='float64')
+
+    # Sisa yang gagal di-parse dicek ulang dengan float() agar hasilnya identik
+    # dengan clean_indo_number (mis. "1_000", "nan", "inf")
+    for i in np.flatnonzero(filled & (~fast | np.isnan(out))):
+        out[i] = clean_indo_number(values[i])
+    return out
+
+def parse_indo_numbers(series):
+    if series.hasnans:
+        # factorize menyatukan None & NaN, padahal str() keduanya berbeda ("None" vs "nan")
+        series = pd.Series([str(v) for v in series.to_numpy()], dtype=object)
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    if len(uniques) == 0: return np.zeros(0, dtype='float64')
+    return _parse_unique(np.asarray(uniques, dtype=object))[codes]
+
+
+# --- MASK TRANSAKSI HUTANG (satu regex untuk semua keyword) ---
+
+def compile_keywords(keywords_str):
+    keywords = [k.strip().lower() for k in (keywords_str or '').split(',') if k.strip()]
+    if not keywords: return None
+    return re.compile('|'.join(re.escape(k) for k in keywords))
+
+def debt_mask(series, pattern):
+    if pattern is None:
+        return pd.Series(False, index=series.index)
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    hits = np.array([pattern.search(str(u).lower()) is not None for u in uniques], dtype=bool)
+    return pd.Series(hits[codes] if len(uniques) else np.zeros(0, dtype=bool), index=series.index)
@@ -0,0 +1,299 @@
+import hashlib
+import threading
+from urllib.parse import quote
+from gspread.utils import a1_to_rowcol, rowcol_to_a1, absolute_range_name, fill_gaps
+from sheet_parse import compile_keywords
+
+# Jumlah baris teratas yang dipindai untuk mencari baris header
+HEADER_PROBE_ROWS = 20
+# values:batchGet adalah GET: semua range masuk query string, jadi dipecah per beberapa KB URL
+BATCH_GET_MAX_CHARS = 6000
+
+# --- RENCANA EKSTRAKSI: sel & kolom yang benar-benar dipakai dashboard ---
+
+def normalize_addr(addr):
+    # "k1 " -> "K1"; alamat tidak valid -> None
+    try:
+        row, col = a1_to_rowcol(addr.strip())
+        return rowcol_to_a1(row, col)
+    except Exception:
+        return None
+
+def col_letter(col):
+    return ''.join(ch for ch in rowcol_to_a1(1, col) if ch.isalpha())
+
+
+class ExtractionPlan:
+    def __init__(self, cells, columns, summary=None, clean_cells=None, categories=(), roles=None, keywords=None):
+        self.cells = cells
+        self.coords = [a1_to_rowcol(addr) for addr in cells]
+        self.columns = columns
+        self.signature = hashlib.sha1('|'.join(cells + ['#'] + columns).encode()).hexdigest()
+        # Hasil parse konfigurasi folder, dipakai saat menghitung dashboard
+        self.summary = summary or {}          # {'income': 'K1', ...}, None jika alamat tidak valid
+        self.clean_cells = clean_cells or {}  # {'income': ['K5', 'K6'], 'expense': [...]}
+        self.categories = categories          # [(nama, alamat, type, is_clean), ...]
+        self.roles = roles or {}              # {'date': 'Timestamp', 'income': ..., ...}
+        self.keywords = keywords              # regex keyword hutang (None = tidak ada)
+        self.headers = {}                     # posisi header terakhir per worksheet
+
+    @property
+    def date_column(self):
+        # Penanda baris header; tanpa kolom tanggal header tidak dicari (selalu ambil sheet penuh)
+        return self.roles.get('date') or None
+
+
+def _split_addrs(cell_list_str):
+    norms = [normalize_addr(a) for a in (cell_list_str or '').split(',') if a.strip()]
+    return [a for a in norms if a]
+
+
+def compile_plan(folder):
+    summary = {key: normalize_addr(addr) if addr else None for key, addr in (
+        ('income', folder.cell_addr_income), ('expense', folder.cell_addr_expense),
+        ('balance', folder.cell_addr_balance))}
+    clean_cells = {'income': _split_addrs(folder.clean_income_cells),
+                   'expense': _split_addrs(folder.clean_expense_cells)}
+    categories = [(cat.name, normalize_addr(cat.cell_addr) if cat.cell_addr else None, cat.type, cat.is_clean)
+                  for cat in folder.categories]
+
+    cells = []
+    for addr in list(summary.values()) + clean_cells['income'] + clean_cells['expense'] + [c[1] for c in categories]:
+        if addr and addr not in cells: cells.append(addr)
+
+    roles = {'date': folder.col_date, 'income': folder.col_income, 'expense': folder.col_expense,
+             'source_income': folder.col_source_income, 'source_expense': folder.col_source_expense}
+    columns = []
+    for name in roles.values():
+        if name and name not in columns: columns.append(name)
+    return ExtractionPlan(cells, columns, summary, clean_cells, categories, roles,
+                          compile_keywords(folder.debt_keywords))
+
+
+class PlanCache:
+    # Plan per MonitorFolder. Key ikut config_version, jadi perubahan konfigurasi
+    # dari worker gunicorn lain juga terdeteksi tanpa perlu sinyal antar proses.
+    def __init__(self):
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def get(self, folder):
+        version = folder.config_version or 0
+        with self._lock:
+            entry = self._plans.get(folder.id)
+        if entry and entry[0] == version: return entry[1]
+        plan = compile_plan(folder)
+        with self._lock:
+            self._plans[folder.id] = (version, plan)
+        return plan
+
+    def invalidate(self, folder_id):
+        with self._lock:
+            self._plans.pop(folder_id, None)
+
+
+# --- HASIL EKSTRAKSI PER WORKSHEET ---
+
+class SheetExtract:
+    def __init__(self, cells, columns, header_row=None, col_index=None):
+        self.cells = cells              # {'K1': 'Rp 1.000', ...}
+        self.columns = columns          # {'Timestamp': [...], ...} panjang sama
+        self.header_row = header_row    # nomor baris header (1-based)
+        self.col_index = col_index or {}  # {'Timestamp': 1, ...} (1-based)
+        self.revision = None            # revisi spreadsheet asal data (diisi saat dibaca dari cache/snapshot)
+
+    @property
+    def is_empty(self):
+        return not self.cells and not any(self.columns.values())
+
+    @property
+    def header(self):
+        if self.header_row is None: return None
+        return {'row': self.header_row, 'cols': self.col_index}
+
+    def to_dict(self):
+        return {'cells': self.cells, 'columns': self.columns,
+                'header_row': self.header_row, 'col_index': self.col_index}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['cells'], data['columns'], data.get('header_row'), data.get('col_index'))
+
+
+def _pad_columns(columns):
+    length = max((len(v) for v in columns.values()), default=0)
+    return {k: v + [''] * (length - len(v)) for k, v in columns.items()}
+
+
+def extract_from_values(plan, raw_data):
+    # Jalur fallback: isi sheet lengkap (hasil get_all_values)
+    cells = {}
+    for addr, (row, col) in zip(plan.cells, plan.coords):
+        try: cells[addr] = raw_data[row-1][col-1]
+        except IndexError: pass
+
+    header_row, col_index, columns = None, {}, {}
+    date_col = plan.date_column
+    for i, row in enumerate(raw_data):
+        if date_col and date_col in row:
+            header_row = i + 1
+            break
+    if header_row is not None:
+        header = raw_data[header_row-1]
+        for name in plan.columns:
+            if name in header:
+                idx = header.index(name)
+                col_index[name] = idx + 1
+                columns[name] = [r[idx] if idx < len(r) else '' for r in raw_data[header_row:]]
+    return SheetExtract(cells, _pad_columns(columns), header_row, col_index)
+
+
+# --- FETCH TERARAH (values_batch_get) ---
+
+def _chunk_ranges(ranges, max_chars=BATCH_GET_MAX_CHARS):
+    chunk, size = [], 0
+    for r in ranges:
+        cost = len('&ranges=') + len(quote(r, safe=''))
+        if chunk and size + cost > max_chars:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(r)
+        size += cost
+    if chunk: yield chunk
+
+
+def _batch_get(spreadsheet, ranges_by_sheet, params=None):
+    # Satu round trip untuk semua sheet (dipecah jika URL terlalu panjang); range tidak valid
+    # menggagalkan seluruh batch, jadi pada error diulang per sheet agar sheet lain tetap terambil.
+    names = list(ranges_by_sheet)
+    ranges = [r for n in names for r in ranges_by_sheet[n]]
+    if not ranges: return {}
+    try:
+        values = []
+        for chunk in _chunk_ranges(ranges):
+            value_ranges = spreadsheet.values_batch_get(chunk, params=params).get('valueRanges', [])
+            values += [(value_ranges[i] if i < len(value_ranges) else {}).get('values', [])
+                       for i in range(len(chunk))]
+    except Exception as e:
+        if len(names) == 1: raise
+        print(f"Batch Fetch Error: {e}")
+        result = {}
+        for n in names:
+            try: result.update(_batch_get(spreadsheet, {n: ranges_by_sheet[n]}, params))
+            except Exception as e_sheet: print(f"Sheet '{n}' Error: {e_sheet}")
+        return result
+
+    values = iter(values)
+    return {n: [next(values) for _ in ranges_by_sheet[n]] for n in names}
+
+
+def _cells_from(plan, values):
+    cells = {}
+    for addr, v in zip(plan.cells, values):
+        if v and v[0]: cells[addr] = v[0][0]
+    return cells
+
+
+def _fetch_with_header(spreadsheet, plan, headers):
+    ranges = {}
+    for name, header in headers.items():
+        ranges[name] = [absolute_range_name(name, addr) for addr in plan.cells]
+        for col_name, col in header['cols'].items():
+            letter = col_letter(col)
+            ranges[name].append(absolute_range_name(name, f"{letter}{header['row']}:{letter}"))
+
+    fetched = _batch_get(spreadsheet, ranges, params={'majorDimension': 'COLUMNS'})
+    result = {}
+    for name, values in fetched.items():
+        header = headers[name]
+        cells = _cells_from(plan, values)
+        columns, valid = {}, True
+        for (col_name, col), v in zip(header['cols'].items(), values[len(plan.cells):]):
+            col_values = v[0] if v else []
+            # Header bergeser sejak terakhir diambil -> posisi lama tidak bisa dipakai
+            if not col_values or col_values[0] != col_name:
+                valid = False
+                break
+            columns[col_name] = col_values[1:]
+        if valid:
+            result[name] = SheetExtract(cells, _pad_columns(columns), header['row'], dict(header['cols']))
+    return result
+
+
+def fetch_written(spreadsheet, plan, sheet_names, written):
+    # Setelah baris ditulis lewat API (written: {nama worksheet: updatedRange hasil values_append}):
+    # sel ringkasan/kategori semua sheet + baris baru dibaca ulang dalam satu batch. FORMATTED_VALUE
+    # (default): tanggal & angka persis seperti tampil di sheet, sesuai locale spreadsheet.
+    ranges = {n: [absolute_range_name(n, addr) for addr in plan.cells] + ([written[n]] if n in written else [])
+              for n in sheet_names}
+    fetched = _batch_get(spreadsheet, ranges)
+    cells = {name: _cells_from(plan, values) for name, values in fetched.items()}
+    rows = {name: fetched[name][len(plan.cells)] for name in written if name in fetched}
+    return cells, rows
+
+
+def fetch_tails(spreadsheet, plan, headers, starts):
+    # Sinkronisasi inkremental: sel ringkasan + baris data mulai dari starts[name]
+    # (indeks 0-based setelah header). Header tiap kolom ikut diambil untuk verifikasi.
+    ranges = {}
+    for name, header in headers.items():
+        first = header['row'] + starts[name] + 1
+        ranges[name] = [absolute_range_name(name, addr) for addr in plan.cells]
+        for col in header['cols'].values():
+            letter = col_letter(col)
+            ranges[name].append(absolute_range_name(name, f"{letter}{header['row']}"))
+            ranges[name].append(absolute_range_name(name, f"{letter}{first}:{letter}"))
+
+    fetched = _batch_get(spreadsheet, ranges, params={'majorDimension': 'COLUMNS'})
+    result = {}
+    for name, values in fetched.items():
+        header = headers[name]
+        col_values = values[len(plan.cells):]
+        columns, valid = {}, True
+        for i, col_name in enumerate(header['cols']):
+            head, tail = col_values[2*i], col_values[2*i+1]
+            if not head or head[0][:1] != [col_name]:
+                valid = False
+                break
+            columns[col_name] = tail[0] if tail else []
+        if valid:
+            result[name] = SheetExtract(_cells_from(plan, values), _pad_columns(columns),
+                                        header['row'], dict(header['cols']))
+    return result
+
+
+def _probe_headers(spreadsheet, plan, sheet_names):
+    ranges = {n: [absolute_range_name(n, f"1:{HEADER_PROBE_ROWS}")] for n in sheet_names}
+    fetched = _batch_get(spreadsheet, ranges)
+    headers = {}
+    date_col = plan.date_column
+    for name, values in fetched.items():
+        rows = values[0] if values else []
+        for i, row in enumerate(rows):
+            if date_col in row:
+                headers[name] = {'row': i + 1,
+                                 'cols': {c: row.index(c) + 1 for c in plan.columns if c in row}}
+                break
+    return headers
+
+
+def _fetch_full(spreadsheet, plan, sheet_names):
+    fetched = _batch_get(spreadsheet, {n: [absolute_range_name(n)] for n in sheet_names})
+    return {name: extract_from_values(plan, fill_gaps(values[0] if values else []))
+            for name, values in fetched.items()}
+
+
+def fetch_extracts(spreadsheet, plan, sheet_names, headers=None):
+    # headers: posisi header terakhir yang diketahui per sheet ({'row', 'cols'})
+    headers = {n: h for n, h in (headers or {}).items() if n in sheet_names and h}
+    result = _fetch_with_header(spreadsheet, plan, headers) if headers else {}
+
+    pending = [n for n in sheet_names if n not in result]
+    if pending and plan.date_column:
+        probed = _probe_headers(spreadsheet, plan, pending)
+        if probed: result.update(_fetch_with_header(spreadsheet, plan, probed))
+
+    # Header tidak ketemu di baris teratas -> download sheet penuh sebagai fallback
+    pending = [n for n in sheet_names if n not in result]
+    if pending: result.update(_fetch_full(spreadsheet, plan, pending))
+    return result
@@ -0,0 +1,62 @@
+from sheet_parse import clean_indo_number
+from transactions import build_transactions
+
+# Tidak bergantung pada app/DB: cukup ExtractionPlan hasil compile_plan,
+# jadi bisa juga dipakai dari worker process.
+
+# --- HELPER: PARSE ISI WORKSHEET ---
+def empty_pie_data():
+    return {
+        'clean_inc': {'labels': [], 'data': []},
+        'clean_exp': {'labels': [], 'data': []},
+        'dirty_inc': {'labels': [], 'data': []},
+        'dirty_exp': {'labels': [], 'data': []}
+    }
+
+def format_summary(summary):
+    return {k: f"{v:,.0f}" for k, v in summary.items()}
+
+def parse_sheet_values(plan, extract):
+    # plan: hasil compile_plan (alamat sel sudah dinormalisasi), cukup index ke extract
+    def get_cell_value(addr):
+        try:
+            if not addr: return 0
+            return clean_indo_number(extract.cells.get(addr, ''))
+        except: return 0
+
+    # Summary
+    sum_kotor = {key: get_cell_value(plan.summary.get(key)) for key in ('income', 'expense', 'balance')}
+
+    clean_inc_val = sum(get_cell_value(addr) for addr in plan.clean_cells.get('income', []))
+    clean_exp_val = sum(get_cell_value(addr) for addr in plan.clean_cells.get('expense', []))
+    sum_clean = {
+        'income': clean_inc_val,
+        'expense': clean_exp_val,
+        'balance': clean_inc_val - clean_exp_val
+    }
+
+    # Pie Chart
+    pie_data = empty_pie_data()
+
+    for name, addr, cat_type, is_clean in plan.categories:
+        val = get_cell_value(addr)
+        if val > 0:
+            if cat_type == 'income':
+                pie_data['dirty_inc']['labels'].append(name)
+                pie_data['dirty_inc']['data'].append(val)
+            else:
+                pie_data['dirty_exp']['labels'].append(name)
+                pie_data['dirty_exp']['data'].append(val)
+            
+            if is_clean:
+                if cat_type == 'income':
+                    pie_data['clean_inc']['labels'].append(name)
+                    pie_data['clean_inc']['data'].append(val)
+                else:
+                    pie_data['clean_exp']['labels'].append(name)
+                    pie_data['clean_exp']['data'].append(val)
+
+    # Trend Chart Logic (kotor & bersih dalam satu tabel, bersih = mask hutang)
+    transactions = build_transactions(plan, extract.columns)
+
+    return transactions, sum_kotor, sum_clean, pie_data
@@ -0,0 +1,68 @@
+import os
+import hashlib
+import threading
+from contextlib import contextmanager, ExitStack
+from metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: hanya koalesensi antar thread
+    fcntl = None
+
+# --- SINGLE-FLIGHT: REQUEST IDENTIK YANG BERSAMAAN BERBAGI SATU PENGAMBILAN ---
+# Antar thread: request kedua menunggu hasil request pertama (tanpa panggilan Google lagi).
+# Antar worker gunicorn: lock file per (spreadsheet, sheet); worker yang menunggu lalu
+# membaca hasil yang baru ditulis worker lain ke cache SQLite.
+
+metrics.describe('single_flight_deduplicated_total', 'Request yang memakai hasil request lain yang sedang berjalan')
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        if lock_dir: os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader: call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.inc('single_flight_deduplicated_total', scope='thread')
+            call.done.wait()
+            if call.error is not None: raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @contextmanager
+    def process_lock(self, keys):
+        # flock per key (urut agar tidak deadlock); dilepas otomatis jika worker mati
+        if not self.lock_dir or fcntl is None:
+            yield
+            return
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                name = hashlib.sha1(repr(key).encode()).hexdigest() + '.lock'
+                f = stack.enter_context(open(os.path.join(self.lock_dir, name), 'a'))
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing, contextmanager
+from sheet_plan import SheetExtract, fetch_extracts, fetch_tails
+
+# Baris terakhir yang selalu diambil ulang saat sync inkremental
+# (baris yang sedang diisi manual bisa berubah setelah tersimpan)
+TAIL_OVERLAP = 5
+
+# Sync inkremental hanya memeriksa baris overlap; edit di baris yang lebih lama baru ketahuan
+# saat kolom diambil penuh. Umur maksimal hasil ambil penuh terakhir (detik):
+REVALIDATE_AFTER = 600
+
+# Kolom transaksi disimpan per peran, bukan per nama header
+ROLE_ATTRS = ('col_date', 'col_income', 'col_expense', 'col_source_income', 'col_source_expense')
+
+# --- SNAPSHOT TRANSAKSI LOKAL PER MONITORFOLDER (SQLite) ---
+
+class SnapshotStore:
+    def __init__(self, path, revalidate_after=REVALIDATE_AFTER):
+        self.path = path
+        self.revalidate_after = revalidate_after
+        folder = os.path.dirname(path)
+        if folder: os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshot_sheet (
+                    folder_id INTEGER NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    plan_signature TEXT NOT NULL,
+                    revision TEXT,
+                    header_row INTEGER,
+                    col_index TEXT NOT NULL,
+                    cells TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    synced_at REAL NOT NULL,
+                    verified_at REAL,
+                    PRIMARY KEY (folder_id, sheet_name)
+                )
+            """)
+            # Database lama: kolom verified_at (waktu ambil kolom penuh terakhir) belum ada
+            if 'verified_at' not in [r[1] for r in conn.execute("PRAGMA table_info(snapshot_sheet)")]:
+                try: conn.execute("ALTER TABLE snapshot_sheet ADD COLUMN verified_at REAL")
+                except sqlite3.OperationalError: pass  # sudah ditambahkan oleh worker lain
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshot_row (
+                    folder_id INTEGER NOT NULL,
+                    sheet_name TEXT NOT NULL,
+                    row_idx INTEGER NOT NULL,
+                    col_date TEXT,
+                    col_income TEXT,
+                    col_expense TEXT,
+                    col_source_income TEXT,
+                    col_source_expense TEXT,
+                    PRIMARY KEY (folder_id, sheet_name, row_idx)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+            yield conn
+
+    # --- BACA ---
+
+    def _state(self, conn, folder_id, sheet_name):
+        row = conn.execute(
+            "SELECT plan_signature, revision, header_row, col_index, cells, row_count, synced_at, verified_at "
+            "FROM snapshot_sheet WHERE folder_id = ? AND sheet_name = ?",
+            (folder_id, sheet_name)
+        ).fetchone()
+        if not row: return None
+        return {'plan': row[0], 'revision': row[1], 'header_row': row[2],
+                'col_index': json.loads(row[3]), 'cells': json.loads(row[4]),
+                'row_count': row[5], 'synced_at': row[6], 'verified_at': row[7] or 0}
+
+    def _load(self, conn, folder, state, sheet_name):
+        rows = conn.execute(
+            f"SELECT {', '.join(ROLE_ATTRS)} FROM snapshot_row "
+            "WHERE folder_id = ? AND sheet_name = ? ORDER BY row_idx",
+            (folder.id, sheet_name)
+        ).fetchall()
+        columns = {}
+        for i, attr in enumerate(ROLE_ATTRS):
+            name = getattr(folder, attr)
+            if name in state['col_index'] and name not in columns:
+                columns[name] = [r[i] or '' for r in rows]
+        extract = SheetExtract(state['cells'], columns, state['header_row'], state['col_index'])
+        extract.revision = state['revision']
+        return extract
+
+    def load(self, folder, plan, sheet_names):
+        # Data terakhir yang tersimpan, tanpa menghubungi Google
+        result = {}
+        with self._connect() as conn:
+            for name in sheet_names:
+                state = self._state(conn, folder.id, name)
+                if state and state['plan'] == plan.signature:
+                    result[name] = self._load(conn, folder, state, name)
+        return result
+
+    def synced_sheets(self, folder_id, plan, sheet_names):
+        # Sheet yang sudah punya snapshot untuk plan ini; hanya metadata, baris tidak dibaca
+        with self._connect() as conn:
+            rows = conn.execute("SELECT sheet_name FROM snapshot_sheet WHERE folder_id = ? AND plan_signature = ?",
+                                (folder_id, plan.signature)).fetchall()
+        known = {r[0] for r in rows}
+        return [n for n in sheet_names if n in known]
+
+    # --- TULIS ---
+
+    def _save(self, conn, folder, plan, sheet_name, extract, revision, start=0, verified_at=None):
+        # Ganti baris mulai indeks `start`; baris sebelumnya tetap. start=0 = seluruh kolom terambil
+        if start == 0: verified_at = time.time()
+        names = [getattr(folder, attr) for attr in ROLE_ATTRS]
+        columns = [extract.columns.get(name) for name in names]
+        length = max((len(c) for c in columns if c is not None), default=0)
+        conn.execute(
+            "DELETE FROM snapshot_row WHERE folder_id = ? AND sheet_name = ? AND row_idx >= ?",
+            (folder.id, sheet_name, start)
+        )
+        conn.executemany(
+            f"INSERT INTO snapshot_row (folder_id, sheet_name, row_idx, {', '.join(ROLE_ATTRS)}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(folder.id, sheet_name, start + i, *[c[i] if c is not None else None for c in columns])
+             for i in range(length)]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshot_sheet (folder_id, sheet_name, plan_signature, revision, header_row, "
+            "col_index, cells, row_count, synced_at, verified_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (folder.id, sheet_name, plan.signature, revision, extract.header_row,
+             json.dumps(extract.col_index), json.dumps(extract.cells), start + length, time.time(), verified_at)
+        )
+
+    def apply_write(self, folder, plan, sheet_name, revision, cells=None, start=None, rows=()):
+        # Setelah app sendiri menulis ke spreadsheet (values_append): baris baru & sel rumus disimpan tanpa
+        # download ulang. Hanya jika snapshot berada di `revision` (revisi tepat sebelum menulis) dan tidak
+        # ada baris yang terlewat; selain itu None -> sheet disinkron seperti biasa. Revisi tidak dinaikkan:
+        # sinkron berikutnya tetap mencocokkan baris terakhir ke Google (tail) sebelum mencap revisi baru.
+        with self._connect() as conn:
+            state = self._state(conn, folder.id, sheet_name)
+            if not state or state['plan'] != plan.signature or not revision or state['revision'] != revision:
+                return None
+            if rows:
+                if start is None or start > state['row_count']: return None
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO snapshot_row (folder_id, sheet_name, row_idx, {', '.join(ROLE_ATTRS)}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(folder.id, sheet_name, start + i, *[row.get(attr) for attr in ROLE_ATTRS])
+                     for i, row in enumerate(rows)]
+                )
+                state['row_count'] = max(state['row_count'], start + len(rows))
+            if cells is not None: state['cells'] = cells
+            conn.execute(
+                "UPDATE snapshot_sheet SET cells = ?, row_count = ?, synced_at = ? "
+                "WHERE folder_id = ? AND sheet_name = ?",
+                (json.dumps(state['cells']), state['row_count'], time.time(), folder.id, sheet_name)
+            )
+            return self._load(conn, folder, state, sheet_name)
+
+    def mark_stale(self, folder_id, sheet_names):
+        # Ada perubahan di spreadsheet yang tidak diketahui isinya: revisi dikosongkan, sinkron
+        # berikutnya mengambil ulang kolom penuh (bukan hanya baris baru)
+        with self._connect() as conn:
+            conn.executemany("UPDATE snapshot_sheet SET revision = NULL WHERE folder_id = ? AND sheet_name = ?",
+                             [(folder_id, name) for name in sheet_names])
+
+    def delete_folder(self, folder_id):
+        self.delete_folders([folder_id])
+
+    def delete_folders(self, folder_ids, batch_size=500):
+        # Hapus massal (mis. delete_user.py): satu DELETE ... IN per batch
+        folder_ids = list(folder_ids)
+        with self._connect() as conn:
+            for i in range(0, len(folder_ids), batch_size):
+                batch = folder_ids[i:i + batch_size]
+                marks = ','.join('?' * len(batch))
+                conn.execute(f"DELETE FROM snapshot_row WHERE folder_id IN ({marks})", batch)
+                conn.execute(f"DELETE FROM snapshot_sheet WHERE folder_id IN ({marks})", batch)
+
+    # --- SINKRONISASI ---
+
+    def _overlap_matches(self, conn, folder, sheet_name, extract, start, row_count):
+        # Baris lama yang ikut terambil di tail harus sama persis dengan yang tersimpan
+        rows = conn.execute(
+            f"SELECT {', '.join(ROLE_ATTRS)} FROM snapshot_row "
+            "WHERE folder_id = ? AND sheet_name = ? AND row_idx >= ? AND row_idx < ? ORDER BY row_idx",
+            (folder.id, sheet_name, start, row_count)
+        ).fetchall()
+        if len(rows) != row_count - start: return False
+        for i, attr in enumerate(ROLE_ATTRS):
+            values = extract.columns.get(getattr(folder, attr))
+            if values is None: continue
+            if [r[i] or '' for r in rows] != [v or '' for v in values[:len(rows)]]: return False
+        return True
+
+    def sync(self, open_spreadsheet, folder, plan, sheet_names, revision, force=False, headers=None):
+        result, tail_headers, tail_starts, full = {}, {}, {}, []
+        now = time.time()
+        with self._connect() as conn:
+            states = {n: self._state(conn, folder.id, n) for n in sheet_names}
+            for name in sheet_names:
+                state = states[name]
+                usable = state and state['plan'] == plan.signature and state['header_row']
+                if usable and not force and revision and state['revision'] == revision:
+                    result[name] = self._load(conn, folder, state, name)
+                elif (usable and not force and state['revision']
+                      and now - state['verified_at'] < self.revalidate_after):
+                    # Revisi berubah: cukup ambil baris baru (plus beberapa baris terakhir)
+                    tail_headers[name] = {'row': state['header_row'], 'cols': state['col_index']}
+                    tail_starts[name] = max(state['row_count'] - TAIL_OVERLAP, 0)
+                else:
+                    full.append(name)
+        if not tail_headers and not full: return result
+
+        spreadsheet = open_spreadsheet()
+        tails = fetch_tails(spreadsheet, plan, tail_headers, tail_starts) if tail_headers else {}
+        with self._connect() as conn:
+            for name, extract in tails.items():
+                new_count = tail_starts[name] + max((len(c) for c in extract.columns.values()), default=0)
+                if new_count < states[name]['row_count']:
+                    # Baris berkurang (ada yang dihapus) -> ambil ulang kolom penuh
+                    continue
+                if not self._overlap_matches(conn, folder, name, extract, tail_starts[name], states[name]['row_count']):
+                    # Baris overlap berubah/bergeser (diedit atau ada yang dihapus) -> ambil ulang kolom penuh
+                    continue
+                # Tanpa baris baru (revisi berubah karena sheet lain) revisi cukup dicap ulang;
+                # edit di baris lama tertangkap paling lambat saat revalidasi (verified_at)
+                self._save(conn, folder, plan, name, extract, revision, start=tail_starts[name],
+                           verified_at=states[name]['verified_at'])
+                result[name] = self._load(conn, folder, self._state(conn, folder.id, name), name)
+        full += [n for n in tail_headers if n not in result]
+
+        if full:
+            hints = dict(headers or {})
+            hints.update({n: {'row': states[n]['header_row'], 'cols': states[n]['col_index']}
+                          for n in full if states[n] and states[n]['header_row']
+                          and states[n]['plan'] == plan.signature})
+            fetched = fetch_extracts(spreadsheet, plan, full, hints)
+            with self._connect() as conn:
+                for name, extract in fetched.items():
+                    self._save(conn, folder, plan, name, extract, revision)
+                    result[name] = extract
+        return result
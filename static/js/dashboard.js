@@ -59,6 +59,9 @@ function initCountingAnimation() {
 function resetCanvas(elementId) {
     const canvas = document.getElementById(elementId);
     if (!canvas) return null;
+    // Hapus chart lama (ganti bulan tanpa reload halaman)
+    const oldChart = Chart.getChart(canvas);
+    if (oldChart) oldChart.destroy();
     const newCanvas = canvas.cloneNode(true);
     canvas.parentNode.replaceChild(newCanvas, canvas);
     return newCanvas;
@@ -227,7 +230,229 @@ function renderBarCompare(elementId, strIncome, strExpense, strBalance, colors)
     });
 }
 
-// 3. LOGIC GANTI MODE
+// =========================================
+// 3. TEMA WARNA CHART (Terang / Gelap)
+// =========================================
+function applyChartTheme() {
+    const isDark = document.documentElement.getAttribute('data-bs-theme') === 'dark';
+
+    // A. Ubah Pengaturan Dasar 
+    Chart.defaults.color = isDark ? '#9ca3af' : '#6c757d'; 
+    Chart.defaults.borderColor = isDark ? 'rgba(255, 255, 255, 0.1)' : 'rgba(0, 0, 0, 0.1)';
+
+    // B. Paksa ubah chart yang ada di dalam memori
+    for (let id in Chart.instances) {
+        let chart = Chart.instances[id];
+
+        // Paksa update warna teks dan jaring latar (grid)
+        if (chart.options) {
+            chart.options.color = isDark ? '#9ca3af' : '#6c757d';
+            if (chart.options.scales) {
+                for (let axis in chart.options.scales) {
+                    if (chart.options.scales[axis].grid) {
+                        chart.options.scales[axis].grid.color = isDark ? 'rgba(255, 255, 255, 0.1)' : 'rgba(0, 0, 0, 0.1)';
+                    }
+                }
+            }
+        }
+
+        // --- Ubah warna OUTLINE & ISI pada PIE CHART ---
+        if (chart.canvas.id.includes('pie') && chart.data.datasets[0]) {
+            // 1. Outline membaur dengan warna card
+            chart.data.datasets[0].borderColor = isDark ? '#181a1d' : '#ffffff';
+
+            // 2. Warna isi Pie Chart dibuat lebih menyala (Neon/Vibrant) di Mode Gelap
+            if (chart.canvas.id.includes('Inc')) { // Kategori Pemasukan (Hijau)
+                chart.data.datasets[0].backgroundColor = isDark 
+                    ? ['#34d399', '#10b981', '#059669', '#047857', '#064e3b'] // Hijau Neon/Terang
+                    : ['#a7f3d0', '#34d399', '#059669', '#10b981', '#047857']; // Hijau Pastel (Terang)
+            } 
+            else if (chart.canvas.id.includes('Exp')) { // Kategori Pengeluaran (Merah)
+                chart.data.datasets[0].backgroundColor = isDark 
+                    ? ['#f87171', '#ef4444', '#dc2626', '#b91c1c', '#7f1d1d'] // Merah Cerah/Tegas
+                    : ['#fecaca', '#f87171', '#dc2626', '#ef4444', '#b91c1c']; // Merah Pastel (Terang)
+            }
+        }
+
+        // Ubah warna spesifik di dalam grafik Bar (Rasio)
+        if (chart.canvas.id === 'barCompareClean' && chart.data.datasets[0]) {
+            chart.data.datasets[0].backgroundColor = isDark ? ['#10b981', '#ef4444', '#3b82f6'] : ['#06bd83', '#ff6d6d', '#588dff'];
+        }
+        if (chart.canvas.id === 'barCompareDirty' && chart.data.datasets[0]) {
+            chart.data.datasets[0].backgroundColor = isDark ? ['#9ca3af', '#6b7280', '#3b82f6'] : ['#3e3e3e', '#535455', '#588dff'];
+        }
+
+        // Ubah warna spesifik di dalam grafik Garis (Trend)
+        if (chart.canvas.id === 'chartTrendClean' || chart.canvas.id === 'chartTrendDirty') {
+            if (chart.data.datasets[0]) { // Garis Pemasukan
+                chart.data.datasets[0].borderColor = isDark ? '#10b981' : '#06bd83'; 
+                chart.data.datasets[0].backgroundColor = isDark ? 'rgba(16, 185, 129, 0.1)' : 'rgba(6, 189, 131, 0.1)';
+            }
+            if (chart.data.datasets[1]) { // Garis Pengeluaran
+                chart.data.datasets[1].borderColor = isDark ? '#ef4444' : '#ff6d6d';
+                chart.data.datasets[1].backgroundColor = isDark ? 'rgba(239, 68, 68, 0.1)' : 'rgba(255, 109, 109, 0.1)';
+            }
+        }
+
+        chart.update(); // Minta Chart.js melukis ulang
+    }
+}
+
+// =========================================
+// 4. DATA ASYNC (JSON API) + PREFETCH BULAN
+// =========================================
+const dashboardCache = new Map();
+let dashboardConfig = null;
+
+function dashboardKey(month, yearView) {
+    return yearView ? '__year__' : month;
+}
+
+function dashboardQuery(month, yearView, refresh) {
+    const params = new URLSearchParams();
+    if (yearView) params.set('view', 'year'); else params.set('month', month);
+    if (refresh) params.set('refresh', '1');
+    return params.toString();
+}
+
+// Titik grafik yang diminta dari server = lebar area grafik (lebih dari 1 titik per piksel tidak terlihat)
+function chartPoints() {
+    const canvas = document.getElementById('chartTrendClean');
+    const width = (canvas && canvas.parentElement && canvas.parentElement.clientWidth) || window.innerWidth;
+    return Math.round(width);
+}
+
+function fetchDashboardData(month, yearView, refresh = false) {
+    const key = dashboardKey(month, yearView);
+    if (!refresh && dashboardCache.has(key)) return dashboardCache.get(key);
+
+    const query = `${dashboardQuery(month, yearView, refresh)}&points=${chartPoints()}`;
+    const request = fetch(`${dashboardConfig.dataUrl}?${query}`, {
+        credentials: 'same-origin',
+        headers: { 'Accept': 'application/json' }
+    }).then(resp => {
+        if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+        return resp.json();
+    });
+    dashboardCache.set(key, request);
+    // Request gagal jangan disimpan, supaya bisa dicoba lagi
+    request.catch(() => dashboardCache.delete(key));
+    return request;
+}
+
+function prefetchAdjacentMonths(month, yearView) {
+    if (yearView) return;
+    const idx = dashboardConfig.months.indexOf(month);
+    if (idx < 0) return;
+    [idx - 1, idx + 1].forEach(i => {
+        const m = dashboardConfig.months[i];
+        if (m !== undefined) fetchDashboardData(m, false).catch(() => {});
+    });
+}
+
+function setKpi(elementId, value) {
+    const el = document.getElementById(elementId);
+    if (el) el.innerText = "Rp " + value;
+}
+
+function renderDashboard(data) {
+    const errBox = document.getElementById('dashboard-error');
+    if (errBox) {
+        errBox.classList.toggle('d-none', !data.error_msg);
+        errBox.classList.toggle('d-flex', !!data.error_msg);
+        document.getElementById('dashboard-error-msg').innerText = data.error_msg || '';
+    }
+    const asOf = document.getElementById('data-as-of');
+    if (asOf) asOf.innerText = data.as_of ? `Data per ${data.as_of}` : '';
+    const refreshing = document.getElementById('data-refreshing');
+    if (refreshing) refreshing.classList.toggle('d-none', !data.refreshing);
+
+    setKpi('clean-income-val', data.sum_clean.income);
+    setKpi('clean-expense-val', data.sum_clean.expense);
+    setKpi('clean-balance-val', data.sum_clean.balance);
+    setKpi('dirty-income-val', data.sum_kotor.income);
+    setKpi('dirty-expense-val', data.sum_kotor.expense);
+    setKpi('dirty-balance-val', data.sum_kotor.balance);
+    if (!dashboardConfig.reportMode) initCountingAnimation();
+
+    applyChartTheme();
+    try {
+        const cGreen = ['#a7f3d0', '#34d399', '#059669']; 
+        const cRed   = ['#fecaca', '#f87171', '#dc2626']; 
+        const barColorsClean = ['#06bd83', '#ff6d6d', '#588dff']; 
+        const barColorsDirty = ['#3e3e3e', '#535455', '#588dff'];
+        const pie = data.pie_data;
+
+        renderLine('chartTrendClean', data.chart_clean.labels, data.chart_clean.income, data.chart_clean.expense);
+        renderPie('pieIncClean', pie.clean_inc.labels, pie.clean_inc.data, cGreen);
+        renderPie('pieExpClean', pie.clean_exp.labels, pie.clean_exp.data, cRed);
+        renderBarCompare('barCompareClean', data.sum_clean.income, data.sum_clean.expense, data.sum_clean.balance, barColorsClean);
+
+        renderLine('chartTrendDirty', data.chart_dirty.labels, data.chart_dirty.income, data.chart_dirty.expense);
+        renderPie('pieIncDirty', pie.dirty_inc.labels, pie.dirty_inc.data, cGreen);
+        renderPie('pieExpDirty', pie.dirty_exp.labels, pie.dirty_exp.data, cRed);
+        renderBarCompare('barCompareDirty', data.sum_kotor.income, data.sum_kotor.expense, data.sum_kotor.balance, barColorsDirty);
+    } catch (error) { 
+        console.error("Error render chart:", error); 
+    }
+    applyChartTheme();
+}
+
+function loadDashboard(month, yearView, refresh = false) {
+    const label = document.getElementById('selected-month-label');
+    if (label) label.innerText = yearView ? 'Setahun Penuh' : month;
+    document.querySelectorAll('.month-link').forEach(a => {
+        const active = yearView ? a.dataset.view === 'year' : a.dataset.month === month;
+        a.classList.toggle('active', active);
+        a.classList.toggle('fw-bold', active);
+    });
+
+    return fetchDashboardData(month, yearView, refresh)
+        .then(data => {
+            renderDashboard(data);
+            if (!dashboardConfig.reportMode) prefetchAdjacentMonths(month, yearView);
+        })
+        .catch(err => renderDashboard({
+            error_msg: `Gagal memuat data (${err.message})`, as_of: null, refreshing: false,
+            sum_clean: { income: 0, expense: 0, balance: 0 }, sum_kotor: { income: 0, expense: 0, balance: 0 },
+            chart_clean: { labels: [], income: [], expense: [] }, chart_dirty: { labels: [], income: [], expense: [] },
+            pie_data: { clean_inc: { labels: [], data: [] }, clean_exp: { labels: [], data: [] },
+                        dirty_inc: { labels: [], data: [] }, dirty_exp: { labels: [], data: [] } }
+        }));
+}
+
+function initDashboard(config) {
+    dashboardConfig = config;
+    const key = dashboardKey(config.selected, config.yearView);
+
+    if (config.initialData && !config.forceRefresh) {
+        dashboardCache.set(key, Promise.resolve(config.initialData));
+    }
+    // Mode laporan (screenshot headless): grafik tanpa animasi, body ditandai setelah selesai digambar
+    if (config.reportMode && window.Chart) Chart.defaults.animation = false;
+    loadDashboard(config.selected, config.yearView, config.forceRefresh).then(() => {
+        if (config.reportMode) document.body.dataset.reportReady = '1';
+    });
+
+    // Ganti bulan tanpa reload halaman
+    document.querySelectorAll('.month-link').forEach(a => {
+        a.addEventListener('click', (e) => {
+            e.preventDefault();
+            const yearView = a.dataset.view === 'year';
+            const month = a.dataset.month;
+            history.pushState({ month, yearView }, '', `${config.pageUrl}?${dashboardQuery(month, yearView, false)}`);
+            loadDashboard(month, yearView);
+        });
+    });
+    window.addEventListener('popstate', (e) => {
+        const state = e.state || { month: config.selected, yearView: config.yearView };
+        loadDashboard(state.month, state.yearView);
+    });
+}
+
+// =========================================
+// 5. LOGIC GANTI MODE
+// =========================================
 function setMode(mode) {
     const secClean = document.getElementById('section-clean');
     const secDirty = document.getElementById('section-dirty');
@@ -0,0 +1,110 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- SINKRON BACKGROUND + STALE-WHILE-REVALIDATE UNTUK DASHBOARD ---
+# Hasil dashboard terakhir disimpan per key (folder, bulan/setahun). Request langsung
+# memakai hasil itu; jika sudah lewat interval folder, pembaruan dijalankan di thread pool.
+
+class _View:
+    def __init__(self, interval):
+        self.interval = interval
+        self.last_viewed = time.time()
+        self.result = None
+        self.as_of = None
+
+
+class SyncScheduler:
+    def __init__(self, refresh_fn, max_workers=4, tick=30, recent_window=3600):
+        self.refresh_fn = refresh_fn        # refresh_fn(key) -> hasil dashboard
+        self.tick = tick
+        self.recent_window = recent_window
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sheet-sync')
+        self._views = {}
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None: return
+            self._thread = threading.Thread(target=self._loop, name='sheet-sync-scheduler', daemon=True)
+            self._thread.start()
+
+    # --- DIPANGGIL DARI REQUEST ---
+
+    def get(self, key, interval):
+        # Catat sebagai "baru dilihat"; kembalikan (hasil, waktu data) terakhir jika ada
+        with self._lock:
+            view = self._views.get(key)
+            if view is None:
+                view = self._views[key] = _View(interval)
+            view.interval = interval
+            view.last_viewed = time.time()
+            return view.result, view.as_of
+
+    def put(self, key, result, as_of=None):
+        with self._lock:
+            view = self._views.get(key)
+            if view is None: return
+            view.result = result
+            view.as_of = as_of or time.time()
+
+    def invalidate(self, folder_id):
+        # Konfigurasi folder berubah -> hasil lama langsung dibuang di proses ini (proses lain:
+        # key berisi config_version, jadi hasil lama otomatis tidak terpakai)
+        with self._lock:
+            for key in [k for k in self._views if k[0] == folder_id]:
+                del self._views[key]
+
+    def forget(self, key):
+        # Key tidak berlaku lagi (mis. versi konfigurasi lama): berhenti disinkron
+        with self._lock:
+            self._views.pop(key, None)
+
+    def is_stale(self, key):
+        with self._lock:
+            view = self._views.get(key)
+            return view is None or view.as_of is None or time.time() - view.as_of >= view.interval
+
+    def is_refreshing(self, key):
+        with self._lock:
+            return key in self._inflight
+
+    def request_refresh(self, key):
+        with self._lock:
+            if key in self._inflight or key not in self._views: return False
+            self._inflight.add(key)
+        self._executor.submit(self._run, key)
+        return True
+
+    def view_count(self):
+        with self._lock: return len(self._views)
+
+    def inflight_count(self):
+        with self._lock: return len(self._inflight)
+
+    # --- BACKGROUND ---
+
+    def _run(self, key):
+        try:
+            result = self.refresh_fn(key)
+            if result is not None: self.put(key, result)
+        except Exception as e:
+            print(f"Background Sync Error {key}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.tick)
+            now = time.time()
+            with self._lock:
+                # Lupakan dashboard yang sudah lama tidak dibuka
+                for key in [k for k, v in self._views.items() if now - v.last_viewed > self.recent_window]:
+                    del self._views[key]
+                due = [k for k, v in self._views.items()
+                       if v.as_of is not None and now - v.as_of >= v.interval]
+            for key in due:
+                self.request_refresh(key)
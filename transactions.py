@@ -0,0 +1,130 @@
+import warnings
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from sheet_parse import parse_indo_numbers, debt_mask
+
+# --- TABEL TRANSAKSI RINGKAS (kotor + bersih sekaligus) ---
+# Hanya kolom yang dipakai grafik yang disimpan, dengan dtype numpy (datetime64 & float64).
+# Data "bersih" bukan salinan: cukup mask per kolom nominal (True = bukan transaksi hutang).
+# float64 dipertahankan untuk nominal; float32 tidak cukup presisi untuk total rupiah.
+
+class Transactions:
+    def __init__(self, dates, income=None, expense=None, clean_income=None, clean_expense=None):
+        self.dates = dates                  # datetime64, NaT untuk tanggal yang tidak valid
+        self.income = income                # float64, None jika kolom tidak ada di sheet
+        self.expense = expense
+        self.clean_income = clean_income    # bool, None = semua baris dihitung bersih
+        self.clean_expense = clean_expense
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def is_empty(self):
+        return len(self.dates) == 0
+
+    @staticmethod
+    def _clean(values, mask):
+        if values is None or mask is None: return values
+        return np.where(mask, values, 0.0)
+
+    def take(self, rows):
+        # rows: slice atau mask/indeks numpy; kolom yang None tetap None
+        def pick(values): return None if values is None else values[rows]
+        return Transactions(self.dates[rows], pick(self.income), pick(self.expense),
+                            pick(self.clean_income), pick(self.clean_expense))
+
+    def between(self, start, end):
+        # Tanggal inklusif (datetime64[D]); baris tanpa tanggal valid tidak ikut
+        days = self.dates.astype('datetime64[D]')
+        return self.take(~np.isnat(days) & (days >= start) & (days <= end))
+
+    @staticmethod
+    def concat(parts):
+        parts = [p for p in parts if p is not None]
+        if not parts: return Transactions(np.array([], dtype='datetime64[ns]'))
+        def join(attr, fill):
+            if all(getattr(p, attr) is None for p in parts): return None
+            return np.concatenate([getattr(p, attr) if getattr(p, attr) is not None
+                                   else np.full(len(p), fill) for p in parts])
+        return Transactions(np.concatenate([p.dates for p in parts]), join('income', np.nan),
+                            join('expense', np.nan), join('clean_income', True), join('clean_expense', True))
+
+    def series(self, clean=False):
+        # (pemasukan, pengeluaran) kotor atau bersih
+        if not clean: return self.income, self.expense
+        return self._clean(self.income, self.clean_income), self._clean(self.expense, self.clean_expense)
+
+    def totals(self, clean=False):
+        income, expense = self.series(clean)
+        return (float(np.nansum(income)) if income is not None else 0,
+                float(np.nansum(expense)) if expense is not None else 0)
+
+    def daily(self):
+        # Trend harian kotor & bersih dalam satu pass: kode hari dihitung sekali,
+        # lalu keempat seri dijumlahkan per hari dengan bincount.
+        chart_dirty = {'labels': [], 'income': [], 'expense': []}
+        chart_clean = {'labels': [], 'income': [], 'expense': []}
+        days = self.dates.astype('datetime64[D]')
+        valid = ~np.isnat(days)
+        if not valid.any(): return chart_dirty, chart_clean
+
+        unique_days, codes = np.unique(days[valid], return_inverse=True)
+        labels = np.datetime_as_string(unique_days, unit='D').tolist()
+
+        def per_day(values):
+            if values is None: return []
+            values = values[valid]
+            # NaN dilewati seperti sum() pandas
+            weights = np.where(np.isnan(values), 0.0, values)
+            return np.bincount(codes, weights=weights, minlength=len(unique_days)).tolist()
+
+        for chart, clean in ((chart_dirty, False), (chart_clean, True)):
+            income, expense = self.series(clean)
+            chart['labels'] = list(labels)
+            chart['income'] = per_day(income)
+            chart['expense'] = per_day(expense)
+        return chart_dirty, chart_clean
+
+
+# Nilai yang dilewati pd.to_datetime saat menebak format (lihat tslib.first_non_null)
+SKIPPED_DATE_STRINGS = {'', 'NaT', 'nat', 'NAT', 'nan', 'NaN', 'NAN', 'now', 'today'}
+
+
+def infer_date_format(values):
+    # Format yang ditebak pd.to_datetime dari nilai pertama kolom; 'mixed' = tiap nilai di-parse
+    # sendiri. Disimpan supaya potongan baris kolom yang sama di-parse persis seperti kolom penuh.
+    for v in values:
+        if v is None or v != v or (isinstance(v, str) and v in SKIPPED_DATE_STRINGS): continue
+        if type(v) is not str: return 'mixed'
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return guess_datetime_format(v) or 'mixed'
+    return 'mixed'
+
+
+def build_transactions(plan, columns, date_format=None):
+    # columns: {nama header: [nilai, ...]} dari SheetExtract; plan.roles: peran -> nama header
+    # date_format: None = ditebak pandas dari nilai pertama (lihat infer_date_format)
+    roles = plan.roles
+    if not columns.get(roles['date']): return None
+
+    def column(name):
+        return pd.Series(columns[name], dtype=object) if name in columns else None
+
+    # Semua kolom di SheetExtract sudah sama panjang (dipad saat diambil)
+    dates = pd.to_datetime(column(roles['date']), errors='coerce', format=date_format)
+    if dates.dt.tz is not None: dates = dates.dt.tz_localize(None)
+
+    def amounts(name):
+        col = column(name)
+        return parse_indo_numbers(col) if col is not None else None
+
+    def clean_mask(name):
+        col = column(name)
+        if col is None or plan.keywords is None: return None
+        return ~debt_mask(col, plan.keywords).to_numpy()
+
+    return Transactions(dates.to_numpy(), amounts(roles['income']), amounts(roles['expense']),
+                        clean_mask(roles['source_income']), clean_mask(roles['source_expense']))